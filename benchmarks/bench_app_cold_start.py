@@ -0,0 +1,126 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import psycopg2
+from psycopg2.extensions import parse_dsn
+from db_loader import copy_df
+from historical_partitions import create_historical_table, ensure_partitions
+from historical_rollups import create_rollup_tables, refresh_rollups
+from snapshot_cache import bump_version
+from utils import create_daily_table, create_forecast_summary_table, create_hourly_table, refresh_forecast_summary
+from benchmarks.pg_fixture import postgres
+from benchmarks.synthetic import STATES, synthetic_daily, synthetic_history, synthetic_hourly, synthetic_resorts
+
+'''
+Time to first render of the Streamlit app, with a cold cache, against a local Postgres
+filled with synthetic resorts, history and forecasts.
+
+The app script is run with streamlit.testing.v1.AppTest (needs streamlit installed), once per
+repeat with every Streamlit cache cleared first, then once more warm. Peak Python memory
+during the cold run is measured with tracemalloc.
+
+Snapshots (snapshot_cache.py) go to a fresh temporary SNAPSHOT_DIR, so the first cold run
+queries Postgres and writes them, and later cold runs start from the memory-mapped files
+like a restarted app.
+
+--page opens the app on one page (?page=...). Only that page runs, so a cold start on
+"Find Nearby Resorts" or "About" doesn't query the dashboard data.
+
+The tables are seeded into a throwaway schema (benchmarks/pg_fixture.py) in the --dsn
+database, or in a temporary cluster without --dsn, and dropped afterwards.
+
+Run from the repository root:
+    python -m benchmarks.bench_app_cold_start --dsn "dbname=postgres user=postgres host=localhost" --resorts 500 --days 730
+'''
+
+
+def seed(conn, n_resorts, days):
+    '''
+    Create and fill the tables of the app. Expects an empty schema from pg_fixture.postgres().
+    '''
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE resorts (id INTEGER PRIMARY KEY, resort TEXT, latitude REAL, longitude REAL, state TEXT)")
+    create_historical_table(cursor, "historical_weather")
+    create_hourly_table(cursor)
+    create_daily_table(cursor)
+    create_forecast_summary_table(cursor)
+
+    resorts = synthetic_resorts(n_resorts, STATES)
+    copy_df(cursor, resorts, "resorts", ["id", "resort", "latitude", "longitude", "state"])
+
+    history = synthetic_history(resorts, days)
+    ensure_partitions(cursor, "historical_weather", history["time"].min().date(), history["time"].max().date())
+    copy_df(cursor, history, "historical_weather")
+    create_rollup_tables(cursor, "historical_weather")
+    refresh_rollups(cursor, "historical_weather")
+
+    hourly = synthetic_hourly(resorts)
+    copy_df(cursor, hourly, "hourly")
+    copy_df(cursor, synthetic_daily(resorts), "daily")
+
+    refresh_forecast_summary(cursor)
+    for dataset in ("resorts", "historical", "forecast"):
+        bump_version(cursor, dataset)
+    conn.commit()
+    return len(history), len(hourly)
+
+
+def run_benchmark(args, dsn):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    conn = psycopg2.connect(dsn)
+    history_rows, hourly_rows = seed(conn, args.resorts, args.days)
+    conn.close()
+    print(f"Seeded {args.resorts} resorts, {history_rows} historical and {hourly_rows} hourly rows")
+
+    # The app reads its connection settings from these environment variables, libpq
+    # takes the search_path of the throwaway schema from PGOPTIONS
+    for key, value in parse_dsn(dsn).items():
+        os.environ["PGOPTIONS" if key == "options" else key] = value
+    app_path = os.path.abspath(args.app)
+    os.environ["SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="snapshots-")
+
+    cold = []
+    for repeat in range(args.repeats):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        tracemalloc.start()
+        start = time.perf_counter()
+        app = AppTest.from_file(app_path, default_timeout=600)
+        app.query_params["page"] = args.page
+        app.run()
+        cold.append(time.perf_counter() - start)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        print(f"cold run {repeat + 1}: {cold[-1]:.3f}s  peak python memory {peak / 2**20:.1f} MiB")
+
+    start = time.perf_counter()
+    app = AppTest.from_file(app_path, default_timeout=600)
+    app.query_params["page"] = args.page
+    app.run()
+    print(f"warm run  : {time.perf_counter() - start:.3f}s")
+    print(f"median cold start: {sorted(cold)[len(cold) // 2]:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", help="Postgres to create a throwaway schema in, a temporary cluster when omitted")
+    parser.add_argument("--resorts", type=int, default=500)
+    parser.add_argument("--days", type=int, default=730, help="days of synthetic history per resort")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--app", default="streamlit_app.py")
+    parser.add_argument("--page", default="Dashboard", help='page to open: Dashboard, "Find Nearby Resorts" or About')
+    args = parser.parse_args()
+
+    # Seeded into a throwaway schema, the tables of the app in that database are never touched
+    with postgres(args.dsn) as dsn:
+        run_benchmark(args, dsn)
+
+
+if __name__ == "__main__":
+    main()
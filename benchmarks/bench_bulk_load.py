@@ -0,0 +1,100 @@
+import argparse
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+from db_loader import copy_df, copy_upsert
+from utils import HOURLY_COLUMNS
+from benchmarks.pg_fixture import postgres
+from benchmarks.synthetic import synthetic_hourly, synthetic_resorts
+
+'''
+Rows per second of the Postgres write paths, on synthetic hourly forecast rows:
+
+    execute_values : what the insert functions used before
+    copy           : db_loader.copy_df into an empty table
+    copy+merge     : db_loader.copy_upsert into a table that already holds the same keys
+
+The bench_hourly table is created in a throwaway schema (benchmarks/pg_fixture.py) of the
+--dsn database, or of a temporary cluster without --dsn, and dropped afterwards.
+
+Run from the repository root:
+    python -m benchmarks.bench_bulk_load --dsn "dbname=postgres user=postgres host=localhost" --rows 10000 100000 1000000
+'''
+
+TABLE = "bench_hourly"
+
+
+def hourly_rows(rows):
+    '''
+    `rows` hourly rows (benchmarks/synthetic.py), 168 hours per resort.
+    '''
+    resorts = synthetic_resorts(-(-rows // 168))
+    return synthetic_hourly(resorts).head(rows)
+
+
+def reset_table(conn, cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {TABLE} (
+        id INTEGER, time TIMESTAMP NOT NULL, precipitation REAL, snowfall REAL, snow_height REAL,
+        freezinglevel_height REAL, rain REAL, showers REAL, weathercode INTEGER,
+        PRIMARY KEY (id, time)
+        )
+    """)
+    conn.commit()
+
+
+def run_execute_values(cursor, df):
+    query = f"INSERT INTO {TABLE} ({', '.join(HOURLY_COLUMNS)}) VALUES %s ON CONFLICT DO NOTHING"
+    execute_values(cursor, query, list(df.itertuples(index=False, name=None)))
+
+
+def run_copy(cursor, df):
+    copy_df(cursor, df, TABLE)
+
+
+def run_copy_merge(cursor, df):
+    # Change a tenth of the rows so the merge has some updates to do
+    changed = df.copy()
+    changed.loc[changed.index % 10 == 0, "snowfall"] += 1
+    copy_upsert(cursor, changed, TABLE, ["id", "time"])
+
+
+def run_benchmark(args, dsn):
+    conn = psycopg2.connect(dsn)
+    cursor = conn.cursor()
+
+    try:
+        for rows in args.rows:
+            df = hourly_rows(rows)
+            for name, method, fresh in (("execute_values", run_execute_values, True),
+                                        ("copy", run_copy, True),
+                                        ("copy+merge", run_copy_merge, False)):
+                # copy+merge runs against the rows the copy run left behind
+                if fresh:
+                    reset_table(conn, cursor)
+
+                start = time.perf_counter()
+                method(cursor, df)
+                conn.commit()
+                elapsed = time.perf_counter() - start
+                print(f"{rows:>9} rows  {name:<15} {elapsed:8.2f}s  {rows / elapsed:>10,.0f} rows/s")
+    finally:
+        # Closed before the schema is dropped, an open connection would block the DROP
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", help="Postgres to create a throwaway schema in, a temporary cluster when omitted")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    # The table is created in a throwaway schema, the tables of the app in that database are never touched
+    with postgres(args.dsn) as dsn:
+        run_benchmark(args, dsn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import time
+from datetime import date, timedelta
+import pandas as pd
+import psycopg2
+from data_access import explain_history, history_bucket, load_history, read_sql
+from benchmarks.bench_app_cold_start import seed
+from benchmarks.pg_fixture import postgres
+from benchmarks.synthetic import STATES
+
+'''
+Dashboard query with the filters pushed down to Postgres, against the previous approach
+of loading historical_weather once and filtering, grouping and pivoting it in pandas.
+
+Several seasons of synthetic history are loaded into a throwaway schema of a local Postgres
+(benchmarks/pg_fixture.py, dropped afterwards). For each
+filter selection it prints the time and rows of both approaches, and whether the SQL
+plan reads historical_weather through the (id, time) primary keys of its partitions.
+
+Run from the repository root:
+    python -m benchmarks.bench_dashboard_query --dsn "dbname=postgres user=postgres host=localhost" --resorts 500 --seasons 5
+'''
+
+TABLE = "historical_weather"
+
+
+def pandas_dashboard(history, resorts, variable, states, selected, start_date, end_date):
+    # What the dashboard tab did on every interaction before the pushdown
+    df = pd.merge(history, resorts, on='id', how='left')
+    df = df[
+        (df['state'].isin(states)) &
+        (df['resort'].isin(selected) if selected else True) &
+        (df['time'] >= pd.to_datetime(start_date)) & (df['time'] <= pd.to_datetime(end_date))
+    ]
+    aggregated = df.groupby(['time', 'resort'])[variable].mean().reset_index()
+    return aggregated.pivot(index='time', columns='resort', values=variable)
+
+
+def run_benchmark(args, dsn):
+    conn = psycopg2.connect(dsn)
+    history_rows, _ = seed(conn, args.resorts, args.seasons * 365)
+    conn.cursor().execute("ANALYZE")
+    conn.commit()
+    print(f"Seeded {args.resorts} resorts, {history_rows} historical rows")
+
+    start = time.perf_counter()
+    history = read_sql(conn, f"SELECT * FROM {TABLE}")
+    history['time'] = pd.to_datetime(history['time'])
+    resorts = read_sql(conn, "SELECT * FROM resorts")
+    print(f"pandas full load of {TABLE}: {time.perf_counter() - start:.2f}s ({history.memory_usage(deep=True).sum() / 2**20:.0f} MiB)\n")
+
+    end = date.today() - timedelta(days=1)
+    names = resorts.sort_values('id')['resort'].head(3).tolist()
+    cases = [
+        ("all states, 90 days", STATES, [], 90),
+        ("one state, 1 season", STATES[:1], [], 365),
+        ("3 resorts, all seasons", STATES, names, args.seasons * 365 - 1),
+        ("all states, all seasons", STATES, [], args.seasons * 365 - 1),
+    ]
+
+    for label, states, selected, days in cases:
+        start_date = end - timedelta(days=days)
+
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            pivot = pandas_dashboard(history, resorts, "snowfall_sum", states, selected, start_date, end)
+        pandas_ms = 1000 * (time.perf_counter() - start) / args.repeats
+
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            series = load_history(conn, TABLE, "snowfall_sum", states, selected, start_date, end)
+        sql_ms = 1000 * (time.perf_counter() - start) / args.repeats
+
+        _, indexes, _ = explain_history(conn, TABLE, "snowfall_sum", states, selected, start_date, end)
+        print(f"{label:26s} pandas {pandas_ms:8.1f} ms ({pivot.size:7d} points)   "
+              f"sql {sql_ms:8.1f} ms ({len(series):6d} rows per {history_bucket(start_date, end)})   "
+              f"pkey used: {any(name.startswith(TABLE) and name.endswith('_pkey') for name in indexes)}")
+
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", help="Postgres to create a throwaway schema in, a temporary cluster when omitted")
+    parser.add_argument("--resorts", type=int, default=500)
+    parser.add_argument("--seasons", type=int, default=5, help="years of synthetic history per resort")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    # Seeded into a throwaway schema, the tables of the app in that database are never touched
+    with postgres(args.dsn) as dsn:
+        run_benchmark(args, dsn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import time
+from openmeteo_client import fetch_forecasts
+from benchmarks.stub_openmeteo import start_stub_server
+from benchmarks.synthetic import synthetic_resorts
+
+'''
+Benchmark the forecast fetch against the local OpenMeteo stub: serial vs concurrent,
+one coordinate per request vs batched.
+
+Run from the repository root:
+    python -m benchmarks.bench_forecast_fetch --resorts 77 --latency 0.2 --workers 1 8 16 --batch-sizes 1 50
+'''
+
+# Same variables populate_forecast.py requests
+HOURLY_PARAMS = ["precipitation", "snowfall", "snow_height", "freezinglevel_height", "rain", "showers", "weathercode"]
+DAILY_PARAMS = [
+    "windspeed_10m_max", "windgusts_10m_max", "winddirection_10m_dominant", "temperature_2m_max",
+    "temperature_2m_min", "apparent_temperature_max", "apparent_temperature_min", "weathercode"
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resorts", type=int, default=77)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds the stub waits per request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--rate", type=float, default=0, help="requests per second limit, 0 for none")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    url = f"http://127.0.0.1:{server.server_port}/v1/forecast"
+    resorts = synthetic_resorts(args.resorts)
+
+    baseline = None
+    try:
+        for batch_size in args.batch_sizes:
+            for workers in args.workers:
+                requests_before = server.stats["requests"]
+                start = time.perf_counter()
+                results = fetch_forecasts(resorts, HOURLY_PARAMS, DAILY_PARAMS, batch_size=batch_size,
+                                          max_workers=workers, requests_per_second=args.rate, url=url)
+                elapsed = time.perf_counter() - start
+
+                hourly_rows = sum(len(hourly) for _, hourly, _ in results)
+                requests_sent = server.stats["requests"] - requests_before
+                baseline = baseline or elapsed
+                print(f"batch={batch_size:>3}  workers={workers:>3}  {elapsed:7.2f}s  requests={requests_sent:>4}  "
+                      f"hourly rows={hourly_rows}  speedup={baseline / elapsed:5.1f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import os
+import tempfile
+from types import SimpleNamespace
+import psycopg2
+import time
+from utils import get_weather_data, insert_daily_df, insert_hourly_df, stream_weather_data, update_resorts
+from benchmarks.pg_fixture import postgres
+from benchmarks.stub_openmeteo import start_stub_server, use_stub
+from benchmarks.bench_forecast_fetch import HOURLY_PARAMS, DAILY_PARAMS
+from benchmarks.synthetic import synthetic_resorts
+
+'''
+Rows written and lock time of a forecast refresh:
+
+    drop+insert : get_weather_data then insert_hourly_df/insert_daily_df, the tables are dropped
+                  and refilled with an ACCESS EXCLUSIVE lock held for the whole insert
+    swap        : stream_weather_data(incremental=False), staging tables renamed in at the end
+    upsert      : stream_weather_data(incremental=True), changed rows only, readers never blocked
+The resorts, hourly and daily tables are created in a throwaway schema (benchmarks/pg_fixture.py)
+of the --dsn database, or of a temporary cluster without --dsn, and dropped afterwards.
+
+Run from the repository root:
+    python -m benchmarks.bench_forecast_refresh --dsn "dbname=postgres user=postgres host=localhost" --resorts 500
+
+Each mode refreshes twice; the stub returns the same forecast both times, like a refresh
+where most forecasts have not changed.
+'''
+
+
+def run_benchmark(args, dsn):
+    server = start_stub_server(latency=0)
+    use_stub(server)
+
+    hourly_obj = SimpleNamespace(hourly_params=HOURLY_PARAMS)
+    daily_obj = SimpleNamespace(daily_params=DAILY_PARAMS)
+    resorts = synthetic_resorts(args.resorts)
+    resorts["state"] = "CO"
+
+    conn = psycopg2.connect(dsn)
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE resorts (id INTEGER PRIMARY KEY, resort TEXT, latitude REAL, longitude REAL, state TEXT)")
+    conn.commit()
+
+    # update_resorts reads the resorts from a csv file
+    with tempfile.TemporaryDirectory() as tmp:
+        resorts_file = os.path.join(tmp, "resorts.csv")
+        resorts[["id", "resort", "latitude", "longitude", "state"]].to_csv(resorts_file, index=False)
+        update_resorts(conn, cursor, "resorts", resorts_file)
+
+    try:
+        for run in (1, 2):
+            hourly_df, daily_df = get_weather_data(resorts, hourly_obj, daily_obj, requests_per_second=0)
+            start = time.perf_counter()
+            insert_hourly_df(hourly_df, cursor, conn)
+            insert_daily_df(daily_df, cursor, conn)
+            lock = time.perf_counter() - start
+            print(f"drop+insert run {run}: hourly written={len(hourly_df):>7}  "
+                  f"daily written={len(daily_df):>5}  lock={lock * 1000:8.1f} ms")
+
+        for incremental in (False, True):
+            for run in (1, 2):
+                stats = stream_weather_data(resorts, hourly_obj, daily_obj, cursor, conn, incremental=incremental,
+                                            requests_per_second=0)
+                mode = "upsert" if incremental else "swap"
+                print(f"{mode:<11} run {run}: hourly written={stats['hourly_written']:>7}  "
+                      f"daily written={stats['daily_written']:>5}  lock={stats['lock_seconds'] * 1000:8.1f} ms")
+    finally:
+        cursor.close()
+        conn.close()
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", help="Postgres to create a throwaway schema in, a temporary cluster when omitted")
+    parser.add_argument("--resorts", type=int, default=500)
+    args = parser.parse_args()
+
+    # The tables are created in a throwaway schema, the tables of the app in that database are never touched
+    with postgres(args.dsn) as dsn:
+        run_benchmark(args, dsn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+from datetime import date, timedelta
+import pandas as pd
+from openmeteo_client import fetch_forecasts, fetch_historical
+from schema import apply_schema, frame_memory
+from utils import HISTORICAL_DAILY_PARAMS
+from benchmarks.stub_openmeteo import start_stub_server
+from benchmarks.bench_forecast_fetch import HOURLY_PARAMS, DAILY_PARAMS
+from benchmarks.synthetic import synthetic_resorts
+
+'''
+Memory of the hourly, daily, historical_weather and resorts frames with pandas' default dtypes
+and with the dtypes from schema.py, fetched from the local OpenMeteo stub.
+
+Run from the repository root:
+    python -m benchmarks.bench_frame_memory --resorts 500 --days 365
+'''
+
+
+def report(name, df, table):
+    before = frame_memory(df)
+    after = frame_memory(apply_schema(df.copy(), table))
+    print(f"{name:20s} {len(df):9d} rows  {before:8.1f} MiB -> {after:7.1f} MiB  ({100 * (1 - after / before):4.1f}% less)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resorts", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365, help="days of history per resort")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=0)
+    base = f"http://127.0.0.1:{server.server_port}"
+    resorts = synthetic_resorts(args.resorts)
+    resorts["state"] = "CO"
+
+    try:
+        forecasts = fetch_forecasts(resorts, HOURLY_PARAMS, DAILY_PARAMS, requests_per_second=0, url=f"{base}/v1/forecast")
+        end_date = date.today() - timedelta(days=7)
+        history = fetch_historical(resorts, HISTORICAL_DAILY_PARAMS, end_date - timedelta(days=args.days - 1), end_date,
+                                   requests_per_second=0, url=f"{base}/v1/archive")
+    finally:
+        server.shutdown()
+
+    # The frames as get_weather_data and fetch_weather_data built them before schema.py
+    hourly = pd.concat([hourly for _, hourly, _ in forecasts], ignore_index=True)
+    daily = pd.concat([daily for _, _, daily in forecasts], ignore_index=True)
+    historical = pd.concat([df for _, df in history], ignore_index=True)
+    historical["time"] = pd.to_datetime(historical["time"]).dt.date
+
+    report("hourly", hourly, "hourly")
+    report("daily", daily, "daily")
+    report("historical_weather", historical, "historical_weather")
+    report("resorts", resorts[["id", "resort", "latitude", "longitude", "state"]], "resorts")
+
+
+if __name__ == "__main__":
+    main()
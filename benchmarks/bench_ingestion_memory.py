@@ -0,0 +1,86 @@
+import argparse
+import os
+import time
+import tracemalloc
+from types import SimpleNamespace
+import pandas as pd
+from openmeteo_client import fetch_forecasts
+from utils import get_weather_data, iter_weather_data
+from benchmarks.stub_openmeteo import start_stub_process
+from benchmarks.bench_forecast_fetch import HOURLY_PARAMS, DAILY_PARAMS
+from benchmarks.synthetic import synthetic_resorts
+
+'''
+Time and peak Python memory of the forecast ingestion path on synthetic input.
+
+    concat-in-loop : the old pd.concat([hourly_df, df]) per resort
+    collect-once   : get_weather_data, per batch chunks concatenated once
+    stream         : iter_weather_data, each batch handed to the writer and dropped
+
+Run from the repository root:
+    python -m benchmarks.bench_ingestion_memory --resorts 1000 --batch-size 10 --workers 4
+
+Peak memory of the stream mode is bounded by batch_size * workers resorts, not by --resorts.
+The stub runs in a child process so its allocations are not counted.
+'''
+
+
+def concat_in_loop(resorts, url, options):
+    hourly_df, daily_df = pd.DataFrame(), pd.DataFrame()
+    for _, hourly, daily in fetch_forecasts(resorts, HOURLY_PARAMS, DAILY_PARAMS, url=url, **options):
+        hourly_df = pd.concat([hourly_df, hourly])
+        daily_df = pd.concat([daily_df, daily])
+    return len(hourly_df)
+
+
+def collect_once(resorts, hourly_obj, daily_obj, options):
+    hourly_df, _ = get_weather_data(resorts, hourly_obj, daily_obj, **options)
+    return len(hourly_df)
+
+
+def stream(resorts, hourly_obj, daily_obj, options):
+    rows = 0
+    for hourly_df, _ in iter_weather_data(resorts, hourly_obj, daily_obj, **options):
+        rows += len(hourly_df)  # stands in for insert_hourly_rows
+    return rows
+
+
+def measure(name, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<15} {elapsed:7.2f}s  peak={peak / 2**20:8.1f} MiB  hourly rows={rows}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resorts", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    process, port = start_stub_process(latency=0)
+    url = f"http://127.0.0.1:{port}/v1/forecast"
+    resorts = synthetic_resorts(args.resorts)
+    options = {"batch_size": args.batch_size, "max_workers": args.workers, "requests_per_second": 0}
+
+    # get_weather_data only needs the parameter lists of the openmeteopy objects
+    hourly_obj = SimpleNamespace(hourly_params=HOURLY_PARAMS)
+    daily_obj = SimpleNamespace(daily_params=DAILY_PARAMS)
+
+    # The utils helpers call OpenMeteo without a url, point them at the stub
+    os.environ["OPENMETEO_FORECAST_URL"] = url
+
+    try:
+        measure("concat-in-loop", lambda: concat_in_loop(resorts, url, options))
+        measure("collect-once", lambda: collect_once(resorts, hourly_obj, daily_obj, options))
+        measure("stream", lambda: stream(resorts, hourly_obj, daily_obj, options))
+    finally:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    main()
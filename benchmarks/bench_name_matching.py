@@ -0,0 +1,110 @@
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# The data cleaning scripts are run from their directory and import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_cleaning"))
+from name_matching import NameIndex, normalize  # noqa: E402
+
+'''
+Speed and accuracy of the fuzzy resort name matching (data_cleaning/name_matching.py)
+joining the worldwide resorts.csv against thousands of scraped names.
+
+Scraped names are made from the resorts.csv names the way they drift between sources:
+dropped or added words ("Ski Resort", the town, a state suffix), "Mount" spelled "Mt.",
+lost accents, swapped letters and a few km of jitter on the coordinates. Accuracy is the
+share matched back to the resort they came from. The naive approach, difflib against every
+name (n x m), is timed on --naive queries and extrapolated.
+
+Run from the repository root:
+    python -m benchmarks.bench_name_matching --queries 5000
+'''
+
+SUFFIXES = ["Ski Resort", "Ski Area", "Mountain Resort", "Resort"]
+
+
+def perturb(name, rng):
+    words = name.replace("-", " ").split()
+    change = rng.random()
+    if change < 0.25 and len(words) > 1:
+        # Drop a word, e.g. the town in "Wenatchee-Mission Ridge"
+        words.pop(rng.randrange(len(words)))
+    elif change < 0.5:
+        words.append(rng.choice(SUFFIXES))
+    elif change < 0.65:
+        words = ["Mt." if word.lower() == "mount" else "Mount" if word.lower() == "mt." else word for word in words]
+        words.append(rng.choice(["WA", "CO", "UT"]))
+    text = " ".join(words)
+    if rng.random() < 0.5 and len(text) > 6:
+        # Swap two neighbouring letters
+        i = rng.randrange(1, len(text) - 2)
+        text = text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text
+
+
+def scraped_names(resorts, n, seed=0):
+    rng = random.Random(seed)
+    picks = [rng.randrange(len(resorts)) for _ in range(n)]
+    return pd.DataFrame({
+        "source": picks,
+        "Resort": [perturb(resorts["Resort"].iloc[i], rng) for i in picks],
+        "Latitude": [resorts["Latitude"].iloc[i] + rng.uniform(-0.05, 0.05) for i in picks],
+        "Longitude": [resorts["Longitude"].iloc[i] + rng.uniform(-0.05, 0.05) for i in picks],
+    })
+
+
+def naive_match(queries, names):
+    normalized = [normalize(name) for name in names]
+    best = []
+    for query in queries:
+        text = normalize(query)
+        scores = [difflib.SequenceMatcher(None, text, other).ratio() for other in normalized]
+        best.append(int(np.argmax(scores)))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resorts-file", default=os.path.join("data_cleaning", "resorts.csv"))
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--naive", type=int, default=300, help="queries timed with the naive all pairs difflib match")
+    args = parser.parse_args()
+
+    resorts = pd.read_csv(args.resorts_file, encoding="latin1", on_bad_lines="skip")
+    # Duplicated names can't be told apart by name, count a match to any copy as right
+    same_name = resorts.groupby(resorts["Resort"].map(normalize)).ngroup().to_numpy()
+    scraped = scraped_names(resorts, args.queries)
+
+    start = time.perf_counter()
+    index = NameIndex(resorts["Resort"], resorts["Latitude"], resorts["Longitude"])
+    built = time.perf_counter() - start
+
+    for label, coordinates in (("names only", False), ("with coords", True)):
+        start = time.perf_counter()
+        if coordinates:
+            matches = index.match(scraped["Resort"], scraped["Latitude"], scraped["Longitude"])
+        else:
+            matches = index.match(scraped["Resort"])
+        elapsed = time.perf_counter() - start
+        matched = matches["match"].to_numpy()
+        right = (matched >= 0) & (same_name[np.maximum(matched, 0)] == same_name[scraped["source"]])
+        print(f"index {label:12s} {elapsed:6.2f}s for {len(scraped)} names ({1000 * elapsed / len(scraped):.2f} ms/name, "
+              f"index built in {1000 * built:.0f} ms)  right={right.mean():.1%}  unmatched={(matched < 0).mean():.1%}  "
+              f"mean score={matches['score'].mean():.3f}")
+
+    sample = scraped.head(args.naive)
+    start = time.perf_counter()
+    best = np.array(naive_match(sample["Resort"], resorts["Resort"]))
+    elapsed = time.perf_counter() - start
+    right = same_name[best] == same_name[sample["source"]]
+    print(f"naive difflib          {elapsed:6.2f}s for {len(sample)} names ({1000 * elapsed / len(sample):.2f} ms/name, "
+          f"~{elapsed / len(sample) * len(scraped):.0f}s for {len(scraped)})  right={right.mean():.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import openrouteservice
+import pandas as pd
+from drive_time_cache import DriveTimeCache
+from utils import get_nearby_resorts_within_driving_distance
+from benchmarks.stub_ors import start_stub_server
+from benchmarks.synthetic import synthetic_resorts
+
+'''
+Latency and cache hit rate of the nearby resort search against the local ORS stub.
+
+Queries are drawn around a handful of cities with a few km of jitter, like users searching
+from the same towns, and run once without a cache and once through DriveTimeCache.
+Destinations per request shows how many resorts survive the straight-line prefilter.
+
+Run from the repository root:
+    python -m benchmarks.bench_nearby_search --queries 200 --latency 0.5
+    python -m benchmarks.bench_nearby_search --resorts 5000   # synthetic resorts instead of the csv
+'''
+
+CITIES = [
+    (47.66, -117.43),  # Spokane
+    (39.74, -104.99),  # Denver
+    (40.76, -111.89),  # Salt Lake City
+    (45.52, -122.68),  # Portland
+    (37.77, -122.42),  # San Francisco
+]
+
+
+def synthetic_queries(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        (lat + rng.uniform(-0.02, 0.02), lon + rng.uniform(-0.02, 0.02))
+        for lat, lon in (rng.choice(CITIES) for _ in range(n))
+    ]
+
+
+def run(queries, resorts, summary, client, drive_times, max_miles):
+    start = time.perf_counter()
+    found = 0
+    for lat, lon in queries:
+        found += len(get_nearby_resorts_within_driving_distance(None, resorts, summary, lat, lon, max_miles,
+                                                                drive_times=drive_times, client=client))
+    return time.perf_counter() - start, found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the stub waits per request")
+    parser.add_argument("--max-miles", type=float, default=400)
+    parser.add_argument("--resorts-file", default="final_resorts_us.csv")
+    parser.add_argument("--resorts", type=int, help="use this many synthetic resorts instead of --resorts-file")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    client = openrouteservice.Client(base_url=f"http://127.0.0.1:{server.server_port}")
+
+    resorts = synthetic_resorts(args.resorts).assign(state="") if args.resorts else pd.read_csv(args.resorts_file)
+    summary = pd.DataFrame({"id": resorts["id"], "snowfall_4d": 0.0, "weathercode_24h": 0})
+    queries = synthetic_queries(args.queries)
+
+    try:
+        elapsed, found = run(queries, resorts, summary, client, None, args.max_miles)
+        print(f"no cache      {elapsed:7.2f}s  {1000 * elapsed / len(queries):8.1f} ms/query  "
+              f"ORS requests={server.stats['requests']}  resorts found={found}  "
+              f"destinations/request={server.stats['destinations'] / max(server.stats['requests'], 1):.1f} of {len(resorts)}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            drive_times = DriveTimeCache(os.path.join(tmp, "drive_times.sqlite"))
+            requests_before = server.stats["requests"]
+            elapsed, found = run(queries, resorts, summary, client, drive_times, args.max_miles)
+            print(f"cell cache    {elapsed:7.2f}s  {1000 * elapsed / len(queries):8.1f} ms/query  "
+                  f"ORS requests={server.stats['requests'] - requests_before}  resorts found={found}")
+            print(f"cache stats   {drive_times.stats()}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
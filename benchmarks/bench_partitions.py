@@ -0,0 +1,93 @@
+import argparse
+import time
+from datetime import date, timedelta
+import psycopg2
+from data_access import explain_history, history_bucket, load_history
+from historical_partitions import list_partitions
+from historical_rollups import ROLLUP_BUCKETS
+from benchmarks.bench_app_cold_start import seed
+from benchmarks.pg_fixture import postgres
+from benchmarks.synthetic import STATES
+
+'''
+Dashboard query latency on the monthly partitioned historical_weather against the same rows
+in one plain table, on a synthetic 10 season, 1,000 resort dataset.
+
+seed() creates the resorts, historical_weather, hourly, daily and forecast_summary tables in
+a throwaway schema of the local Postgres (benchmarks/pg_fixture.py); historical_weather is
+copied into historical_weather_plain (unpartitioned, same primary key). For each filter
+selection it prints the time of both layouts and how many monthly partitions the plan
+actually scans. Ranges the dashboard reads from the week and
+season rollups are aggregated per month from the daily rows instead, the rollups don't touch
+the partitions.
+
+Run from the repository root:
+    python -m benchmarks.bench_partitions --dsn "dbname=postgres user=postgres host=localhost" --resorts 1000 --seasons 10
+'''
+
+TABLE = "historical_weather"
+PLAIN_TABLE = "historical_weather_plain"
+
+
+def timed(conn, table, states, selected, start_date, end_date, bucket, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        series = load_history(conn, table, "snowfall_sum", states, selected, start_date, end_date, bucket)
+    return 1000 * (time.perf_counter() - start) / repeats, len(series)
+
+
+def run_benchmark(args, dsn):
+    conn = psycopg2.connect(dsn)
+    history_rows, _ = seed(conn, args.resorts, args.seasons * 365)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE TABLE {PLAIN_TABLE} (LIKE {TABLE})")
+    cursor.execute(f"ALTER TABLE {PLAIN_TABLE} ADD PRIMARY KEY (id, time)")
+    cursor.execute(f"INSERT INTO {PLAIN_TABLE} SELECT * FROM {TABLE}")
+    cursor.execute("ANALYZE")
+    conn.commit()
+    partitions = len(list_partitions(cursor, TABLE))
+    print(f"Seeded {args.resorts} resorts, {history_rows} historical rows in {partitions} monthly partitions\n")
+
+    end = date.today() - timedelta(days=1)
+    cursor.execute("SELECT resort FROM resorts ORDER BY id LIMIT 3")
+    names = [row[0] for row in cursor.fetchall()]
+    cases = [
+        ("all states, 30 days", STATES, [], 30),
+        ("all states, 90 days", STATES, [], 90),
+        ("one state, 1 season", STATES[:1], [], 365),
+        ("3 resorts, all seasons", STATES, names, args.seasons * 365 - 1),
+        ("all states, all seasons", STATES, [], args.seasons * 365 - 1),
+    ]
+
+    for label, states, selected, days in cases:
+        start_date = end - timedelta(days=days)
+        bucket = history_bucket(start_date, end)
+        if bucket in ROLLUP_BUCKETS:
+            bucket = 'month'
+        plain_ms, rows = timed(conn, PLAIN_TABLE, states, selected, start_date, end, bucket, args.repeats)
+        partitioned_ms, _ = timed(conn, TABLE, states, selected, start_date, end, bucket, args.repeats)
+        _, _, scanned = explain_history(conn, TABLE, "snowfall_sum", states, selected, start_date, end, bucket)
+        print(f"{label:26s} plain {plain_ms:8.1f} ms   partitioned {partitioned_ms:8.1f} ms   "
+              f"({rows:6d} rows per {bucket}, "
+              f"{len(scanned - {'resorts'}):3d} of {partitions} partitions scanned)")
+
+    cursor.execute(f"DROP TABLE {PLAIN_TABLE}")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", help="Postgres to create a throwaway schema in, a temporary cluster when omitted")
+    parser.add_argument("--resorts", type=int, default=1000)
+    parser.add_argument("--seasons", type=int, default=10, help="years of synthetic history per resort")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    # Seeded into a throwaway schema, the tables of the app in that database are never touched
+    with postgres(args.dsn) as dsn:
+        run_benchmark(args, dsn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import time
+from datetime import date, timedelta
+import psycopg2
+from data_access import load_history
+from historical_rollups import refresh_rollups
+from benchmarks.bench_app_cold_start import seed
+from benchmarks.pg_fixture import postgres
+from benchmarks.synthetic import STATES
+
+'''
+Long range dashboard queries read from the weekly and season rollups, against aggregating
+the daily rows of historical_weather per month as the dashboard did before.
+
+seed() creates the resorts, historical_weather (with its rollups), hourly, daily and
+forecast_summary tables in a throwaway schema of the local Postgres (benchmarks/pg_fixture.py). For ranges of 1 to --seasons seasons it
+prints the time and rows of each query, then the time of the incremental rollup refresh
+after one new day against rebuilding the rollups from scratch.
+
+Run from the repository root:
+    python -m benchmarks.bench_rollups --dsn "dbname=postgres user=postgres host=localhost" --resorts 1000 --seasons 10
+'''
+
+TABLE = "historical_weather"
+
+
+def timed(conn, states, start_date, end_date, bucket, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        series = load_history(conn, TABLE, "snowfall_sum", states, [], start_date, end_date, bucket)
+    return 1000 * (time.perf_counter() - start) / repeats, len(series)
+
+
+def run_benchmark(args, dsn):
+    conn = psycopg2.connect(dsn)
+    history_rows, _ = seed(conn, args.resorts, args.seasons * 365)
+    cursor = conn.cursor()
+    cursor.execute("ANALYZE")
+    conn.commit()
+    print(f"Seeded {args.resorts} resorts, {history_rows} historical rows\n")
+
+    end = date.today() - timedelta(days=1)
+    for seasons in sorted({1, 2, 5, args.seasons}):
+        if seasons > args.seasons:
+            continue
+        start_date = end - timedelta(days=seasons * 365 - 1)
+        line = f"all states, {seasons:2d} seasons"
+        for bucket in ("month", "week", "season"):
+            ms, rows = timed(conn, STATES, start_date, end, bucket, args.repeats)
+            line += f"   {bucket} {ms:7.1f} ms ({rows:6d} rows)"
+        print(line)
+
+    start = time.perf_counter()
+    rows = refresh_rollups(cursor, TABLE, end, end)
+    conn.commit()
+    print(f"\nrefresh after one new day: {1000 * (time.perf_counter() - start):7.1f} ms ({rows} rollup rows)")
+
+    start = time.perf_counter()
+    rows = refresh_rollups(cursor, TABLE)
+    conn.commit()
+    print(f"full rollup rebuild:       {1000 * (time.perf_counter() - start):7.1f} ms ({rows} rollup rows)")
+
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", help="Postgres to create a throwaway schema in, a temporary cluster when omitted")
+    parser.add_argument("--resorts", type=int, default=1000)
+    parser.add_argument("--seasons", type=int, default=10, help="years of synthetic history per resort")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # Seeded into a throwaway schema, the tables of the app in that database are never touched
+    with postgres(args.dsn) as dsn:
+        run_benchmark(args, dsn)
+
+
+if __name__ == "__main__":
+    main()
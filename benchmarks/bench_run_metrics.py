@@ -0,0 +1,64 @@
+import argparse
+import io
+import time
+from contextlib import redirect_stdout
+import run_metrics
+from openmeteo_client import fetch_forecasts
+from benchmarks.stub_openmeteo import start_stub_server
+from benchmarks.bench_forecast_fetch import HOURLY_PARAMS, DAILY_PARAMS
+from benchmarks.synthetic import synthetic_resorts
+
+'''
+Overhead of the run_metrics instrumentation on the forecast fetch, against the local
+OpenMeteo stub with no added latency (the worst case, nothing to hide the bookkeeping behind).
+
+Each repeat fetches every resort once outside a run and once inside run_metrics.run (in
+alternating order), then the best times and the stage totals of the last run are printed.
+
+Run from the repository root:
+    python -m benchmarks.bench_run_metrics --resorts 2000 --repeats 5
+'''
+
+
+def fetch(resorts, url, batch_size):
+    start = time.perf_counter()
+    fetch_forecasts(resorts, HOURLY_PARAMS, DAILY_PARAMS, batch_size=batch_size, requests_per_second=0, url=url)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resorts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=0)
+    url = f"http://127.0.0.1:{server.server_port}/v1/forecast"
+    resorts = synthetic_resorts(args.resorts)
+
+    plain, measured = [], []
+    try:
+        # The progress lines and the JSON report are not part of the output
+        with redirect_stdout(io.StringIO()):
+            for repeat in range(args.repeats):
+                # Alternate which one goes first, the second fetch of a pair tends to be faster
+                if repeat % 2:
+                    plain.append(fetch(resorts, url, args.batch_size))
+                with run_metrics.run("bench") as metrics:
+                    measured.append(fetch(resorts, url, args.batch_size))
+                if not repeat % 2:
+                    plain.append(fetch(resorts, url, args.batch_size))
+    finally:
+        server.shutdown()
+
+    best_plain, best_measured = min(plain), min(measured)
+    print(f"without metrics {best_plain:.3f}s   with metrics {best_measured:.3f}s   "
+          f"overhead {100 * (best_measured / best_plain - 1):+.1f}%")
+    for stage, stats in metrics.report()["stages"].items():
+        print(f"{stage:22s} {stats['calls']:6d} calls  {stats['seconds']:8.3f}s  max {stats['max_seconds']:.4f}s")
+    print(metrics.report()["counters"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+from benchmarks.stub_search import start_stub_server
+
+# The data cleaning scripts are run from their directory and import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_cleaning"))
+from clean_data2_scrape import HttpFetcher, parse_resort_page, search_url  # noqa: E402
+from scrape_runner import CheckpointStore, PageCache, scrape_resorts  # noqa: E402
+
+'''
+The resort scraper (data_cleaning/clean_data2_scrape.py) against locally served HTML fixtures.
+
+The search stub answers with a results page per resort in --resorts-file, plus --unknown
+made up resorts it has no results for. Runs, each counted against the fixture coordinates:
+
+    serial      one worker, like the original script
+    parallel    --workers workers
+    resume      half of the resorts, "crash", then all of them: only the rest is fetched
+    rerun       everything is in the checkpoint, nothing is fetched
+    offline     parse the cached pages again without a fetcher
+
+Pages are fetched with HttpFetcher, the fixtures need no browser.
+
+Run from the repository root:
+    python -m benchmarks.bench_scraper --workers 4 --latency 1 --delay 0.5
+'''
+
+
+def run(resorts, base_url, workers, delay, cache, checkpoints, fetch=True):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = scrape_resorts(
+            resorts,
+            url=lambda resort: search_url(resort["Resort"], base_url),
+            parse=lambda html, resort: parse_resort_page(html, resort["Resort"]),
+            open_fetcher=HttpFetcher if fetch else None,
+            workers=workers,
+            delay=delay,
+            cache=cache,
+            checkpoints=checkpoints,
+        )
+    return time.perf_counter() - start, found
+
+
+def count_right(resorts, found, known):
+    '''
+    (coordinates right, states right) over the known resorts. The coordinates and the pages
+    without results are asserted in tests/test_scraper.py; states are only counted, the state
+    patterns can't read multi-word names like "New Mexico".
+    '''
+    coordinates, states = 0, 0
+    for resort, (lat, lng, state) in zip(resorts, found):
+        if resort["Resort"] in known:
+            coordinates += (lat, lng) == (round(float(resort["Latitude"]), 4), round(float(resort["Longitude"]), 4))
+            states += state == resort["State"]
+    return coordinates, states
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resorts-file", default=os.path.join("data_cleaning", "final_resorts_us.csv"))
+    parser.add_argument("--unknown", type=int, default=3, help="resorts the stub has no results for")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds the stub takes per page, like a browser load")
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds each worker waits between requests")
+    args = parser.parse_args()
+
+    with open(args.resorts_file) as f:
+        known = list(csv.DictReader(f))
+    resorts = known + [{"Resort": f"Nowhere Ridge {i}", "State": ""} for i in range(args.unknown)]
+    names = {resort["Resort"] for resort in known}
+
+    server = start_stub_server(known, latency=args.latency)
+    base_url = f"http://127.0.0.1:{server.server_port}/search"
+
+    def report(label, elapsed, found, requests_before):
+        coordinates, states = count_right(resorts, found, names)
+        print(f"{label:10s} {elapsed:7.2f}s  pages fetched={server.stats['requests'] - requests_before:4d}  "
+              f"coordinates right={coordinates}/{len(known)}  states right={states}/{len(known)}")
+
+    try:
+        for label, workers in (("serial", 1), ("parallel", args.workers)):
+            with tempfile.TemporaryDirectory() as tmp:
+                before = server.stats["requests"]
+                elapsed, found = run(resorts, base_url, workers, args.delay, PageCache(os.path.join(tmp, "pages")),
+                                     CheckpointStore(os.path.join(tmp, "checkpoint.jsonl")))
+                report(label, elapsed, found, before)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PageCache(os.path.join(tmp, "pages"))
+            checkpoint_path = os.path.join(tmp, "checkpoint.jsonl")
+
+            # A run that stops half way, then a new run over every resort
+            half = len(resorts) // 2
+            run(resorts[:half], base_url, args.workers, args.delay, cache, CheckpointStore(checkpoint_path))
+            before = server.stats["requests"]
+            elapsed, found = run(resorts, base_url, args.workers, args.delay, cache, CheckpointStore(checkpoint_path))
+            report("resume", elapsed, found, before)
+
+            before = server.stats["requests"]
+            elapsed, found = run(resorts, base_url, args.workers, args.delay, cache, CheckpointStore(checkpoint_path))
+            report("rerun", elapsed, found, before)
+
+            before = server.stats["requests"]
+            elapsed, found = run(resorts, base_url, args.workers, args.delay, cache, None, fetch=False)
+            report("offline", elapsed, found, before)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
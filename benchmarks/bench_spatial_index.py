@@ -0,0 +1,76 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from spatial_index import ResortIndex, haversine_miles
+
+'''
+Query latency of spatial_index.ResortIndex against a full NumPy scan of every resort.
+
+Synthetic resorts are clustered around mountain ranges of the western US plus a uniform
+background over North America, so cells have uneven densities like the real data.
+
+Run from the repository root:
+    python -m benchmarks.bench_spatial_index --sizes 10000 100000 --queries 1000
+'''
+
+RANGES = [(39.5, -106.0), (40.6, -111.6), (46.8, -121.7), (44.0, -71.5), (38.9, -120.0)]
+
+
+def synthetic_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    clustered = n * 3 // 4
+    centers = np.array(RANGES)[rng.integers(len(RANGES), size=clustered)]
+    lats = np.concatenate([centers[:, 0] + rng.normal(0, 1.5, clustered), rng.uniform(25, 60, n - clustered)])
+    lons = np.concatenate([centers[:, 1] + rng.normal(0, 2.0, clustered), rng.uniform(-130, -65, n - clustered)])
+    return pd.DataFrame({"id": np.arange(1, n + 1), "latitude": lats, "longitude": lons})
+
+
+def mean_microseconds(query, points):
+    start = time.perf_counter()
+    for point in points:
+        query(*point)
+    return 1e6 * (time.perf_counter() - start) / len(points)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--radius", type=float, default=100, help="miles")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    points = list(zip(rng.uniform(30, 50, args.queries), rng.uniform(-125, -70, args.queries)))
+
+    for size in args.sizes:
+        resorts = synthetic_points(size)
+        lats, lons = resorts["latitude"].to_numpy(), resorts["longitude"].to_numpy()
+
+        start = time.perf_counter()
+        index = ResortIndex(resorts)
+        build_ms = 1000 * (time.perf_counter() - start)
+
+        def scan_radius(lat, lon):
+            distances = haversine_miles(lat, lon, lats, lons)
+            keep = np.nonzero(distances <= args.radius)[0]
+            return keep[np.argsort(distances[keep])]
+
+        def scan_nearest(lat, lon):
+            return np.argsort(haversine_miles(lat, lon, lats, lons))[:args.k]
+
+        def scan_bbox(lat, lon):
+            return np.nonzero((lats >= lat - 1) & (lats <= lat + 1) & (lons >= lon - 1) & (lons <= lon + 1))[0]
+
+        print(f"{size} resorts, index built in {build_ms:.1f} ms")
+        print(f"  radius {args.radius:g} mi  index {mean_microseconds(lambda lat, lon: index.within_radius(lat, lon, args.radius), points):8.1f} us"
+              f"   scan {mean_microseconds(scan_radius, points):8.1f} us")
+        print(f"  {args.k} nearest     index {mean_microseconds(lambda lat, lon: index.k_nearest(lat, lon, args.k), points):8.1f} us"
+              f"   scan {mean_microseconds(scan_nearest, points):8.1f} us")
+        print(f"  2x2 deg bbox   index {mean_microseconds(lambda lat, lon: index.in_bbox(lat - 1, lon - 1, lat + 1, lon + 1), points):8.1f} us"
+              f"   scan {mean_microseconds(scan_bbox, points):8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
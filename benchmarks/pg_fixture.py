@@ -0,0 +1,88 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extensions import make_dsn
+
+'''
+Throwaway Postgres databases for the benchmarks.
+
+    with postgres(dsn) as bench_dsn:
+        conn = psycopg2.connect(bench_dsn)
+
+With a dsn, the benchmark gets its own schema in that database (bench_<random>, the only schema on
+the search_path of every connection made with bench_dsn), dropped with everything in it
+afterwards, so the tables of the app in that database are never touched.
+
+Without a dsn, a temporary cluster is created with initdb and started with pg_ctl on a
+unix socket in a temporary directory, and removed afterwards. The Postgres binaries are
+looked up on the PATH, or in PG_BIN.
+'''
+
+
+def pg_binary(name):
+    path = shutil.which(name, path=os.getenv("PG_BIN")) or shutil.which(name)
+    if path is None:
+        raise RuntimeError(f"{name} not found, install Postgres, set PG_BIN to its bin directory or pass --dsn")
+    return path
+
+
+def pg_run(*args):
+    result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        # initdb refuses to run as root, for one, say why instead of just the exit status
+        raise RuntimeError(f"{os.path.basename(args[0])} failed: {result.stderr.strip()}")
+
+
+@contextmanager
+def temporary_cluster():
+    '''
+    Start a Postgres cluster in a temporary directory, yield its dsn, then stop and delete it.
+    '''
+    directory = tempfile.mkdtemp(prefix="bench-pg-")
+    data = os.path.join(directory, "data")
+    try:
+        pg_run(pg_binary("initdb"), "-D", data, "-U", "postgres", "-A", "trust")
+        # Only a unix socket, no TCP port to collide with
+        pg_run(pg_binary("pg_ctl"), "-D", data, "-w", "-l", os.path.join(directory, "log"),
+               "-o", f"-k {directory} -c listen_addresses='' -c fsync=off", "start")
+        try:
+            yield make_dsn(host=directory, user="postgres", dbname="postgres")
+        finally:
+            subprocess.run([pg_binary("pg_ctl"), "-D", data, "-m", "fast", "stop"], stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def isolated_schema(dsn):
+    '''
+    Create a new schema in the database of dsn, yield a dsn whose connections only see it,
+    then drop the schema.
+    '''
+    schema = f"bench_{uuid.uuid4().hex[:8]}"
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    conn.cursor().execute(f"CREATE SCHEMA {schema}")
+    try:
+        yield make_dsn(dsn, options=f"-c search_path={schema}")
+    finally:
+        conn.cursor().execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+
+
+@contextmanager
+def postgres(dsn=None):
+    '''
+    A dsn for an empty schema, in the database of dsn or in a temporary cluster when dsn is None.
+    '''
+    if dsn:
+        with isolated_schema(dsn) as bench_dsn:
+            yield bench_dsn
+        return
+
+    with temporary_cluster() as cluster_dsn, isolated_schema(cluster_dsn) as bench_dsn:
+        yield bench_dsn
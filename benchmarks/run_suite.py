@@ -0,0 +1,275 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+import openrouteservice
+import psycopg2
+from geopy.geocoders import Nominatim
+from data_access import load_forecast_summary, load_history, load_resorts
+from utils import (get_nearby_resorts_within_driving_distance, get_weather_data, insert_daily_df, insert_hourly_df,
+                   populate_weather_data, stream_weather_data)
+from benchmarks import stub_nominatim, stub_openmeteo, stub_ors
+from benchmarks.bench_app_cold_start import seed
+from benchmarks.bench_forecast_fetch import DAILY_PARAMS, HOURLY_PARAMS
+from benchmarks.pg_fixture import postgres
+from benchmarks.synthetic import STATES, synthetic_daily, synthetic_hourly, synthetic_resorts
+
+'''
+The whole benchmark suite against local stand-ins, with the results saved as JSON.
+
+OpenMeteo, OpenRouteService and Nominatim are replaced by the stub servers in this package
+(with --latency seconds per request) and Supabase by a throwaway Postgres schema (see
+pg_fixture.py; without --dsn a temporary cluster is started). Data comes from synthetic.py,
+--resorts resorts with --days days of history, so runs are reproducible.
+
+Benchmarks, each repeated --repeats times:
+    get_weather_data        forecast fetch and reshaping for every resort
+    insert_hourly_df        drop and reload the hourly table
+    insert_daily_df         drop and reload the daily table
+    stream_weather_data     the forecast refresh of populate_forecast, staging and upsert
+    populate_weather_data   historical fetch of --days days into an empty table
+    load_data               the app's queries: resorts, forecast summary, 90 days and all history
+    nearby_search           geocode an address and search resorts within driving distance
+
+Results go to --output (benchmarks/results/<time>.json by default). With --compare, the
+medians are compared to an earlier results file and the run fails if any benchmark got
+slower by more than --threshold.
+
+Run from the repository root:
+    python -m benchmarks.run_suite --resorts 200 --days 365
+    python -m benchmarks.run_suite --dsn "dbname=postgres user=postgres host=localhost" --compare benchmarks/results/baseline.json
+'''
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def timed(repeats, setup, run):
+    '''
+    Call setup() then run(state) `repeats` times, timing only run. Returns (seconds, last result).
+    '''
+    seconds, result = [], None
+    for _ in range(repeats):
+        state = setup()
+        start = time.perf_counter()
+        result = run(state)
+        seconds.append(time.perf_counter() - start)
+    return seconds, result
+
+
+def quiet(function):
+    '''
+    The benchmarked code prints progress lines, keep the report readable.
+    '''
+    def wrapper(*args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def bench_get_weather_data(env):
+    resorts = synthetic_resorts(env.args.resorts)
+    seconds, (hourly, daily) = timed(env.args.repeats, lambda: None, quiet(
+        lambda _: get_weather_data(resorts, env.hourly_obj, env.daily_obj, requests_per_second=0)))
+    return seconds, {"hourly_rows": len(hourly), "daily_rows": len(daily)}
+
+
+def bench_insert(env, frame, insert):
+    conn = env.conn
+
+    def run(_):
+        insert(frame, conn.cursor(), conn)
+        return len(frame)
+
+    seconds, rows = timed(env.args.repeats, lambda: None, quiet(run))
+    return seconds, {"rows": rows, "rows_per_second": round(rows / statistics.median(seconds))}
+
+
+def bench_stream_weather_data(env):
+    conn = env.conn
+    resorts = env.resorts
+    seconds, stats = timed(env.args.repeats, lambda: None, quiet(
+        lambda _: stream_weather_data(resorts, env.hourly_obj, env.daily_obj, conn.cursor(), conn, requests_per_second=0)))
+    return seconds, {key: value for key, value in stats.items() if key != "lock_seconds"}
+
+
+def bench_populate_weather_data(env):
+    conn = env.conn
+    end_date = date.today() - timedelta(days=1)
+
+    def setup():
+        cursor = conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS historical_weather_by_week, historical_weather_by_season, historical_weather")
+        conn.commit()
+
+    def run(_):
+        cursor = conn.cursor()
+        populate_weather_data(conn, cursor, "historical_weather", start_date=end_date - timedelta(days=env.args.days - 1),
+                              end_date=end_date)
+        cursor.execute("SELECT COUNT(*) FROM historical_weather")
+        return cursor.fetchone()[0]
+
+    seconds, rows = timed(env.args.repeats, setup, quiet(run))
+    return seconds, {"rows": rows}
+
+
+def bench_load_data(env):
+    conn = env.conn
+    end = date.today() - timedelta(days=1)
+
+    def run(_):
+        rows = len(load_resorts(conn)) + len(load_forecast_summary(conn))
+        rows += len(load_history(conn, "historical_weather", "snowfall_sum", STATES, [], end - timedelta(days=89), end))
+        rows += len(load_history(conn, "historical_weather", "snowfall_sum", STATES, [], end - timedelta(days=env.args.days - 1), end))
+        conn.rollback()
+        return rows
+
+    seconds, rows = timed(env.args.repeats, lambda: None, run)
+    return seconds, {"rows": rows}
+
+
+def bench_nearby_search(env):
+    resorts = load_resorts(env.conn)
+    summary = load_forecast_summary(env.conn)
+    env.conn.rollback()
+    addresses = [f"{name} street {i}" for i, name in enumerate(stub_nominatim.CITIES)]
+
+    def run(_):
+        found = 0
+        for address in addresses:
+            location = env.geolocator.geocode(address)
+            found += len(get_nearby_resorts_within_driving_distance(None, resorts, summary, location.latitude, location.longitude,
+                                                                    env.args.max_miles, client=env.ors_client))
+        return found
+
+    seconds, found = timed(env.args.repeats, lambda: None, quiet(run))
+    return [s / len(addresses) for s in seconds], {"queries": len(addresses), "resorts_found": found}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    '''
+    Print the median of every benchmark against the baseline file. Returns the names that regressed.
+    '''
+    with open(baseline_path) as f:
+        baseline = {result["name"]: result for result in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\nCompared to {baseline_path}:")
+    for result in results:
+        before = baseline.get(result["name"])
+        if before is None:
+            print(f"  {result['name']:24s} new")
+            continue
+        ratio = result["median_seconds"] / before["median_seconds"]
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(result["name"])
+        print(f"  {result['name']:24s} {before['median_seconds']:9.4f}s -> {result['median_seconds']:9.4f}s  "
+              f"{ratio:5.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", help="Postgres to create a throwaway schema in, a temporary cluster when omitted")
+    parser.add_argument("--resorts", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365, help="days of history per resort")
+    parser.add_argument("--hours", type=int, default=7 * 24, help="hours of forecast per resort for the insert benchmarks")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds each stub waits per request")
+    parser.add_argument("--max-miles", type=float, default=400)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown counted as a regression, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    openmeteo = stub_openmeteo.start_stub_server(latency=args.latency)
+    ors = stub_ors.start_stub_server(latency=args.latency)
+    nominatim = stub_nominatim.start_stub_server(latency=args.latency)
+    stub_openmeteo.use_stub(openmeteo)
+
+    started_at = datetime.now(timezone.utc)
+    results = []
+    try:
+        with postgres(args.dsn) as dsn:
+            conn = psycopg2.connect(dsn)
+            # Resorts, history and forecast tables for the benchmarks that read them
+            seed(conn, args.resorts, args.days)
+            resorts = load_resorts(conn)
+            conn.commit()
+
+            env = SimpleNamespace(
+                args=args, conn=conn, resorts=resorts,
+                hourly_obj=SimpleNamespace(hourly_params=HOURLY_PARAMS),
+                daily_obj=SimpleNamespace(daily_params=DAILY_PARAMS),
+                ors_client=openrouteservice.Client(base_url=f"http://127.0.0.1:{ors.server_port}"),
+                geolocator=Nominatim(user_agent="snowfall-bench", domain=f"127.0.0.1:{nominatim.server_port}", scheme="http"),
+            )
+            hourly = synthetic_hourly(resorts, args.hours)
+            daily = synthetic_daily(resorts, max(args.hours // 24, 1))
+
+            benchmarks = {
+                "get_weather_data": lambda: bench_get_weather_data(env),
+                "insert_hourly_df": lambda: bench_insert(env, hourly, insert_hourly_df),
+                "insert_daily_df": lambda: bench_insert(env, daily, insert_daily_df),
+                "stream_weather_data": lambda: bench_stream_weather_data(env),
+                "populate_weather_data": lambda: bench_populate_weather_data(env),
+                "load_data": lambda: bench_load_data(env),
+                "nearby_search": lambda: bench_nearby_search(env),
+            }
+            for name, bench in benchmarks.items():
+                if args.only and name not in args.only:
+                    continue
+                seconds, extra = bench()
+                result = {
+                    "name": name,
+                    "seconds": [round(s, 6) for s in seconds],
+                    "median_seconds": round(statistics.median(seconds), 6),
+                    "min_seconds": round(min(seconds), 6),
+                    **extra,
+                }
+                results.append(result)
+                print(f"{name:24s} median {result['median_seconds']:9.4f}s  min {result['min_seconds']:9.4f}s  {extra}")
+
+            conn.close()
+    finally:
+        for server in (openmeteo, ors, nominatim):
+            server.shutdown()
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("dsn", "output", "compare")},
+        "stub_requests": {"openmeteo": openmeteo.stats["requests"], "ors": ors.stats["requests"],
+                          "nominatim": nominatim.stats["requests"]},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{started_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
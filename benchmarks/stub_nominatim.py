@@ -0,0 +1,130 @@
+import hashlib
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+'''
+Local stand-in for the Nominatim geocoding API.
+
+GET /search?q=... answers like the real service with one match: a handful of known cities
+are placed where they are, any other address at a deterministic point in the continental
+US derived from its text. GET /reverse?lat=...&lon=... answers with the US state whose
+approximate center is nearest. Both sleep `latency` seconds first.
+
+Point a geopy geocoder at it with domain and scheme:
+
+    server = start_stub_server(latency=0.3)
+    geolocator = Nominatim(user_agent="bench", domain=f"127.0.0.1:{server.server_port}", scheme="http")
+'''
+
+CITIES = {
+    "spokane": (47.66, -117.43),
+    "seattle": (47.61, -122.33),
+    "portland": (45.52, -122.68),
+    "denver": (39.74, -104.99),
+    "salt lake city": (40.76, -111.89),
+    "san francisco": (37.77, -122.42),
+    "boston": (42.36, -71.06),
+    "burlington": (44.48, -73.21),
+}
+
+# Approximate geographic centers of the states
+STATE_CENTERS = {
+    "Alabama": (32.8, -86.8), "Arizona": (34.3, -111.7), "Arkansas": (34.9, -92.4),
+    "California": (37.2, -119.5), "Colorado": (39.0, -105.5), "Connecticut": (41.6, -72.7),
+    "Delaware": (39.0, -75.5), "Florida": (28.6, -82.4), "Georgia": (32.7, -83.4),
+    "Idaho": (44.4, -114.6), "Illinois": (40.0, -89.2), "Indiana": (39.9, -86.3),
+    "Iowa": (42.1, -93.5), "Kansas": (38.5, -98.4), "Kentucky": (37.5, -85.3),
+    "Louisiana": (31.1, -92.0), "Maine": (45.4, -69.2), "Maryland": (39.1, -76.8),
+    "Massachusetts": (42.3, -71.8), "Michigan": (44.3, -85.4), "Minnesota": (46.3, -94.3),
+    "Mississippi": (32.7, -89.7), "Missouri": (38.4, -92.5), "Montana": (47.0, -109.6),
+    "Nebraska": (41.5, -99.8), "Nevada": (39.3, -116.6), "New Hampshire": (43.7, -71.6),
+    "New Jersey": (40.2, -74.7), "New Mexico": (34.4, -106.1), "New York": (42.9, -75.5),
+    "North Carolina": (35.6, -79.4), "North Dakota": (47.5, -100.5), "Ohio": (40.3, -82.8),
+    "Oklahoma": (35.6, -97.5), "Oregon": (43.9, -120.6), "Pennsylvania": (40.9, -77.8),
+    "Rhode Island": (41.7, -71.5), "South Carolina": (33.9, -80.9), "South Dakota": (44.4, -100.2),
+    "Tennessee": (35.9, -86.4), "Texas": (31.5, -99.3), "Utah": (39.3, -111.7),
+    "Vermont": (44.1, -72.7), "Virginia": (37.5, -78.9), "Washington": (47.4, -120.5),
+    "West Virginia": (38.6, -80.6), "Wisconsin": (44.6, -89.9), "Wyoming": (43.0, -107.6),
+    "Alaska": (64.7, -152.0), "Hawaii": (20.3, -156.4),
+}
+
+
+def geocode(query):
+    text = query.lower()
+    for city, point in CITIES.items():
+        if city in text:
+            return point
+    digest = hashlib.sha256(text.encode()).digest()
+    return 32 + digest[0] / 255 * 16, -124 + digest[1] / 255 * 54
+
+
+def nearest_state(lat, lon):
+    return min(STATE_CENTERS, key=lambda state: math.hypot(STATE_CENTERS[state][0] - lat,
+                                                           (STATE_CENTERS[state][1] - lon) * math.cos(math.radians(lat))))
+
+
+def make_handler(latency, stats):
+
+    class StubHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+            time.sleep(latency)
+            with stats["lock"]:
+                stats["requests"] += 1
+
+            if url.path.startswith("/search"):
+                lat, lon = geocode(query.get("q", ""))
+                self.send_json(200, [{
+                    "place_id": abs(hash((lat, lon))) % 10**8,
+                    "lat": f"{lat:.6f}",
+                    "lon": f"{lon:.6f}",
+                    "display_name": query.get("q", ""),
+                    "class": "place",
+                    "type": "city",
+                    "importance": 0.5,
+                }])
+            elif url.path.startswith("/reverse"):
+                lat, lon = float(query["lat"]), float(query["lon"])
+                state = nearest_state(lat, lon)
+                self.send_json(200, {
+                    "place_id": abs(hash((lat, lon))) % 10**8,
+                    "lat": query["lat"],
+                    "lon": query["lon"],
+                    "display_name": f"{state}, United States",
+                    "address": {"state": state, "country": "United States", "country_code": "us"},
+                })
+            else:
+                self.send_json(404, {"error": f"Unknown endpoint {url.path}"})
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(latency=0.3, port=0):
+    '''
+    Start the stub on a background thread. port=0 picks a free port.
+    The request count is available as server.stats["requests"].
+    '''
+    stats = {"requests": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,156 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+'''
+Local stand-in for the OpenMeteo forecast and historical APIs.
+
+Answers GET /v1/forecast with JSON shaped like the real response
+(7 days of hourly values and 7 daily values, like meteo_hourly.csv and meteo_daily.csv)
+and GET /v1/archive with daily values between start_date and end_date,
+after sleeping `latency` seconds to mimic the network round trip.
+Comma separated coordinate lists get a list of locations back, like the real API,
+and a coordinate out of range fails the whole request with HTTP 400.
+
+    server = start_stub_server(latency=0.2)
+    url = f"http://127.0.0.1:{server.server_port}/v1/forecast"
+    ...
+    server.shutdown()
+'''
+
+FORECAST_DAYS = 7
+
+
+def fake_series(name, count, seed):
+    '''
+    Deterministic fake values for a variable. Codes and directions are integers like the real API.
+    '''
+    if name == "weathercode":
+        return [(0, 3, 71, 73)[(seed + i) % 4] for i in range(count)]
+    if name.startswith("winddirection"):
+        return [(seed * 37 + i * 11) % 360 for i in range(count)]
+    return [round(((seed + i) % 17) * 0.3, 2) for i in range(count)]
+
+
+def forecast_payload(latitude, longitude, hourly_params, daily_params):
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    seed = int(abs(latitude * 100 + longitude * 10))
+    payload = {"latitude": latitude, "longitude": longitude, "timezone": "UTC"}
+
+    if hourly_params:
+        hours = FORECAST_DAYS * 24
+        payload["hourly"] = {"time": [(start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M") for i in range(hours)]}
+        for name in hourly_params:
+            payload["hourly"][name] = fake_series(name, hours, seed)
+
+    if daily_params:
+        payload["daily"] = {"time": [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(FORECAST_DAYS)]}
+        for name in daily_params:
+            payload["daily"][name] = fake_series(name, FORECAST_DAYS, seed)
+
+    return payload
+
+
+def historical_payload(latitude, longitude, daily_params, start_date, end_date):
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    days = (datetime.strptime(end_date, "%Y-%m-%d") - start).days + 1
+    seed = int(abs(latitude * 100 + longitude * 10))
+
+    payload = {"latitude": latitude, "longitude": longitude, "timezone": "UTC"}
+    payload["daily"] = {"time": [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]}
+    for name in daily_params:
+        payload["daily"][name] = fake_series(name, days, seed)
+    return payload
+
+
+def make_handler(latency, stats):
+
+    class StubHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            hourly_params = query["hourly"][0].split(",") if "hourly" in query else []
+            daily_params = query["daily"][0].split(",") if "daily" in query else []
+
+            latitudes = [float(value) for value in query["latitude"][0].split(",")]
+            longitudes = [float(value) for value in query["longitude"][0].split(",")]
+
+            time.sleep(latency)
+            with stats["lock"]:
+                stats["requests"] += 1
+
+            if any(abs(lat) > 90 for lat in latitudes) or any(abs(lon) > 180 for lon in longitudes):
+                self.send_json(400, {"error": True, "reason": "Latitude must be in range of -90 to 90°."})
+                return
+
+            if url.path.endswith("/archive"):
+                locations = [
+                    historical_payload(lat, lon, daily_params, query["start_date"][0], query["end_date"][0])
+                    for lat, lon in zip(latitudes, longitudes)
+                ]
+            else:
+                locations = [
+                    forecast_payload(lat, lon, hourly_params, daily_params)
+                    for lat, lon in zip(latitudes, longitudes)
+                ]
+
+            self.send_json(200, locations if len(locations) > 1 else locations[0])
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(latency=0.2, port=0):
+    '''
+    Start the stub on a background thread. port=0 picks a free port.
+    The request count is available as server.stats["requests"].
+    '''
+    stats = {"requests": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def use_stub(server):
+    '''
+    Point code that calls OpenMeteo without a url (get_weather_data, stream_weather_data,
+    populate_weather_data) at the stub, through OPENMETEO_FORECAST_URL and OPENMETEO_HISTORICAL_URL.
+    '''
+    base = f"http://127.0.0.1:{server.server_port}"
+    os.environ["OPENMETEO_FORECAST_URL"] = base + "/v1/forecast"
+    os.environ["OPENMETEO_HISTORICAL_URL"] = base + "/v1/archive"
+
+
+def _serve(latency, port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency, {"requests": 0, "lock": threading.Lock()}))
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def start_stub_process(latency=0.2):
+    '''
+    Start the stub in a child process, so its own allocations do not show up in memory
+    measurements of the calling process. Returns (process, port); call process.terminate() when done.
+    '''
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(latency, port_queue), daemon=True)
+    process.start()
+    return process, port_queue.get()
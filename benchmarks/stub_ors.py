@@ -0,0 +1,71 @@
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+'''
+Local stand-in for the OpenRouteService matrix API.
+
+Answers POST /v2/matrix/<profile> like the real service, with road distance approximated
+as 1.3 x the great-circle distance and durations at 55 mph, after sleeping `latency` seconds.
+Point an openrouteservice.Client at it with base_url:
+
+    server = start_stub_server(latency=0.5)
+    client = openrouteservice.Client(base_url=f"http://127.0.0.1:{server.server_port}")
+'''
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+def crow_flies_miles(lon1, lat1, lon2, lat2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def make_handler(latency, stats):
+
+    class StubHandler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            locations = body["locations"]
+            sources = body.get("sources", range(len(locations)))
+            destinations = body.get("destinations", range(len(locations)))
+
+            time.sleep(latency)
+            with stats["lock"]:
+                stats["requests"] += 1
+                stats["destinations"] += len(destinations)
+
+            distances = [
+                [round(1.3 * crow_flies_miles(*locations[s], *locations[d]), 2) for d in destinations]
+                for s in sources
+            ]
+            durations = [[round(miles / 55 * 3600, 1) for miles in row] for row in distances]
+
+            payload = json.dumps({"distances": distances, "durations": durations}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(latency=0.5, port=0):
+    '''
+    Start the stub on a background thread. port=0 picks a free port.
+    Request and destination counts are available in server.stats.
+    '''
+    stats = {"requests": 0, "destinations": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
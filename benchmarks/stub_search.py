@@ -0,0 +1,85 @@
+import html
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+'''
+Local stand-in for the Google search results pages read by data_cleaning/clean_data2_scrape.py.
+
+GET /search?q=<resort> ski resort coordinates answers, after sleeping `latency` seconds,
+with an HTML fixture shaped like a results page: a div with id="search" holding the
+coordinates of the resort ("40.4538° N, 106.7709° W") and a "in <town>, <state>" snippet.
+Resorts are looked up by name in `resorts` (dicts with Resort, Latitude, Longitude, State);
+unknown resorts get a page without coordinates, like a search that found nothing.
+
+    server = start_stub_server(resorts, latency=0.5)
+    url = f"http://127.0.0.1:{server.server_port}/search"
+'''
+
+SUFFIX = " ski resort coordinates"
+
+
+def results_page(name, resort):
+    '''
+    The HTML fixture for one search.
+    '''
+    if resort is None:
+        body = f"<div class='g'><h3>{html.escape(name)}</h3><span>No results found.</span></div>"
+    else:
+        lat, lng = float(resort["Latitude"]), float(resort["Longitude"])
+        coordinates = f"{abs(lat):.4f}° {'N' if lat >= 0 else 'S'}, {abs(lng):.4f}° {'E' if lng >= 0 else 'W'}"
+        body = (
+            f"<div class='g'><h3>{html.escape(name)} - Wikipedia</h3>"
+            f"<span>{html.escape(name)} is a ski area in Snow Town, {html.escape(resort['State'])}.</span></div>"
+            f"<div class='kp'><span>Coordinates</span><div>{coordinates}</div></div>"
+        )
+    return (
+        "<!doctype html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(name)}{SUFFIX} - Search</title></head>"
+        f"<body><div id='search'>{body}</div></body></html>"
+    )
+
+
+def make_handler(resorts, latency, stats):
+    by_name = {resort["Resort"]: resort for resort in resorts}
+
+    class StubHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query).get("q", [""])[0]
+
+            time.sleep(latency)
+            with stats["lock"]:
+                stats["requests"] += 1
+
+            if not url.path.startswith("/search"):
+                self.send_error(404)
+                return
+
+            name = query[:-len(SUFFIX)] if query.endswith(SUFFIX) else query
+            body = results_page(name, by_name.get(name)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(resorts, latency=0.5, port=0):
+    '''
+    Start the stub on a background thread. port=0 picks a free port.
+    The request count is available as server.stats["requests"].
+    '''
+    stats = {"requests": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(resorts, latency, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
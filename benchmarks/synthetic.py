@@ -0,0 +1,104 @@
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from utils import DAILY_COLUMNS, HISTORICAL_DAILY_PARAMS, HOURLY_COLUMNS
+
+'''
+Synthetic resorts, forecasts and history for the benchmarks.
+
+Values are drawn from the forecast samples checked in at the repository root
+(meteo_hourly.csv and meteo_daily.csv), column by column, so the frames have the
+same columns, dtypes and value distributions as real OpenMeteo data (mostly zero
+snowfall, a handful of weather codes, ...) at any number of resorts and days.
+The historical variables that are not in the samples (precipitation_sum,
+precipitation_hours, snowfall_sum) come from the hourly sample summed per day.
+
+Everything is seeded, the same arguments give the same frames.
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOURLY_SAMPLE = os.path.join(ROOT, "meteo_hourly.csv")
+DAILY_SAMPLE = os.path.join(ROOT, "meteo_daily.csv")
+
+STATES = ["CO", "UT", "WA", "CA", "VT", "NH", "MT", "ID", "OR", "WY"]
+
+
+def synthetic_resorts(n, states=None):
+    '''
+    n resorts spread over the continental US, with states assigned round robin when given.
+    '''
+    resorts = pd.DataFrame({
+        "id": range(1, n + 1),
+        "resort": [f"Resort {i}" for i in range(1, n + 1)],
+        "latitude": [32 + (i * 7.3) % 16 for i in range(n)],
+        "longitude": [-124 + (i * 13.1) % 54 for i in range(n)],
+    })
+    if states:
+        resorts["state"] = [states[i % len(states)] for i in range(n)]
+    return resorts
+
+
+@lru_cache(maxsize=None)
+def sample_values():
+    '''
+    {column: numpy array of observed values} from the sample files.
+    '''
+    hourly = pd.read_csv(HOURLY_SAMPLE)
+    daily = pd.read_csv(DAILY_SAMPLE)
+
+    values = {}
+    for df, columns in ((hourly, HOURLY_COLUMNS), (daily, DAILY_COLUMNS)):
+        for column in columns[2:]:
+            values.setdefault(column, df[column].dropna().to_numpy())
+
+    # Daily totals for the historical table, from the hourly sample
+    per_day = hourly.assign(day=hourly["time"].str[:10]).groupby(["id", "day"])
+    values["precipitation_sum"] = per_day["precipitation"].sum().round(2).to_numpy()
+    values["precipitation_hours"] = per_day["precipitation"].apply(lambda p: float((p > 0).sum())).to_numpy()
+    values["snowfall_sum"] = per_day["snowfall"].sum().round(2).to_numpy()
+    return values
+
+
+def grid(resorts, times, columns, seed):
+    '''
+    One row per resort and time, each column drawn from the sample values.
+    '''
+    rng = np.random.default_rng(seed)
+    values = sample_values()
+    df = pd.DataFrame({
+        "id": np.repeat(resorts["id"].to_numpy(), len(times)),
+        "time": np.tile(np.array(times, dtype="datetime64[ns]"), len(resorts)),
+    })
+    for column in columns:
+        df[column] = rng.choice(values[column], len(df))
+    return df
+
+
+def today():
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def synthetic_hourly(resorts, hours=7 * 24, start=None, seed=0):
+    '''
+    Hourly forecast rows (the hourly table) for every resort, `hours` hours from start (today by default).
+    '''
+    start = start or today()
+    return grid(resorts, [start + timedelta(hours=h) for h in range(hours)], HOURLY_COLUMNS[2:], seed)
+
+
+def synthetic_daily(resorts, days=7, start=None, seed=0):
+    '''
+    Daily forecast rows (the daily table) for every resort, `days` days from start (today by default).
+    '''
+    start = start or today()
+    return grid(resorts, [start + timedelta(days=d) for d in range(days)], DAILY_COLUMNS[2:], seed)
+
+
+def synthetic_history(resorts, days, end=None, seed=0):
+    '''
+    historical_weather rows for every resort, the `days` days before end (today by default).
+    '''
+    end = end or today()
+    return grid(resorts, [end - timedelta(days=d) for d in range(days, 0, -1)], HISTORICAL_DAILY_PARAMS, seed)
@@ -1,40 +1,68 @@
--- Postgres SQL Create Tables in Supabase
-
-DROP TABLE IF EXISTS daily;
-DROP TABLE IF EXISTS hourly;
-DROP TABLE IF EXISTS resorts;
-
-CREATE TABLE IF NOT EXISTS resorts (
-    id INTEGER PRIMARY KEY,
-    resort TEXT,
-    latitude REAL,
-    longitude REAL,
-    state TEXT
-);
-
-CREATE TABLE IF NOT EXISTS hourly (
-    id INTEGER REFERENCES resorts(id),
-    time TIMESTAMP NOT NULL,
-    precipitation REAL,
-    snowfall REAL,
-    snow_height REAL,
-    freezinglevel_height REAL,
-    rain REAL,
-    showers REAL,
-    weathercode INTEGER,
-    weather_description TEXT
-);
-
-CREATE TABLE IF NOT EXISTS daily (
-    id INTEGER REFERENCES resorts(id),
-    time TIMESTAMP NOT NULL,
-    windspeed_10m_max REAL,
-    windgusts_10m_max REAL,
-    winddirection_10m_dominant INTEGER,
-    temperature_2m_max REAL,
-    temperature_2m_min REAL,
-    apparent_temperature_max REAL,
-    apparent_temperature_min REAL,
-    weathercode INTEGER,
-    weather_description TEXT
-);
+-- Postgres SQL Create Tables in Supabase
+
+DROP TABLE IF EXISTS forecast_summary;
+DROP TABLE IF EXISTS weather_codes;
+DROP TABLE IF EXISTS daily;
+DROP TABLE IF EXISTS hourly;
+DROP TABLE IF EXISTS resorts;
+
+CREATE TABLE IF NOT EXISTS resorts (
+    id INTEGER PRIMARY KEY,
+    resort TEXT,
+    latitude REAL,
+    longitude REAL,
+    state TEXT
+);
+
+CREATE TABLE IF NOT EXISTS hourly (
+    id INTEGER REFERENCES resorts(id),
+    time TIMESTAMP NOT NULL,
+    precipitation REAL,
+    snowfall REAL,
+    snow_height REAL,
+    freezinglevel_height REAL,
+    rain REAL,
+    showers REAL,
+    weathercode INTEGER,
+    PRIMARY KEY (id, time)
+);
+
+CREATE TABLE IF NOT EXISTS daily (
+    id INTEGER REFERENCES resorts(id),
+    time TIMESTAMP NOT NULL,
+    windspeed_10m_max REAL,
+    windgusts_10m_max REAL,
+    winddirection_10m_dominant INTEGER,
+    temperature_2m_max REAL,
+    temperature_2m_min REAL,
+    apparent_temperature_max REAL,
+    apparent_temperature_min REAL,
+    weathercode INTEGER,
+    PRIMARY KEY (id, time)
+);
+
+-- Per resort forecast totals, refreshed by populate_forecast.py after each load
+CREATE TABLE IF NOT EXISTS forecast_summary (
+    id INTEGER PRIMARY KEY REFERENCES resorts(id),
+    snowfall_24h REAL,
+    snowfall_48h REAL,
+    snowfall_4d REAL,
+    snowfall_7d REAL,
+    max_snow_height REAL,
+    min_temperature REAL,
+    weathercode_24h INTEGER,
+    updated_at TIMESTAMP
+);
+
+-- Descriptions of the WMO weather codes stored in hourly and daily
+CREATE TABLE IF NOT EXISTS weather_codes (
+    code INTEGER PRIMARY KEY,
+    description TEXT NOT NULL
+);
+
+-- Bumped by the loaders so the app knows when its local snapshots are stale
+CREATE TABLE IF NOT EXISTS data_versions (
+    dataset TEXT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
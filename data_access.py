@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+import pandas as pd
+from historical_rollups import HISTORICAL_AGGREGATES, ROLLUP_BUCKETS, bucket_start, rollup_table
+from schema import apply_schema
+
+'''
+Queries behind the Streamlit app.
+
+Each tab asks for exactly the columns and rows it shows, with the state, resort and
+date filters applied in SQL, instead of the app reading every table in full at startup.
+The app wraps these functions in st.cache_data, so each distinct query hits the
+database once per TTL.
+'''
+
+# Columns of historical_weather the dashboard can plot
+HISTORICAL_VARIABLES = [
+    'snowfall_sum', 'temperature_2m_max', 'temperature_2m_min',
+    'precipitation_sum', 'apparent_temperature_max', 'apparent_temperature_min'
+]
+
+
+def read_sql(conn, query, params=None):
+    '''
+    Run a query and return the rows as a dataframe.
+    Goes through a cursor because pandas.read_sql warns about plain psycopg2 connections.
+    '''
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        columns = [column.name for column in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def load_history_bounds(conn, table, days=90):
+    '''
+    First and last date stored in the historical table within the last `days` days,
+    the default date range of the dashboard. Falls back to the last `days` days when the table is empty.
+    '''
+    since = datetime.now() - timedelta(days=days)
+    df = read_sql(conn, f"SELECT MIN(time) AS first, MAX(time) AS last FROM {table} WHERE time >= %s", (since,))
+
+    first, last = df.iloc[0]
+    if first is None or pd.isna(first):
+        return since.date(), datetime.now().date()
+    return first.date(), last.date()
+
+
+# Longest date ranges (in days) plotted per day and per week, longer ranges are plotted per season
+DAILY_RANGE_DAYS = 120
+WEEKLY_RANGE_DAYS = 3 * 365
+
+def history_bucket(start_date, end_date):
+    '''
+    Bucket for a date range, so a long range is plotted as a few hundred points at most.
+    '''
+    days = (end_date - start_date).days
+    if days <= DAILY_RANGE_DAYS:
+        return 'day'
+    if days <= WEEKLY_RANGE_DAYS:
+        return 'week'
+    return 'season'
+
+
+# Chart label of a resort, unique where the name alone is not
+RESORT_LABEL = "r.resort || ' (' || r.state || ')'"
+
+
+def history_query(table, variable, resorts=None, bucket='day'):
+    '''
+    SQL for the dashboard chart: `variable` per resort and bucket, for the resorts of the selected
+    states (and resorts, when given) between two dates. Weeks and seasons are read from the rollup
+    tables, one row per resort and bucket whatever the length of the history; other buckets are
+    aggregated from the daily rows with date_trunc. Parameters are named bucket, states, resorts,
+    start and end (see history_params).
+
+    Series are grouped by resort id and labelled "<resort> (<state>)": some names are used in two
+    states (Heavenly, CA and NV) and must neither be added up nor collide in the chart's pivot.
+    '''
+    if variable not in HISTORICAL_AGGREGATES:
+        raise ValueError(f"Unknown historical variable: {variable}")
+
+    resort_filter = "AND r.resort = ANY(%(resorts)s::text[])" if resorts else ""
+    if bucket in ROLLUP_BUCKETS:
+        return f"""
+        SELECT h.time, {RESORT_LABEL} AS resort, h.{variable}
+        FROM {rollup_table(table, bucket)} h
+        JOIN resorts r ON r.id = h.id
+        WHERE r.state = ANY(%(states)s::text[])
+        AND h.time >= %(start)s::timestamp AND h.time < %(end)s::timestamp
+        {resort_filter}
+        ORDER BY 1, 2
+    """
+
+    return f"""
+        SELECT date_trunc(%(bucket)s, h.time) AS time, {RESORT_LABEL} AS resort,
+            {HISTORICAL_AGGREGATES[variable]}(h.{variable}) AS {variable}
+        FROM {table} h
+        JOIN resorts r ON r.id = h.id
+        WHERE r.state = ANY(%(states)s::text[])
+        AND h.time >= %(start)s::timestamp AND h.time < %(end)s::timestamp
+        {resort_filter}
+        GROUP BY 1, r.id, r.resort, r.state
+        ORDER BY 1, 2
+    """
+
+
+def history_params(states, resorts, start_date, end_date, bucket):
+    '''
+    Parameters of history_query. For rollup buckets the range starts at the bucket containing start_date.
+    '''
+    return {
+        "bucket": bucket,
+        "states": list(states),
+        "resorts": list(resorts),
+        "start": bucket_start(bucket, start_date),
+        "end": end_date + timedelta(days=1),
+    }
+
+
+def load_history(conn, table, variable, states, resorts, start_date, end_date, bucket=None):
+    '''
+    The series plotted by the dashboard: time, resort and `variable`, one row per resort and
+    day/week/season (bucket, chosen from the range length when None). Filtering and aggregation run
+    in Postgres, so only the plotted points leave the database.
+    An empty `resorts` means every resort of the selected states.
+    '''
+    bucket = bucket or history_bucket(start_date, end_date)
+    params = history_params(states, resorts, start_date, end_date, bucket)
+
+    df = read_sql(conn, history_query(table, variable, resorts, bucket), params)
+    return apply_schema(df, 'history_series')
+
+
+def explain_history(conn, table, variable, states, resorts, start_date, end_date, bucket=None):
+    '''
+    Postgres plan of the dashboard query, to check that it reads historical_weather through
+    its (id, time) primary key instead of scanning the whole table, and only the monthly
+    partitions inside the date range.
+    Returns (plan text, names of the indexes the plan scans, names of the tables it scans).
+    '''
+    bucket = bucket or history_bucket(start_date, end_date)
+    params = history_params(states, resorts, start_date, end_date, bucket)
+
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + history_query(table, variable, resorts, bucket), params)
+        plan = cursor.fetchone()[0][0]["Plan"]
+        cursor.execute("EXPLAIN " + history_query(table, variable, resorts, bucket), params)
+        text = "\n".join(row[0] for row in cursor.fetchall())
+
+    indexes, tables, nodes = set(), set(), [plan]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        if "Relation Name" in node:
+            tables.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return text, indexes, tables
+
+
+def load_resorts(conn):
+    '''
+    Resort locations for the nearby search.
+    '''
+    return apply_schema(read_sql(conn, "SELECT id, resort, latitude, longitude, state FROM resorts ORDER BY id"), 'resorts')
+
+
+def load_forecast_summary(conn):
+    '''
+    The per resort forecast totals (see utils.refresh_forecast_summary).
+    '''
+    return apply_schema(read_sql(conn, "SELECT * FROM forecast_summary"), 'forecast_summary')
+
+
+def load_weather_codes(conn):
+    '''
+    The weather_codes table (code, description), joined onto weather codes for display.
+    '''
+    return apply_schema(read_sql(conn, "SELECT code, description FROM weather_codes"), 'weather_codes')
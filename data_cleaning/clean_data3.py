@@ -1,18 +1,31 @@
-import pandas as pd
-
-# Load both CSVs
-resorts_us = pd.read_csv("resorts_us.csv")
-resort_coords = pd.read_csv("resort_coords.csv")
-
-# Merge on 'Resort'
-merged_df = pd.merge(resort_coords, resorts_us[['Resort', 'ID']], on='Resort', how='left')
-
-# Reorder columns to make 'ID' the first column
-cols = ['ID'] + [col for col in merged_df.columns if col != 'ID']
-merged_df = merged_df[cols]
-
-# Save to CSV
-merged_df.to_csv("final_resorts_us.csv", index=False)
-
-# Optional: Preview
-print(merged_df.head())
\ No newline at end of file
+import pandas as pd
+from name_matching import NameIndex
+
+# Load both CSVs
+resorts_us = pd.read_csv("resorts_us.csv")
+resort_coords = pd.read_csv("resort_coords.csv")
+
+# Match the scraped names to resorts_us.csv, the names differ slightly between the two
+# ("Crystal Mountain" / "Crystal Mountain-WA-"), see name_matching.py
+index = NameIndex(resorts_us['Resort'], resorts_us['Latitude'], resorts_us['Longitude'])
+matches = index.match(resort_coords['Resort'], resort_coords['Latitude'], resort_coords['Longitude'])
+matches['ID'] = [resorts_us['ID'].iloc[match] if match >= 0 else None for match in matches['match']]
+
+# Save the match table with confidence scores, to review the uncertain ones
+matches.drop(columns='match').to_csv("resort_matches.csv", index=False)
+uncertain = matches[(matches['score'] < 0.8) | (matches['margin'] < 0.1)]
+if not uncertain.empty:
+    print(f"Check these matches in resort_matches.csv:\n{uncertain[['query', 'matched_name', 'score', 'margin']]}")
+
+# Add the matched IDs
+merged_df = resort_coords.assign(ID=matches['ID'].astype('Int64'))
+
+# Reorder columns to make 'ID' the first column
+cols = ['ID'] + [col for col in merged_df.columns if col != 'ID']
+merged_df = merged_df[cols]
+
+# Save to CSV
+merged_df.to_csv("final_resorts_us.csv", index=False)
+
+# Optional: Preview
+print(merged_df.head())
@@ -0,0 +1,203 @@
+import math
+import re
+import unicodedata
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+
+'''
+Fuzzy matching of resort names between datasets, e.g. the scraped resort_coords.csv
+against resorts_us.csv or the full worldwide resorts.csv.
+
+Names are normalized first (lower case, accents and punctuation removed, "Mt." -> "mount",
+...), so "Crystal Mountain-WA-" and "crystal mountain wa" are the same string. Then:
+
+    blocking   an inverted index from character trigrams to the names containing them.
+               A query only looks at the top_k names sharing the most trigrams with it
+               (weighted by IDF, so "mountain resort" doesn't outweigh the rest of the
+               name), instead of scoring every pair (n x m).
+    scoring    the mean of the trigram Dice coefficient (spelling) and an IDF weighted token
+               overlap (words in common, where rare words like "mission" count more than
+               "mountain" or "ski", and misspelt words count in part). With coordinates on both sides, the distance between
+               the resorts is blended in with coord_weight (1 at the same spot, 0.5 at
+               distance_scale_km, falling off exponentially).
+
+    index = NameIndex(resorts_us["Resort"], resorts_us["Latitude"], resorts_us["Longitude"])
+    matches = index.match(coords["Resort"], coords["Latitude"], coords["Longitude"])
+
+match returns one row per query name with the best candidate and its scores; score is the
+confidence between 0 and 1, margin the gap to the runner up (a small margin means the name
+was ambiguous). Queries whose best score is below min_score get no match.
+'''
+
+# Abbreviations spelled out before matching
+ABBREVIATIONS = {
+    "mt": "mount",
+    "mtn": "mountain",
+    "st": "saint",
+    "ste": "sainte",
+    "pk": "peak",
+    "n": "north",
+    "s": "south",
+}
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def normalize(name):
+    '''
+    Lower case ASCII words separated by single spaces.
+    '''
+    if not isinstance(name, str):
+        return ""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    # "?" stands in for the accented letters lost to the encoding of resorts.csv ("Bare?ges")
+    text = re.sub(r"['?]", "", text)
+    words = re.sub(r"[^a-z0-9]+", " ", text).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def haversine_km(lat, lon, lats, lons):
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class NameIndex:
+    '''
+    Trigram index over a list of names, optionally with their coordinates.
+    Matches are reported as positions in that list.
+    '''
+
+    def __init__(self, names, latitudes=None, longitudes=None):
+        self.names = list(names)
+        self.normalized = [normalize(name) for name in self.names]
+        self.trigrams = [trigrams(text) for text in self.normalized]
+        self.trigram_counts = np.array([len(grams) for grams in self.trigrams])
+
+        postings = defaultdict(list)
+        for position, grams in enumerate(self.trigrams):
+            for gram in grams:
+                postings[gram].append(position)
+        self.postings = {gram: np.array(positions) for gram, positions in postings.items()}
+        # Rare trigrams say more about a name than the ones of "mountain" or "resort"
+        self.trigram_idf = {gram: math.log(1 + len(self.names) / len(positions)) for gram, positions in postings.items()}
+
+        # Inverse document frequency of every word, rare words tell names apart
+        self.tokens = [set(text.split()) for text in self.normalized]
+        frequency = defaultdict(int)
+        for tokens in self.tokens:
+            for token in tokens:
+                frequency[token] += 1
+        self.idf = {token: math.log(1 + len(self.names) / count) for token, count in frequency.items()}
+        self.default_idf = math.log(1 + len(self.names))
+        self.token_trigrams = {token: trigrams(token) for token in self.idf}
+
+        self.has_coordinates = latitudes is not None and longitudes is not None
+        if self.has_coordinates:
+            self.latitudes = np.asarray(latitudes, dtype=float)
+            self.longitudes = np.asarray(longitudes, dtype=float)
+
+    def candidates(self, grams, top_k):
+        '''
+        (positions, shared trigram counts) of the top_k names sharing the most trigrams,
+        weighted by their IDF.
+        '''
+        grams = [gram for gram in grams if gram in self.postings]
+        if not grams:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        lists = [self.postings[gram] for gram in grams]
+        hits = np.concatenate(lists)
+        weights = np.repeat([self.trigram_idf[gram] for gram in grams], [len(positions) for positions in lists])
+        weighted = np.bincount(hits, weights=weights, minlength=len(self.names))
+        positions = np.flatnonzero(weighted)
+        if len(positions) > top_k:
+            positions = positions[np.argpartition(-weighted[positions], top_k - 1)[:top_k]]
+        return positions, np.bincount(hits, minlength=len(self.names))[positions]
+
+    def token_score(self, tokens, position, min_similarity=0.6):
+        '''
+        IDF weight of the shared words over the weight of the words of the shorter name.
+        Words with a trigram Dice similarity of at least min_similarity count as shared in
+        proportion to it, so a typo ("Snomwass") doesn't lose the word entirely.
+        tokens maps the words of the query to their trigrams.
+        '''
+        other = self.tokens[position]
+        if not tokens or not other:
+            return 0.0
+
+        shared, query_weight = 0.0, 0.0
+        for token, grams in tokens.items():
+            if token in other:
+                similarity, closest = 1.0, token
+            else:
+                similarity, closest = max(
+                    (2 * len(grams & self.token_trigrams[word]) / (len(grams) + len(self.token_trigrams[word])), word)
+                    for word in other
+                )
+            if similarity >= min_similarity:
+                shared += similarity * self.idf[closest]
+                query_weight += self.idf.get(token, self.idf[closest])
+            else:
+                query_weight += self.idf.get(token, self.default_idf)
+
+        other_weight = sum(self.idf[word] for word in other)
+        return min(shared / min(query_weight, other_weight), 1.0)
+
+    def match(self, names, latitudes=None, longitudes=None, top_k=20, coord_weight=0.15,
+              distance_scale_km=25.0, min_score=0.5):
+        '''
+        Best match in the index for every name, as a dataframe with columns
+        query, match (position in the index, -1 when none), matched_name, name_score,
+        distance_km, score and margin.
+        '''
+        use_coordinates = self.has_coordinates and latitudes is not None and longitudes is not None
+        if use_coordinates:
+            latitudes = np.asarray(latitudes, dtype=float)
+            longitudes = np.asarray(longitudes, dtype=float)
+
+        rows = []
+        for i, name in enumerate(names):
+            text = normalize(name)
+            grams = trigrams(text)
+            tokens = {token: trigrams(token) for token in text.split()}
+            row = {"query": name, "match": -1, "matched_name": None, "name_score": 0.0,
+                   "distance_km": np.nan, "score": 0.0, "margin": 0.0}
+
+            positions, shared = self.candidates(grams, top_k)
+            if len(positions):
+                dice = 2 * shared / (len(grams) + self.trigram_counts[positions])
+                token = np.array([self.token_score(tokens, position) for position in positions])
+                name_scores = (dice + token) / 2
+                scores = name_scores
+
+                distances = np.full(len(positions), np.nan)
+                if use_coordinates and not (np.isnan(latitudes[i]) or np.isnan(longitudes[i])):
+                    distances = haversine_km(latitudes[i], longitudes[i],
+                                             self.latitudes[positions], self.longitudes[positions])
+                    # Unknown coordinates count as neither near nor far
+                    proximity = np.where(np.isnan(distances), 0.5, 0.5 ** (distances / distance_scale_km))
+                    scores = (1 - coord_weight) * name_scores + coord_weight * proximity
+
+                order = np.argsort(-scores, kind="stable")
+                best = order[0]
+                if scores[best] >= min_score:
+                    row.update(
+                        match=int(positions[best]),
+                        matched_name=self.names[positions[best]],
+                        name_score=round(float(name_scores[best]), 4),
+                        distance_km=round(float(distances[best]), 2),
+                        score=round(float(scores[best]), 4),
+                        margin=round(float(scores[best] - scores[order[1]]) if len(order) > 1 else float(scores[best]), 4),
+                    )
+                else:
+                    row.update(name_score=round(float(name_scores[best]), 4), score=round(float(scores[best]), 4))
+            rows.append(row)
+
+        return pd.DataFrame(rows)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+'''
+Parallel, resumable runner for the resort scraper (clean_data2_scrape.py).
+
+    found = scrape_resorts(resorts, url, parse, open_fetcher, workers=4,
+                           cache=PageCache(".page_cache"), checkpoints=CheckpointStore("scrape_checkpoint.jsonl"))
+
+`workers` threads take resorts from a shared queue. Each thread opens its own fetcher
+(a browser is not thread safe) the first time it needs a page that isn't cached, and
+waits `delay` seconds between its own requests, so the request rate is workers / delay.
+
+PageCache keeps every fetched page as a file named after its URL. Cached pages are
+parsed without fetching, so the parsing can be changed and re-run offline
+(open_fetcher=None), and a crashed run loses no downloads.
+
+CheckpointStore appends one JSON line per finished resort (flushed right away). Resorts
+with coordinates in the checkpoint are skipped on the next run, the others are tried again.
+'''
+
+
+class PageCache:
+    '''
+    Fetched pages, one file per URL in `directory`.
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest()[:32] + ".html")
+
+    def get(self, url):
+        try:
+            with open(self.path(url), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, url, html):
+        # Written next to the target and renamed, a crash never leaves half a page behind
+        path = self.path(url)
+        partial = f"{path}.{threading.get_ident()}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(partial, path)
+
+
+class CheckpointStore:
+    '''
+    Results of finished resorts, appended to a JSON lines file and keyed by resort name.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line of a run killed mid write
+                        continue
+                    self.done[record["Resort"]] = (record["Latitude"], record["Longitude"], record["State"])
+
+    def get(self, name):
+        '''
+        (lat, lng, state) of a resort scraped with success before, None otherwise.
+        '''
+        result = self.done.get(name)
+        return result if result and result[0] is not None else None
+
+    def add(self, name, result):
+        lat, lng, state = result
+        line = json.dumps({"Resort": name, "Latitude": lat, "Longitude": lng, "State": state})
+        with self.lock:
+            self.done[name] = result
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def clear(self):
+        with self.lock:
+            self.done = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def scrape_resorts(resorts, url, parse, open_fetcher, workers=3, delay=3, cache=None, checkpoints=None):
+    '''
+    (lat, lng, state) for every resort, in order, (None, None, None) where it failed.
+
+    url(resort) gives the page of a resort, parse(html, resort) its (lat, lng, state).
+    open_fetcher() returns an object with fetch(url) -> html and close(), called at most
+    once per worker. With open_fetcher=None only cached pages are parsed.
+    '''
+    results = [None] * len(resorts)
+    todo = queue.Queue()
+    for position, resort in enumerate(resorts):
+        done = checkpoints.get(resort["Resort"]) if checkpoints is not None else None
+        if done is not None:
+            results[position] = done
+        else:
+            todo.put(position)
+
+    skipped = len(resorts) - todo.qsize()
+    if skipped:
+        print(f"Skipping {skipped} resorts already in the checkpoint")
+
+    def work():
+        fetcher, last_request = None, None
+        try:
+            while True:
+                try:
+                    position = todo.get_nowait()
+                except queue.Empty:
+                    return
+
+                resort = resorts[position]
+                name = resort["Resort"]
+                page_url = url(resort)
+                result = (None, None, None)
+                try:
+                    html = cache.get(page_url) if cache is not None else None
+                    if html is None and open_fetcher is not None:
+                        if fetcher is None:
+                            fetcher = open_fetcher()
+                        if last_request is not None:
+                            time.sleep(max(delay - (time.monotonic() - last_request), 0))
+                        print(f"Processing: {name}")
+                        last_request = time.monotonic()
+                        html = fetcher.fetch(page_url)
+                        if cache is not None:
+                            cache.put(page_url, html)
+
+                    if html is None:
+                        print(f"No cached page for {name}")
+                    else:
+                        result = parse(html, resort)
+                except Exception as e:
+                    print(f"Error processing {name}: {e}")
+
+                results[position] = result
+                if checkpoints is not None:
+                    checkpoints.add(name, result)
+                if result[0] is not None:
+                    print(f"Success: {name} - Lat: {result[0]}, Lng: {result[1]}, State: {result[2]}")
+                else:
+                    print(f"Failed: {name}")
+        finally:
+            if fetcher is not None:
+                fetcher.close()
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(max(min(workers, todo.qsize()), 1))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
@@ -0,0 +1,91 @@
+import json
+import os
+import numpy as np
+
+'''
+Offline lookup of the US state a coordinate falls in.
+
+The state boundaries in us_states.geojson come from the Census Bureau cartographic
+boundary file cb_2016_us_state_500k (public domain), simplified to ~500 m (Douglas-Peucker,
+0.005 degrees) with islands under ~5 km² dropped, which keeps the file small and is far
+finer than anything a ski resort coordinate needs.
+
+Every polygon ring is stored as NumPy arrays of its edges, with its bounding box. A lookup
+first compares all points against all ring boxes at once, then runs a vectorized ray
+casting test (even-odd rule) only for the points inside a ring's box, so a few thousand
+coordinates are resolved in milliseconds:
+
+    index = StateIndex()
+    states = index.lookup(df["Latitude"], df["Longitude"])
+
+Points outside every polygon (offshore, or in the small slivers simplification leaves
+along some borders) get None. Nominatim reverse geocoding is only needed for those.
+'''
+
+STATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "us_states.geojson")
+
+# Upper bound on points x edges compared at once in the ray casting test
+CHUNK_SIZE = 2_000_000
+
+
+class StateIndex:
+    '''
+    Point in polygon index over the state boundaries of a GeoJSON FeatureCollection
+    with a `name` property per feature.
+    '''
+
+    def __init__(self, path=STATES_PATH):
+        with open(path) as f:
+            features = json.load(f)["features"]
+
+        self.names = [feature["properties"]["name"] for feature in features]
+        self.rings = []      # (x1, y1, x2, y2) edge arrays per ring, x = longitude
+        ring_states, boxes = [], []
+        for state, feature in enumerate(features):
+            for polygon in feature["geometry"]["coordinates"]:
+                for ring in polygon:
+                    points = np.asarray(ring, dtype=float)
+                    start, end = points[:-1], points[1:]
+                    self.rings.append((start[:, 0], start[:, 1], end[:, 0], end[:, 1]))
+                    ring_states.append(state)
+                    boxes.append((points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()))
+
+        self.ring_states = np.asarray(ring_states)
+        self.boxes = np.asarray(boxes)
+
+    def _inside(self, ring, lons, lats):
+        '''
+        Boolean array, True for the points inside the ring. A horizontal ray from each point
+        crosses the boundary an odd number of times when the point is inside.
+        '''
+        x1, y1, x2, y2 = ring
+        inside = np.empty(len(lons), dtype=bool)
+        step = max(CHUNK_SIZE // len(x1), 1)
+        for i in range(0, len(lons), step):
+            x, y = lons[i:i + step, None], lats[i:i + step, None]
+            straddles = (y1 > y) != (y2 > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            inside[i:i + step] = np.count_nonzero(straddles & (x < crossing_x), axis=1) % 2 == 1
+        return inside
+
+    def lookup(self, latitudes, longitudes):
+        '''
+        State name for every coordinate, None where no state contains it.
+        '''
+        lats = np.asarray(latitudes, dtype=float)
+        lons = np.asarray(longitudes, dtype=float)
+        found = np.full(len(lats), -1)
+
+        # Bounding box prefilter: points x rings, True where the point is inside the ring's box
+        in_box = ((lons[:, None] >= self.boxes[:, 0]) & (lats[:, None] >= self.boxes[:, 1]) &
+                  (lons[:, None] <= self.boxes[:, 2]) & (lats[:, None] <= self.boxes[:, 3]))
+
+        for r in np.flatnonzero(in_box.any(axis=0)):
+            candidates = np.flatnonzero(in_box[:, r] & (found < 0))
+            if len(candidates) == 0:
+                continue
+            inside = self._inside(self.rings[r], lons[candidates], lats[candidates])
+            found[candidates[inside]] = self.ring_states[r]
+
+        return [self.names[state] if state >= 0 else None for state in found]
@@ -0,0 +1,110 @@
+import io
+
+'''
+Bulk loading of pandas DataFrames into Postgres with COPY FROM STDIN.
+
+execute_values and row by row cursor.execute build SQL strings in Python for
+every row. COPY streams CSV text straight into the table, which is several
+times faster and keeps the memory used on the Python side to one chunk of
+rows at a time.
+
+copy_df loads into a table directly. copy_upsert loads into a temporary
+staging table first and merges it into the target with INSERT ... SELECT ...
+ON CONFLICT, for tables that already hold rows with the same keys.
+'''
+
+# Rows serialized to CSV per COPY round, bounds the size of the in-memory buffer
+COPY_CHUNK_ROWS = 100_000
+
+
+def _csv_ready(df):
+    '''
+    Integer columns with missing values come out of pandas as float64 and would be written
+    as "3.0", which COPY rejects for INTEGER columns. Whole valued float columns are written
+    through the nullable Int64 dtype instead ("3", or empty for NULL), which REAL columns accept too.
+    '''
+    df = df.copy(deep=False)
+    for column in df.columns:
+        values = df[column]
+        if values.dtype.kind == "f" and values.notna().any() and (values.dropna() % 1 == 0).all():
+            df[column] = values.astype("Int64")
+    return df
+
+
+def copy_df(cursor, df, table, columns=None, chunk_rows=COPY_CHUNK_ROWS):
+    '''
+    COPY the rows of df into table. columns defaults to all dataframe columns, otherwise
+    only those columns are loaded, in that order. NaN/None are loaded as NULL.
+    Does not commit. Returns the number of rows copied.
+    '''
+
+    if df.empty:
+        return 0
+
+    columns = list(columns or df.columns)
+    df = df[columns]
+    query = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    for start in range(0, len(df), chunk_rows):
+        buffer = io.StringIO()
+        _csv_ready(df.iloc[start:start + chunk_rows]).to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(query, buffer)
+
+    return len(df)
+
+
+def upsert_select_sql(table, source, columns, key_columns, update=True, only_changed=True):
+    '''
+    INSERT ... SELECT from `source` into `table`, resolving conflicts on key_columns.
+
+    update=False       : conflicting rows are skipped (ON CONFLICT DO NOTHING)
+    only_changed=True  : conflicting rows are only rewritten if a value differs,
+                         so unchanged rows cost no write
+    '''
+
+    column_list = ", ".join(columns)
+    keys = ", ".join(key_columns)
+    values = [c for c in columns if c not in key_columns]
+
+    query = f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {source}
+    """
+
+    if not update or not values:
+        return query + f"ON CONFLICT ({keys}) DO NOTHING;"
+
+    query += f"ON CONFLICT ({keys}) DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in values)
+
+    if only_changed:
+        current = ", ".join(f"{table}.{c}" for c in values)
+        incoming = ", ".join(f"EXCLUDED.{c}" for c in values)
+        query += f"\n        WHERE ({current}) IS DISTINCT FROM ({incoming})"
+
+    return query + ";"
+
+
+def copy_upsert(cursor, df, table, key_columns, columns=None, update=True, only_changed=True, chunk_rows=COPY_CHUNK_ROWS):
+    '''
+    COPY df into a temporary staging table shaped like `table`, then merge it into `table`
+    with upsert_select_sql. Does not commit.
+    Returns the number of rows inserted or updated in `table`.
+    '''
+
+    if df.empty:
+        return 0
+
+    columns = list(columns or df.columns)
+    staging = f"{table}_copy_staging"
+
+    # LIKE copies the column types but not the constraints, so the temp table takes any rows
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)")
+
+    copy_df(cursor, df, staging, columns, chunk_rows)
+    cursor.execute(upsert_select_sql(table, staging, columns, key_columns, update, only_changed))
+    written = cursor.rowcount
+
+    cursor.execute(f"DROP TABLE {staging}")
+    return written
@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+
+'''
+Shared Postgres connections for the app, the cloud function and the scripts.
+
+Every entry point used to call psycopg2.connect itself, so each Streamlit rerun and
+each function invocation paid a new TCP and TLS handshake to Supabase. A
+ConnectionPool keeps up to max_size open connections and hands them out one thread
+at a time:
+
+    pool = get_pool(db_config())
+    with pool.connection() as conn:
+        ...
+
+- Connections idle for more than HEALTH_CHECK_SECONDS are checked with SELECT 1
+  before they are handed out, broken ones are replaced.
+- Idle connections above min_size are closed after IDLE_TIMEOUT seconds.
+- When every connection is in use, callers wait up to CHECKOUT_TIMEOUT seconds.
+- A connection returned in the middle of a transaction is rolled back.
+
+stats() reports checkouts, connections opened and closed, and the time callers
+waited for a connection.
+'''
+
+MIN_SIZE = 1
+MAX_SIZE = 5
+
+# Seconds an idle connection above min_size is kept open
+IDLE_TIMEOUT = 300
+
+# Connections idle for longer than this are checked before they are reused
+HEALTH_CHECK_SECONDS = 30
+
+# Seconds a checkout waits for a free connection before giving up
+CHECKOUT_TIMEOUT = 30
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def db_config():
+    '''
+    Connection settings from the environment (.env), as used by the app and the scripts.
+    '''
+    return {
+        "host": os.getenv("host"),
+        "user": os.getenv("user"),
+        "password": os.getenv("password"),
+        "dbname": os.getenv("dbname"),
+        "port": os.getenv("port"),
+        "gssencmode": 'disable'
+    }
+
+
+class ConnectionPool:
+    '''
+    Thread-safe pool of psycopg2 connections to one database.
+    '''
+
+    def __init__(self, config, min_size=MIN_SIZE, max_size=MAX_SIZE, idle_timeout=IDLE_TIMEOUT,
+                 health_check_seconds=HEALTH_CHECK_SECONDS, checkout_timeout=CHECKOUT_TIMEOUT):
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_seconds = health_check_seconds
+        self.checkout_timeout = checkout_timeout
+
+        self.condition = threading.Condition()
+        self.idle = []  # (connection, returned at), most recently returned last
+        self.size = 0   # open connections, idle or checked out
+
+        self.checkouts = 0
+        self.opened = 0
+        self.closed = 0
+        self.health_failures = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+        for _ in range(min_size):
+            self.size += 1
+            self.idle.append((self.open(), time.monotonic()))
+
+    def open(self):
+        # The caller has already counted the connection in self.size, so concurrent
+        # checkouts can't open more than max_size
+        try:
+            conn = psycopg2.connect(**self.config)
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opened += 1
+        return conn
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.closed += 1
+            self.condition.notify()
+
+    def healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_seconds:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def expire_idle(self):
+        # Called with the condition held
+        now = time.monotonic()
+        expired = []
+        while len(self.idle) > self.min_size and now - self.idle[0][1] > self.idle_timeout:
+            expired.append(self.idle.pop(0)[0])
+        return expired
+
+    def getconn(self, timeout=None):
+        '''
+        Check out a connection, opening one if the pool is below max_size. Waits for a connection to be
+        returned otherwise, and raises PoolTimeout after `timeout` seconds (checkout_timeout by default).
+        '''
+        timeout = self.checkout_timeout if timeout is None else timeout
+        requested = time.monotonic()
+
+        while True:
+            with self.condition:
+                expired = self.expire_idle()
+                while not self.idle and self.size - len(expired) >= self.max_size:
+                    remaining = timeout - (time.monotonic() - requested)
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"No database connection free after {timeout}s ({self.max_size} in use)")
+                    self.condition.wait(remaining)
+                candidate = self.idle.pop() if self.idle else None
+                if candidate is None:
+                    self.size += 1
+
+            for conn in expired:
+                self.discard(conn)
+
+            if candidate is None:
+                conn = self.open()
+                break
+            conn, idle_since = candidate
+            if self.healthy(conn, idle_since):
+                break
+            with self.condition:
+                self.health_failures += 1
+            self.discard(conn)
+
+        waited = time.monotonic() - requested
+        with self.condition:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return conn
+
+    def putconn(self, conn):
+        '''
+        Return a connection to the pool. An open transaction is rolled back, a broken connection is closed.
+        '''
+        if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        if conn.closed or conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            self.discard(conn)
+            return
+
+        with self.condition:
+            self.idle.append((conn, time.monotonic()))
+            self.condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for conn, _ in idle:
+            self.discard(conn)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "in_use": self.size - len(self.idle),
+                "checkouts": self.checkouts,
+                "opened": self.opened,
+                "closed": self.closed,
+                "health_failures": self.health_failures,
+                "timeouts": self.timeouts,
+                "mean_wait_ms": round(1000 * self.wait_seconds / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config, **options):
+    '''
+    The process wide pool for `config`, created on first use. Later calls with the same settings get the
+    same pool, so a warm cloud function instance or a Streamlit server reuses its connections.
+    '''
+    key = tuple(sorted(config.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(config, **options)
+        return _pools[key]
@@ -0,0 +1,222 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+
+'''
+Cache of drive times from user locations to resorts, for the nearby resort search.
+
+Calling the OpenRouteService distance matrix on every search is slow (seconds),
+rate limited and uses up quota. Origins are snapped to a geohash cell (precision 5
+is about 5 x 5 km) and the matrix is requested from the cell center, so every search
+starting in the same cell shares one result. Distances and durations are stored per
+(cell, resort) in SQLite with a TTL; a later search only asks ORS for resorts the
+cell has no fresh entry for, and nothing at all once the cell is complete. Entries
+past the TTL are deleted whenever new ones are stored, so the file only holds
+fresh ones.
+
+Snapping costs a few miles of accuracy at most, which is well below the
+granularity of the max distance slider.
+
+stats() reports the hit rate and, per query, how many resorts were looked up (the ones
+left by the straight-line prefilter of the nearby search) and how many of them were
+sent to ORS, for the last RECENT_QUERIES queries and on average.
+'''
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+DAY = 24 * 3600
+
+# Queries whose destination counts are listed in stats()
+RECENT_QUERIES = 20
+
+
+def geohash(lat, lon, precision=5):
+    '''
+    Standard geohash of a point: interleaved longitude/latitude bisection bits, 5 bits per character.
+    '''
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+
+    while len(chars) < precision:
+        bounds, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (bounds[0] + bounds[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            bounds[0] = mid
+        else:
+            value = value * 2
+            bounds[1] = mid
+        even = not even
+
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[value])
+            bits, value = 0, 0
+
+    return "".join(chars)
+
+
+def geohash_center(cell):
+    '''
+    (lat, lon) of the center of a geohash cell.
+    '''
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+
+    for char in cell:
+        value = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            even = not even
+
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def request_matrix(client, origin, destinations):
+    '''
+    One ORS distance matrix request from origin (lon, lat) to every destination (lon, lat).
+    Returns (distances in miles, durations in seconds), None where ORS found no route.
+    '''
+    response = client.distance_matrix(
+        locations=[origin] + destinations,
+        profile='driving-car',
+        metrics=['distance', 'duration'],
+        units='mi',
+        sources=[0],
+        destinations=list(range(1, len(destinations) + 1))
+    )
+    return response['distances'][0], response['durations'][0]
+
+
+class DriveTimeCache:
+    '''
+    Drive times per (geohash cell, resort id), stored in SQLite and safe to share between threads
+    (Streamlit sessions). Keeps hit/miss counters and lookup/API latencies for stats().
+    '''
+
+    def __init__(self, path, precision=5, ttl=30 * DAY):
+        self.path = path
+        self.precision = precision
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+        self.queries = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.lookup_seconds = 0.0
+        self.api_seconds = 0.0
+        self.destinations = 0
+        self.requested = 0
+        self.recent = deque(maxlen=RECENT_QUERIES)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS drive_times (
+                cell TEXT NOT NULL,
+                resort_id INTEGER NOT NULL,
+                miles REAL,
+                seconds REAL,
+                fetched REAL NOT NULL,
+                PRIMARY KEY (cell, resort_id)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS drive_times_fetched ON drive_times (fetched)")
+        self.conn.commit()
+
+    def cached(self, cell, resort_ids):
+        '''
+        {resort_id: (miles, seconds)} of the fresh entries of a cell.
+        '''
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT resort_id, miles, seconds FROM drive_times WHERE cell = ? AND fetched >= ?",
+                (cell, time.time() - self.ttl)
+            ).fetchall()
+
+        wanted = set(resort_ids)
+        return {resort_id: (miles, seconds) for resort_id, miles, seconds in rows if resort_id in wanted}
+
+    def store(self, cell, resort_ids, distances, durations):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("DELETE FROM drive_times WHERE fetched < ?", (now - self.ttl,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO drive_times (cell, resort_id, miles, seconds, fetched) VALUES (?, ?, ?, ?, ?)",
+                [(cell, int(resort_id), miles, seconds, now) for resort_id, miles, seconds in zip(resort_ids, distances, durations)]
+            )
+            self.conn.commit()
+
+    def lookup(self, client, user_lat, user_lon, resorts_df):
+        '''
+        Drive distance (miles) and duration (seconds) from the user to every resort in resorts_df
+        (id, latitude, longitude columns). Returns (distances, durations) lists aligned with
+        resorts_df rows, None where there is no route. Only resorts the user's cell has no
+        fresh entry for are requested from ORS.
+        '''
+
+        start = time.perf_counter()
+        cell = geohash(user_lat, user_lon, self.precision)
+        resort_ids = [int(resort_id) for resort_id in resorts_df['id']]
+        found = self.cached(cell, resort_ids)
+
+        missing = resorts_df[~resorts_df['id'].isin(list(found))]
+        if not missing.empty:
+            api_start = time.perf_counter()
+            center_lat, center_lon = geohash_center(cell)
+            destinations = list(zip(missing['longitude'], missing['latitude']))
+            distances, durations = request_matrix(client, (center_lon, center_lat), destinations)
+
+            # The cell center may not be near a road, route from the real origin instead and don't cache
+            if all(miles is None for miles in distances):
+                distances, durations = request_matrix(client, (user_lon, user_lat), destinations)
+            else:
+                self.store(cell, missing['id'], distances, durations)
+
+            found.update({int(resort_id): pair for resort_id, pair in zip(missing['id'], zip(distances, durations))})
+            with self.lock:
+                self.api_calls += 1
+                self.api_seconds += time.perf_counter() - api_start
+
+        with self.lock:
+            self.queries += 1
+            if missing.empty:
+                self.hits += 1
+            elif len(missing) < len(resorts_df):
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+            self.lookup_seconds += time.perf_counter() - start
+            self.destinations += len(resorts_df)
+            self.requested += len(missing)
+            self.recent.append((len(resorts_df), len(missing)))
+
+        return [found[resort_id][0] for resort_id in resort_ids], [found[resort_id][1] for resort_id in resort_ids]
+
+    def stats(self):
+        '''
+        Hit rate, mean latencies and destinations per query since the cache was opened.
+        '''
+        with self.lock:
+            recent = list(self.recent)
+        return {
+            "queries": self.queries,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / self.queries, 3) if self.queries else None,
+            "api_calls": self.api_calls,
+            "mean_lookup_ms": round(1000 * self.lookup_seconds / self.queries, 2) if self.queries else None,
+            "mean_api_ms": round(1000 * self.api_seconds / self.api_calls, 2) if self.api_calls else None,
+            "mean_destinations": round(self.destinations / self.queries, 1) if self.queries else None,
+            "mean_sent_to_ors": round(self.requested / self.queries, 1) if self.queries else None,
+            "recent_destinations": [destinations for destinations, _ in recent],
+            "recent_sent_to_ors": [requested for _, requested in recent],
+        }
@@ -0,0 +1,175 @@
+import re
+from datetime import date
+
+'''
+Monthly range partitions for the historical_weather table.
+
+historical_weather keeps growing by one row per resort per day. Declared as
+PARTITION BY RANGE (time) with one partition per calendar month, queries that
+filter on time (the dashboard, the gap search) only touch the months they need,
+and old seasons can be detached in one cheap statement instead of a huge DELETE.
+
+Partitions are named <table>_YYYY_MM and created on demand by ensure_partitions
+before rows are written (populate_weather_data does this for the months it is
+about to fetch). apply_retention detaches partitions older than the retention
+window and moves them to the `archive` schema (or drops them). A month archived
+before keeps its name, a later archive of the same month gets a _2, _3, ... suffix.
+
+A plain historical_weather table from before partitioning is converted by
+migrate_to_partitions the first time populate_weather_data runs.
+'''
+
+ARCHIVE_SCHEMA = "archive"
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def create_historical_table(cursor, table):
+    '''
+    Create the partitioned historical table (without partitions) if it does not exist.
+    '''
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER REFERENCES resorts(id),
+        time TIMESTAMP NOT NULL,
+        temperature_2m_max REAL,
+        temperature_2m_min REAL,
+        apparent_temperature_max REAL,
+        apparent_temperature_min REAL,
+        precipitation_sum REAL,
+        precipitation_hours REAL,
+        snowfall_sum REAL,
+        PRIMARY KEY (id, time)
+    ) PARTITION BY RANGE (time);
+    """)
+
+
+def list_partitions(cursor, table):
+    '''
+    {month (first day): partition name} of the partitions attached to table.
+    Partitions not named <table>_YYYY_MM (e.g. a DEFAULT partition) are left out.
+    '''
+    pattern = re.compile(rf"{re.escape(table.split('.')[-1])}_(\d{{4}})_(\d{{2}})")
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (table,))
+
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = pattern.fullmatch(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def ensure_partitions(cursor, table, start_date, end_date):
+    '''
+    Create the monthly partitions covering start_date to end_date (inclusive) that do not exist yet.
+    Does not commit. Returns the names of the partitions created.
+    '''
+    existing = list_partitions(cursor, table)
+    created = []
+
+    month = month_start(start_date)
+    while month <= end_date:
+        if month not in existing:
+            name = partition_name(table, month)
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+                FOR VALUES FROM ('{month}') TO ('{next_month(month)}')
+            """)
+            created.append(name)
+        month = next_month(month)
+
+    return created
+
+
+def migrate_to_partitions(cursor, table):
+    '''
+    Convert a plain (unpartitioned) table into the partitioned layout, copying every row.
+    Does nothing if the table is already partitioned or does not exist. Does not commit,
+    so the whole conversion is one transaction. Returns True if the table was converted.
+    '''
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    if row is None or row[0] != 'r':
+        return False
+
+    old = f"{table}_unpartitioned"
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    cursor.execute(f"ALTER INDEX IF EXISTS {table}_pkey RENAME TO {old}_pkey")
+    create_historical_table(cursor, table)
+
+    cursor.execute(f"SELECT MIN(time)::date, MAX(time)::date FROM {old}")
+    first, last = cursor.fetchone()
+    if first is not None:
+        ensure_partitions(cursor, table, first, last)
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+
+    cursor.execute(f"DROP TABLE {old}")
+    return True
+
+
+def retention_cutoff(keep_months, today=None):
+    '''
+    First day of the oldest month kept by a retention of `keep_months` months before the current month.
+    '''
+    cutoff = month_start(today or date.today())
+    for _ in range(keep_months):
+        cutoff = date(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1)
+    return cutoff
+
+
+def archive_name(cursor, name):
+    '''
+    Name for a partition moved to the archive schema: its own name, or name_2, name_3, ... when the
+    archive already has a table (or primary key index) of that name, i.e. the month was archived
+    before and then re-created.
+    '''
+    archived, suffix = name, 1
+    while True:
+        cursor.execute("SELECT to_regclass(%s) IS NULL AND to_regclass(%s) IS NULL",
+                       (f"{ARCHIVE_SCHEMA}.{archived}", f"{ARCHIVE_SCHEMA}.{archived}_pkey"))
+        if cursor.fetchone()[0]:
+            return archived
+        suffix += 1
+        archived = f"{name}_{suffix}"
+
+
+def apply_retention(cursor, table, keep_months, today=None, archive=True):
+    '''
+    Detach the partitions of months that ended more than `keep_months` months before today.
+    With archive=True they are moved to the archive schema (still queryable, no longer scanned by
+    the app), otherwise dropped. Does not commit. Returns the names of the partitions removed.
+    '''
+    cutoff = retention_cutoff(keep_months, today)
+    removed = []
+    for month, name in sorted(list_partitions(cursor, table).items()):
+        if month >= cutoff:
+            break
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+        if archive:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+            archived = archive_name(cursor, name)
+            if archived != name:
+                cursor.execute(f"ALTER TABLE {name} RENAME TO {archived}")
+                cursor.execute(f"ALTER INDEX IF EXISTS {name}_pkey RENAME TO {archived}_pkey")
+            cursor.execute(f"ALTER TABLE {archived} SET SCHEMA {ARCHIVE_SCHEMA}")
+        else:
+            cursor.execute(f"DROP TABLE {name}")
+        removed.append(name)
+
+    return removed
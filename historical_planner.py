@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+import pandas as pd
+
+'''
+Plans which historical date ranges to request from OpenMeteo.
+
+The gaps come from utils.find_missing_ranges (every missing day) or
+utils.find_tail_ranges (only the days after the latest stored day, cheap
+enough for the daily cron). The planner then:
+
+    1. coalesces gaps of the same resort separated by only a few stored days,
+       since refetching a couple of days is cheaper than another request
+    2. cuts long spans (multi season backfills) into windows of at most
+       `window_days`, aligned to fixed boundaries so different resorts end
+       up with the same windows
+    3. groups resorts with identical windows, so each window is one batched
+       request per `batch_size` resorts
+'''
+
+# Windows are aligned to multiples of window_days counted from this day
+WINDOW_EPOCH = date(2000, 1, 1)
+
+
+def coalesce_gaps(gaps, coalesce_days=3):
+    '''
+    Merge gaps of the same resort that are separated by `coalesce_days` stored days or fewer.
+    gaps has id, start_date, end_date columns (inclusive dates).
+    '''
+
+    merged = []
+    for resort_id, resort_gaps in gaps.sort_values(['id', 'start_date']).groupby('id', sort=False):
+        current_start, current_end = None, None
+        for gap in resort_gaps.itertuples(index=False):
+            if current_end is not None and (gap.start_date - current_end).days - 1 <= coalesce_days:
+                current_end = max(current_end, gap.end_date)
+                continue
+            if current_end is not None:
+                merged.append((resort_id, current_start, current_end))
+            current_start, current_end = gap.start_date, gap.end_date
+        merged.append((resort_id, current_start, current_end))
+
+    return pd.DataFrame(merged, columns=['id', 'start_date', 'end_date'])
+
+
+def split_into_windows(start_date, end_date, window_days=366):
+    '''
+    Split [start_date, end_date] into consecutive windows of at most `window_days` days,
+    cut at multiples of window_days from WINDOW_EPOCH.
+    Returns a list of (window_start, window_end) tuples, inclusive.
+    '''
+
+    windows = []
+    current = start_date
+    while current <= end_date:
+        offset = (current - WINDOW_EPOCH).days % window_days
+        boundary_end = current + timedelta(days=window_days - offset - 1)
+        window_end = min(boundary_end, end_date)
+        windows.append((current, window_end))
+        current = window_end + timedelta(days=1)
+    return windows
+
+
+def plan_fetches(gaps, coalesce_days=3, window_days=366):
+    '''
+    Turn per-resort gaps into fetch requests.
+    Returns a dataframe with start_date, end_date and ids (list of resort ids sharing that window),
+    sorted by start_date.
+    '''
+
+    if gaps.empty:
+        return pd.DataFrame(columns=['start_date', 'end_date', 'ids'])
+
+    windows = []
+    for gap in coalesce_gaps(gaps, coalesce_days).itertuples(index=False):
+        for window_start, window_end in split_into_windows(gap.start_date, gap.end_date, window_days):
+            windows.append((gap.id, window_start, window_end))
+
+    windows = pd.DataFrame(windows, columns=['id', 'start_date', 'end_date'])
+    plan = windows.groupby(['start_date', 'end_date'])['id'].agg(list).reset_index(name='ids')
+    return plan.sort_values(['start_date', 'end_date'], ignore_index=True)
+
+
+def plan_summary(plan, batch_size=50):
+    '''
+    Days requested and number of API requests a plan will make, for logging.
+    '''
+    days = sum(((row.end_date - row.start_date).days + 1) * len(row.ids) for row in plan.itertuples())
+    requests = sum(-(-len(ids) // batch_size) for ids in plan['ids'])
+    return {'windows': len(plan), 'resort_days': days, 'requests': requests}
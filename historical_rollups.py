@@ -0,0 +1,170 @@
+from datetime import date, timedelta
+
+'''
+Weekly and per season rollups of the historical_weather table.
+
+A dashboard range of several seasons used to aggregate every stored day of every selected
+resort, so its cost grew with the length of the history. The rollup tables
+(historical_weather_by_week, historical_weather_by_season) keep one row per resort and
+week or season: totals of snowfall and precipitation, the extremes of the temperatures
+(the same aggregates as the dashboard, HISTORICAL_AGGREGATES), totals of the temperatures
+(ROLLUP_TOTALS) and the number of days behind them, so the mean of any variable is its
+total / days. Long range queries read a few rows per resort.
+
+The bucket definitions live here, next to the tables they shape; data_access.py imports
+them for the dashboard queries.
+
+The rollups are maintained incrementally: populate_weather_data calls refresh_rollups with
+the date range it wrote, and only the weeks and seasons overlapping that range are
+recomputed from the daily rows. The rollups are kept when old daily partitions are
+archived, so long range views still cover them.
+'''
+
+# How each variable is combined when days are grouped into weeks or months
+HISTORICAL_AGGREGATES = {
+    'snowfall_sum': 'SUM',
+    'precipitation_sum': 'SUM',
+    'temperature_2m_max': 'MAX',
+    'apparent_temperature_max': 'MAX',
+    'temperature_2m_min': 'MIN',
+    'apparent_temperature_min': 'MIN',
+}
+
+# Variables kept as extremes also get a {variable}_total column (their SUM), so their means
+# over a week or season are {variable}_total / days like the snowfall and precipitation ones
+ROLLUP_TOTALS = [variable for variable, function in HISTORICAL_AGGREGATES.items() if function != 'SUM']
+
+# Ski seasons run from October 1st to September 30th
+SEASON_START_MONTH = 10
+
+# Buckets with a rollup table next to the historical table,
+# and the SQL expression of the bucket start of a day
+ROLLUP_BUCKETS = {
+    'week': "date_trunc('week', time)",
+    'season': f"date_trunc('year', time + interval '{13 - SEASON_START_MONTH} months') - interval '{13 - SEASON_START_MONTH} months'",
+}
+
+
+def rollup_table(table, bucket):
+    return f"{table}_by_{bucket}"
+
+
+def bucket_start(bucket, day):
+    '''
+    First day of the week (Monday) or season containing day.
+    '''
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'season':
+        return date(day.year - (day.month < SEASON_START_MONTH), SEASON_START_MONTH, 1)
+    return day
+
+
+def bucket_end(bucket, day):
+    '''
+    First day after the week or season containing day.
+    '''
+    if bucket == 'week':
+        return bucket_start(bucket, day) + timedelta(days=7)
+    if bucket == 'season':
+        return date(bucket_start(bucket, day).year + 1, SEASON_START_MONTH, 1)
+    return day + timedelta(days=1)
+
+
+def rollup_columns():
+    '''
+    {column: SQL aggregate of the daily rows} of the rollup tables, besides id, time and days.
+    '''
+    columns = {variable: f'{function}({variable})' for variable, function in HISTORICAL_AGGREGATES.items()}
+    columns.update({f'{variable}_total': f'SUM({variable})' for variable in ROLLUP_TOTALS})
+    return columns
+
+
+def create_rollup_tables(cursor, table):
+    '''
+    Create the rollup tables of `table` if they do not exist, and add the columns missing from
+    tables created by an earlier version.
+    Returns True if any table was created or extended (and so needs a full refresh_rollups).
+    '''
+    columns = rollup_columns()
+    changed = False
+    for bucket in ROLLUP_BUCKETS:
+        name = rollup_table(table, bucket)
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        changed = changed or cursor.fetchone()[0] is None
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER REFERENCES resorts(id),
+            time TIMESTAMP NOT NULL,
+            days INTEGER NOT NULL,
+            {', '.join(f'{column} REAL' for column in columns)},
+            PRIMARY KEY (id, time)
+        );
+        """)
+
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = %s AND table_schema = current_schema()
+        """, (name,))
+        existing = {row[0] for row in cursor.fetchall()}
+        for column in columns:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE {name} ADD COLUMN {column} REAL")
+                changed = True
+    return changed
+
+
+def refresh_rollups(cursor, table, start_date=None, end_date=None, retained_from=None, ids=None):
+    '''
+    Recompute the weeks and seasons overlapping start_date to end_date (inclusive) from the
+    daily rows of `table`, or every bucket of the stored days when no range is given. With ids,
+    only the rows of those resorts are recomputed.
+    Buckets starting before retained_from (the oldest day still stored after retention) are left
+    alone, their earlier days are archived and can't be summed again. A full refresh finds that
+    day itself: when the rollups hold buckets older than the oldest stored day, the months
+    before it were archived, and those buckets are kept (columns added since stay empty there).
+    Does not commit. Returns the number of rollup rows written.
+    '''
+    columns = rollup_columns()
+
+    full = start_date is None
+    if full:
+        cursor.execute(f"SELECT MIN(time)::date, MAX(time)::date FROM {table}")
+        start_date, end_date = cursor.fetchone()
+        if start_date is None:
+            # Nothing stored, possibly all archived: keep whatever the rollups hold
+            return 0
+
+    written = 0
+    for bucket, expression in ROLLUP_BUCKETS.items():
+        name = rollup_table(table, bucket)
+
+        first = bucket_start(bucket, start_date)
+        kept_from = retained_from
+        if full and kept_from is None:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE time < %s::timestamp)", (first,))
+            if cursor.fetchone()[0]:
+                kept_from = start_date
+        if kept_from is not None and first < kept_from:
+            # The bucket holding kept_from is only complete if it starts on that day
+            first = kept_from if bucket_start(bucket, kept_from) == kept_from else bucket_end(bucket, kept_from)
+        last = bucket_end(bucket, end_date)
+        if first >= last:
+            continue
+        where = "WHERE time >= %s::timestamp AND time < %s::timestamp"
+        params = (first, last)
+        if ids is not None:
+            where += " AND id = ANY(%s)"
+            params += ([int(i) for i in ids],)
+        cursor.execute(f"DELETE FROM {name} {where}", params)
+
+        cursor.execute(f"""
+            INSERT INTO {name} (id, time, days, {', '.join(columns)})
+            SELECT id, {expression}, COUNT(*), {', '.join(columns.values())}
+            FROM {table}
+            {where}
+            GROUP BY 1, 2
+        """, params)
+        written += cursor.rowcount
+
+    return written
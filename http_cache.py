@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+'''
+Persistent cache of JSON API responses (OpenMeteo, OpenRouteService), stored in SQLite.
+
+Entries are keyed by the endpoint name plus the request parameters, normalized
+so the same request always gets the same key. Each endpoint has its own TTL:
+forecasts go stale quickly, historical days older than a few days never change
+(cached forever), and routing results change rarely. When the cache grows past
+max_entries or max_bytes, the least recently used entries are evicted. The entry count
+and total size are kept up to date on every write, expired entries are swept every
+SWEEP_EVERY writes (or when a limit is reached).
+
+Caching is off unless a cache is passed in, or the HTTP_CACHE_PATH environment
+variable points at a cache file (handy for development and reruns):
+
+    HTTP_CACHE_PATH=.http_cache.sqlite python populate_historical.py
+'''
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Seconds an entry stays valid, None means it never expires
+DEFAULT_TTLS = {
+    "openmeteo_forecast": HOUR,
+    "openmeteo_historical": None,
+    "openmeteo_historical_recent": 6 * HOUR,
+    "ors_matrix": 30 * DAY,
+}
+
+# Writes between two sweeps of the expired entries (which also recount the totals)
+SWEEP_EVERY = 1000
+
+# OpenMeteo keeps revising the last few days of the archive, days older than this are final
+HISTORICAL_FINAL_AFTER_DAYS = 5
+
+
+def normalize_key(endpoint, params):
+    '''
+    Stable key for a request: the endpoint plus the params as sorted JSON, hashed.
+    '''
+    body = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{endpoint}?{body}".encode()).hexdigest()
+
+
+def openmeteo_endpoint(url, params):
+    '''
+    Name of the cache endpoint (and so the TTL) for an OpenMeteo request.
+    Historical requests ending more than HISTORICAL_FINAL_AFTER_DAYS ago are final.
+    '''
+    if "start_date" not in params:
+        return "openmeteo_forecast"
+
+    final_before = datetime.now(timezone.utc).date() - timedelta(days=HISTORICAL_FINAL_AFTER_DAYS)
+    if str(params["end_date"]) < str(final_before):
+        return "openmeteo_historical"
+    return "openmeteo_historical_recent"
+
+
+class ResponseCache:
+    '''
+    SQLite backed response cache, safe to share between threads.
+    '''
+
+    def __init__(self, path, ttls=None, max_entries=50_000, max_bytes=512 * 2**20):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)")
+        self.conn.commit()
+
+        # Entry count and total size, maintained by set() and _evict()
+        self.writes = 0
+        self.count, self.size = self._totals()
+
+    def get(self, endpoint, params):
+        '''
+        Cached value for the request, or None on a miss (absent or expired).
+        '''
+        key = normalize_key(endpoint, params)
+        now = time.time()
+
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+
+            if row is None or (row[1] is not None and row[1] < now):
+                self.misses[endpoint] = self.misses.get(endpoint, 0) + 1
+                return None
+
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+
+        return json.loads(row[0])
+
+    def set(self, endpoint, params, value):
+        key = normalize_key(endpoint, params)
+        body = json.dumps(value)
+        now = time.time()
+        ttl = self.ttls.get(endpoint, HOUR)
+        expires = None if ttl is None else now + ttl
+
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, value, size, expires, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, body, len(body), expires, now)
+            )
+            self.count += old is None
+            self.size += len(body) - (old[0] if old else 0)
+            self._evict(now)
+            self.conn.commit()
+
+    def get_or_fetch(self, endpoint, params, fetch):
+        '''
+        Cached value for the request, or the result of fetch() (which is then cached).
+        '''
+        value = self.get(endpoint, params)
+        if value is None:
+            value = fetch()
+            self.set(endpoint, params, value)
+        return value
+
+    def _totals(self):
+        return self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def _over_limits(self):
+        return self.count > self.max_entries or self.size > self.max_bytes
+
+    def _evict(self, now):
+        # Expired entries go first, then the least recently used until under both limits.
+        # The sweep recounts the totals, which also picks up writes by other processes sharing the file.
+        self.writes += 1
+        if self.writes % SWEEP_EVERY == 0 or self._over_limits():
+            self.conn.execute("DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?", (now,))
+            self.count, self.size = self._totals()
+
+        while self._over_limits():
+            excess = max(self.count - self.max_entries, self.count // 100, 1)
+            oldest = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT ?", (excess,)).fetchall()
+            if not oldest:
+                self.count, self.size = 0, 0
+                break
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in oldest])
+            self.count -= len(oldest)
+            self.size -= sum(size for _, size in oldest)
+
+    def stats(self):
+        '''
+        Hit and miss counters per endpoint since the cache was opened.
+        '''
+        endpoints = sorted(set(self.hits) | set(self.misses))
+        return {
+            endpoint: {"hits": self.hits.get(endpoint, 0), "misses": self.misses.get(endpoint, 0)}
+            for endpoint in endpoints
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    '''
+    The cache configured by the HTTP_CACHE_PATH environment variable, or None if it is not set.
+    '''
+    global _default_cache
+
+    path = os.getenv("HTTP_CACHE_PATH")
+    if not path:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None or _default_cache.path != path:
+            _default_cache = ResponseCache(path)
+    return _default_cache
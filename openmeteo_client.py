@@ -0,0 +1,342 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import pandas as pd
+import requests
+from http_cache import get_default_cache, openmeteo_endpoint
+from run_metrics import add_span, count, record_resort, span
+
+'''
+Small OpenMeteo client used by the ingestion scripts.
+
+openmeteopy sends one blocking request per resort, so the forecast refresh
+grew linearly with the number of resorts. This module talks to the API
+directly with requests so resorts can be fetched by a pool of workers,
+with a per-host rate limit and retries with exponential backoff.
+
+OpenMeteo accepts comma separated latitude/longitude lists, so resorts are
+sent in batches of several coordinates per request and the multi-location
+response is split back into one frame per resort id.
+
+Responses can be cached on disk between runs, see http_cache.py.
+Requests, retries, bytes received and latencies are recorded in the active run, see run_metrics.py.
+
+The endpoints can be overridden with the OPENMETEO_FORECAST_URL and OPENMETEO_HISTORICAL_URL
+environment variables (e.g. a local stub, see benchmarks/stub_openmeteo.py), or per call with url=.
+
+The frames it returns have the same shape as openmeteopy's get_pandas()
+output after the id column is added: id, time, then one column per
+requested variable in request order.
+'''
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+HISTORICAL_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+
+def forecast_url():
+    return os.getenv("OPENMETEO_FORECAST_URL", FORECAST_URL)
+
+
+def historical_url():
+    return os.getenv("OPENMETEO_HISTORICAL_URL", HISTORICAL_URL)
+
+
+# Status codes worth retrying (rate limited or server side trouble)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_thread_local = threading.local()
+
+
+def get_session():
+    '''
+    requests.Session is not guaranteed to be thread safe, so each worker keeps its own.
+    Reusing the session keeps the TLS connection to OpenMeteo alive between requests.
+    '''
+    if not hasattr(_thread_local, "session"):
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+
+class HostRateLimiter:
+    '''
+    Spaces out requests so at most `requests_per_second` start per host.
+    Shared between all worker threads. A value of 0 or None disables the limit.
+    '''
+
+    def __init__(self, requests_per_second=None):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        if not self.min_interval:
+            return
+
+        host = urlparse(url).netloc
+
+        # Reserve the next free slot for this host, then sleep outside the lock
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.min_interval
+
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            add_span("http.rate_limit_wait", delay)
+
+
+def request_json(url, params, rate_limiter=None, retries=3, backoff=0.5, timeout=30, cache=None):
+    '''
+    GET the url and return the decoded JSON body.
+    Connection errors, timeouts and the status codes in RETRY_STATUS_CODES are retried
+    with exponential backoff (backoff, 2*backoff, 4*backoff, ...). Anything else is raised.
+
+    Responses are read from and saved to `cache` (an http_cache.ResponseCache), or to the
+    cache configured by HTTP_CACHE_PATH when cache is None.
+    '''
+
+    cache = cache or get_default_cache()
+    if cache is not None:
+        endpoint = openmeteo_endpoint(url, params)
+        cache_params = dict(params, url=url)
+        cached = cache.get(endpoint, cache_params)
+        if cached is not None:
+            count("http_cache_hits")
+            return cached
+
+    error = None
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.wait(url)
+        if attempt:
+            count("http_retries")
+
+        count("http_requests")
+        try:
+            with span("http.request"):
+                response = get_session().get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            count("http_errors")
+            error = e
+        else:
+            count("http_bytes", len(response.content))
+            if response.status_code == 200:
+                with span("http.decode"):
+                    payload = response.json()
+                if cache is not None:
+                    cache.set(endpoint, cache_params, payload)
+                return payload
+
+            count("http_errors")
+
+            # OpenMeteo explains bad requests in a "reason" field, no point retrying those
+            if response.status_code not in RETRY_STATUS_CODES:
+                reason = response.text
+                if response.status_code == 400:
+                    try:
+                        reason = response.json().get("reason", reason)
+                    except ValueError:
+                        # A proxy in between may answer 400 with an HTML page
+                        pass
+                raise requests.HTTPError(f"OpenMeteo returned HTTP {response.status_code}: {reason}", response=response)
+
+            error = requests.HTTPError(f"OpenMeteo returned HTTP {response.status_code}", response=response)
+
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+
+    raise error
+
+
+def response_to_frame(payload, section, resort_id, params):
+    '''
+    Convert the "hourly" or "daily" block of an OpenMeteo response to a dataframe
+    with an id column in front, matching the column order of the database tables.
+    '''
+    block = payload.get(section)
+    if not block:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(block)
+    df.insert(0, "id", resort_id)
+    return df[["id", "time"] + list(params)]
+
+
+def forecast_params(hourly_params, daily_params):
+    '''
+    Query parameters for the forecast endpoint, without the coordinates.
+    '''
+    params = {"timezone": "UTC"}
+    if hourly_params:
+        params["hourly"] = ",".join(hourly_params)
+    if daily_params:
+        params["daily"] = ",".join(daily_params)
+    return params
+
+
+def fetch_batch(url, resorts, params, rate_limiter=None, retries=3, backoff=0.5, cache=None):
+    '''
+    Fetch a chunk of resorts with one request, passing the coordinates as comma separated lists.
+    OpenMeteo answers with a list of locations in request order (a single object for one location).
+
+    Returns one payload per resort, in order. If the batched request fails, or comes back with the
+    wrong number of locations, each resort is requested on its own instead. Resorts that still fail
+    get a None payload and are counted in resorts_failed, so one bad batch never stops the run.
+    '''
+
+    request = dict(
+        params,
+        latitude=",".join(str(resort.latitude) for resort in resorts),
+        longitude=",".join(str(resort.longitude) for resort in resorts)
+    )
+
+    try:
+        start = time.perf_counter()
+        payload = request_json(url, request, rate_limiter=rate_limiter, retries=retries, backoff=backoff, cache=cache)
+        payloads = payload if isinstance(payload, list) else [payload]
+        if len(payloads) == len(resorts):
+            # Every resort of the batch waited for the same request
+            elapsed = time.perf_counter() - start
+            for resort in resorts:
+                record_resort(resort.id, http_seconds=elapsed)
+            return payloads
+        print(f"Batch of {len(resorts)} resorts returned {len(payloads)} locations, retrying one at a time")
+    except requests.RequestException as e:
+        if len(resorts) == 1:
+            count("resorts_failed")
+            print(f"Failed to fetch resort id {resorts[0].id}: {e}")
+            return [None]
+        print(f"Batch of {len(resorts)} resorts failed ({e}), retrying one at a time")
+
+    payloads = []
+    for resort in resorts:
+        single = dict(params, latitude=resort.latitude, longitude=resort.longitude)
+        try:
+            start = time.perf_counter()
+            payloads.append(request_json(url, single, rate_limiter=rate_limiter, retries=retries, backoff=backoff, cache=cache))
+            record_resort(resort.id, http_seconds=time.perf_counter() - start)
+        except requests.RequestException as e:
+            count("resorts_failed")
+            print(f"Failed to fetch resort id {resort.id}: {e}")
+            payloads.append(None)
+
+    return payloads
+
+
+def iter_locations(resorts_df, url, params, batch_size=50, max_workers=8, requests_per_second=10,
+                   retries=3, backoff=0.5, cache=None):
+    '''
+    Fetch `params` for every resort in resorts_df (needs id, latitude and longitude columns),
+    `batch_size` coordinates per request, with up to `max_workers` requests in flight.
+
+    Yields one list of (resort_id, payload) tuples per batch, in resorts_df order.
+    payload is None for resorts that could not be fetched.
+    At most `max_workers` batches are fetched ahead of the consumer, so memory stays
+    bounded by batch_size * max_workers resorts no matter how many resorts there are.
+    '''
+
+    rate_limiter = HostRateLimiter(requests_per_second)
+    resorts = list(resorts_df[["id", "latitude", "longitude"]].itertuples(index=False))
+    chunks = [resorts[i:i + batch_size] for i in range(0, len(resorts), batch_size)]
+
+    def fetch_chunk(chunk):
+        payloads = fetch_batch(url, chunk, params, rate_limiter=rate_limiter, retries=retries, backoff=backoff, cache=cache)
+        print(f'Fetched {len(chunk)} resorts, ids {chunk[0].id} to {chunk[-1].id}')
+        return [(resort.id, payload) for resort, payload in zip(chunk, payloads)]
+
+    # Futures are consumed in submission order to keep resorts_df order
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(fetch_chunk, chunk))
+            if len(pending) >= max_workers:
+                with span("fetch.wait"):
+                    result = pending.popleft().result()
+                yield result
+
+        while pending:
+            with span("fetch.wait"):
+                result = pending.popleft().result()
+            yield result
+
+
+def fetch_locations(resorts_df, url, params, **kwargs):
+    '''
+    Same as iter_locations, but returns every (resort_id, payload) tuple in a single list.
+    '''
+    return [pair for batch in iter_locations(resorts_df, url, params, **kwargs) for pair in batch]
+
+
+def iter_forecasts(resorts_df, hourly_params, daily_params, batch_size=50, max_workers=8,
+                   requests_per_second=10, retries=3, backoff=0.5, cache=None, url=None):
+    '''
+    Fetch the hourly and daily forecast for every resort in resorts_df.
+
+    Yields one list of (resort_id, hourly_df, daily_df) tuples per batch, in resorts_df order.
+    Resorts that could not be fetched are left out.
+    '''
+
+    params = forecast_params(hourly_params, daily_params)
+    batches = iter_locations(resorts_df, url or forecast_url(), params, batch_size=batch_size, max_workers=max_workers,
+                             requests_per_second=requests_per_second, retries=retries, backoff=backoff, cache=cache)
+
+    for batch in batches:
+        with span("reshape.frames"):
+            results = [
+                (
+                    resort_id,
+                    response_to_frame(payload, "hourly", resort_id, hourly_params),
+                    response_to_frame(payload, "daily", resort_id, daily_params),
+                )
+                for resort_id, payload in batch if payload is not None
+            ]
+        for resort_id, hourly, daily in results:
+            record_resort(resort_id, rows=len(hourly) + len(daily))
+        yield results
+
+
+def fetch_forecasts(resorts_df, hourly_params, daily_params, **kwargs):
+    '''
+    Same as iter_forecasts, but returns every (resort_id, hourly_df, daily_df) tuple in a single list.
+    '''
+    return [result for batch in iter_forecasts(resorts_df, hourly_params, daily_params, **kwargs) for result in batch]
+
+
+def iter_historical(resorts_df, daily_params, start_date, end_date, batch_size=50, max_workers=4,
+                    requests_per_second=5, retries=3, backoff=0.5, cache=None, url=None):
+    '''
+    Fetch daily historical weather between start_date and end_date (inclusive) for every resort.
+
+    Yields one list of (resort_id, daily_df) tuples per batch, in resorts_df order.
+    Resorts that could not be fetched are left out.
+    '''
+
+    params = {
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "daily": ",".join(daily_params),
+        "timezone": "UTC"
+    }
+    batches = iter_locations(resorts_df, url or historical_url(), params, batch_size=batch_size, max_workers=max_workers,
+                             requests_per_second=requests_per_second, retries=retries, backoff=backoff, cache=cache)
+
+    for batch in batches:
+        with span("reshape.frames"):
+            results = [
+                (resort_id, response_to_frame(payload, "daily", resort_id, daily_params))
+                for resort_id, payload in batch if payload is not None
+            ]
+        for resort_id, daily in results:
+            record_resort(resort_id, rows=len(daily))
+        yield results
+
+
+def fetch_historical(resorts_df, daily_params, start_date, end_date, **kwargs):
+    '''
+    Same as iter_historical, but returns every (resort_id, daily_df) tuple in a single list.
+    '''
+    return [result for batch in iter_historical(resorts_df, daily_params, start_date, end_date, **kwargs) for result in batch]
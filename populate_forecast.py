@@ -3,97 +3,78 @@ from openmeteopy.hourly import HourlyForecast
 from openmeteopy.daily import DailyForecast
 from openmeteopy.options import ForecastOptions
 import pandas as pd
-from utils import get_connection, access_secret, get_weather_data, insert_hourly_df, insert_daily_df
+from utils import access_secret, stream_weather_data
+from db_pool import get_pool
+import run_metrics
+from weather_codes import update_weather_codes
 
 '''
 
 This script is used to get the hourly weather data for a specific resort.
 It is used to get the snowfall data for US Ski Resorts file.
 
-This currently deletes the existing forecast tables and creates new ones.
+This loads the forecast into staging tables batch by batch and then upserts
+the changed rows into the existing forecast tables in one transaction.
+Afterwards the per resort forecast_summary table read by the app is refreshed.
+Weather descriptions are kept in the weather_codes table, not on every row.
     This improves the performance and allows for the data to be the most
 
+Each run emits a JSON report of its stage timings and counters (run_metrics.py).
+
 '''
 
 def main_entry_point(event,context):
+
+    # Stage timings, rows and HTTP counters are reported as JSON when the run ends (see run_metrics.py)
+    with run_metrics.run("forecast_refresh"):
         
-    project_id = "cpsc324-project-452600"
-
-    DB_CONFIG = {
-        "host": access_secret("snow-host", project_id),
-        "user": access_secret("snow-user", project_id),
-        "password": access_secret("snow-password", project_id),
-        "dbname": access_secret("snow-dbname", project_id),
-        "port": access_secret("snow-port", project_id),
-        "gssencmode": 'disable'
-    }
-
-    # Initialize OpenMeteo objects
-    hourly_obj = HourlyForecast()
-    daily_obj = DailyForecast()
-
-    # Set the hourly and daily forecast objects to include the desired data
-    hourly_obj = hourly_obj.precipitation().snowfall().snow_depth().freezinglevel_height().rain().Showers().weathercode()
-
-    daily_obj = daily_obj.windspeed_10m_max().windgusts_10m_max().winddirection_10m_dominant().temperature_2m_max()\
-                .temperature_2m_min().apparent_temperature_max().apparent_temperature_min().weathercode()
-
-    # Map weather codes to their descriptions
-    weather_code_map = {
-        0: "Clear sky",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        45: "Fog and depositing rime fog",
-        48: "Fog and depositing rime fog",
-        51: "Drizzle: Light intensity",
-        53: "Drizzle: Moderate intensity",
-        55: "Drizzle: Dense intensity",
-        56: "Freezing Drizzle: Light intensity",
-        57: "Freezing Drizzle: Dense intensity",
-        61: "Rain: Slight intensity",
-        63: "Rain: Moderate intensity",
-        65: "Rain: Heavy intensity",
-        66: "Freezing Rain: Light intensity",
-        67: "Freezing Rain: Heavy intensity",
-        71: "Snow fall: Slight intensity",
-        73: "Snow fall: Moderate intensity",
-        75: "Snow fall: Heavy intensity",
-        77: "Snow grains",
-        80: "Rain showers: Slight",
-        81: "Rain showers: Moderate",
-        82: "Rain showers: Violent",
-        85: "Snow showers: Slight",
-        86: "Snow showers: Heavy",
-        95: "Thunderstorm: Slight or moderate",
-        96: "Thunderstorm: With Slight Hail",
-        99: "Thunderstorm: With Heavy Hail"
-    }
-
-
-    # ------------------- Connect DB -------------------- #
-    try:
-        conn = get_connection(DB_CONFIG)
-        cur = conn.cursor()
-        print("Connection successful!")
-    except Exception as e:
-        print(f"Failed to connect: {e}")
-
-    resorts = pd.read_sql("SELECT * FROM resorts", conn)
-    print(resorts.head())
-
-    # ------------------- Upload Weather Data ------------------- #
-
-    # Get weather data
-    hourly_df, daily_df = get_weather_data(resorts, weather_code_map, hourly_obj, daily_obj)
-
-    insert_hourly_df(hourly_df, cur, conn)
-    insert_daily_df(daily_df, cur, conn)
-
-    cur.close()
-    conn.close()
-
-    print("Completed")
+        project_id = "cpsc324-project-452600"
+
+        DB_CONFIG = {
+            "host": access_secret("snow-host", project_id),
+            "user": access_secret("snow-user", project_id),
+            "password": access_secret("snow-password", project_id),
+            "dbname": access_secret("snow-dbname", project_id),
+            "port": access_secret("snow-port", project_id),
+            "gssencmode": 'disable'
+        }
+
+        # Initialize OpenMeteo objects
+        hourly_obj = HourlyForecast()
+        daily_obj = DailyForecast()
+
+        # Set the hourly and daily forecast objects to include the desired data
+        hourly_obj = hourly_obj.precipitation().snowfall().snow_depth().freezinglevel_height().rain().Showers().weathercode()
+
+        daily_obj = daily_obj.windspeed_10m_max().windgusts_10m_max().winddirection_10m_dominant().temperature_2m_max()\
+                    .temperature_2m_min().apparent_temperature_max().apparent_temperature_min().weathercode()
+
+
+
+        # ------------------- Connect DB -------------------- #
+        # The pool outlives the invocation, a warm instance reuses its connection.
+        # A failed connect is raised, so the invocation is reported as failed
+        pool = get_pool(DB_CONFIG)
+        with pool.connection() as conn:
+            cur = conn.cursor()
+            print("Connection successful!")
+
+            resorts = pd.read_sql("SELECT * FROM resorts", conn)
+            print(resorts.head())
+
+            # ------------------- Upload Weather Data ------------------- #
+
+            # Keep the weather code descriptions in sync, the forecast tables only store the codes
+            update_weather_codes(cur)
+            conn.commit()
+
+            # Fetch weather data and write it batch by batch
+            stream_weather_data(resorts, hourly_obj, daily_obj, cur, conn)
+
+            cur.close()
+
+        print(f"Connection pool: {pool.stats()}")
+        print("Completed")
 
 # ------------------- Local Testing ------------------- #
 
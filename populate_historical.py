@@ -1,24 +1,41 @@
-from utils import populate_weather_data, get_connection
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-
-DB_CONFIG = {
-    "host": os.getenv("host"),
-    "user": os.getenv("user"),
-    "password": os.getenv("password"),
-    "dbname": os.getenv("dbname"),
-    "port": os.getenv("port"),
-    "gssencmode": 'disable'
-}
-
-WEATHER_TABLE = "historical_weather"
-
-conn = get_connection(DB_CONFIG)
-cursor = conn.cursor()
-
-populate_weather_data(conn, cursor, WEATHER_TABLE)
-
-cursor.close()
-conn.close()
+from utils import populate_weather_data
+from db_pool import db_config, get_pool
+import run_metrics
+from dotenv import load_dotenv
+from datetime import date
+import argparse
+
+'''
+Run this script to fill in the historical_weather table.
+
+By default every missing day of the last 90 days is fetched. For the daily refresh,
+--tail-only only fetches the days after each resort's latest stored day.
+For a multi season backfill, pass --start-date (e.g. --start-date 2020-10-01).
+With --retention-months, monthly partitions older than that are moved to the archive schema.
+Stage timings and counters are printed as a JSON report at the end (see run_metrics.py).
+
+'''
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--start-date", type=date.fromisoformat, default=None)
+parser.add_argument("--tail-only", action="store_true")
+parser.add_argument("--retention-months", type=int, default=None)
+args = parser.parse_args()
+
+load_dotenv()
+
+DB_CONFIG = db_config()
+
+WEATHER_TABLE = "historical_weather"
+
+pool = get_pool(DB_CONFIG)
+with run_metrics.run("historical_backfill"), pool.connection() as conn:
+    cursor = conn.cursor()
+
+    populate_weather_data(conn, cursor, WEATHER_TABLE, start_date=args.start_date, fill_gaps=not args.tail_only,
+                          retention_months=args.retention_months)
+
+    cursor.close()
+
+print(f"Connection pool: {pool.stats()}")
+pool.close()
@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+'''
+Stage timings and counters for the ingestion runs (forecast refresh, historical backfill,
+resort update).
+
+An entry point wraps its work in run(name). While a run is active, the instrumented code
+records into it:
+
+    with span("db.merge"):      time spent in a stage (count, total and max seconds)
+    count("http_bytes", n)      counters: requests, retries, bytes, rows fetched and written...
+    record_resort(id, rows=n)   per resort values (HTTP latency of its request, rows produced)
+
+Outside a run these calls return immediately, so the library code can stay instrumented
+for the app and the benchmarks at no cost. Inside a run each call is a perf_counter read
+and a dict update under a lock, negligible next to an HTTP request or a COPY.
+
+When the run ends (or fails) the report is printed as one JSON line, which Cloud Logging
+picks up as a structured entry, and written to METRICS_REPORT_PATH if set. With
+METRICS_PROMETHEUS_PATH set, the stage and counter totals are also written in the
+Prometheus text format, e.g. for node_exporter's textfile collector.
+'''
+
+# Prefix of the Prometheus metric names
+PROMETHEUS_PREFIX = "snowfall"
+
+_current = None
+
+
+class RunMetrics:
+    '''
+    Timings and counters of one run. Safe to record into from worker threads.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+        self.stages = {}    # stage: [calls, total seconds, max seconds]
+        self.counters = {}  # counter: value
+        self.resorts = {}   # resort id: {value name: value}
+
+    def add_span(self, stage, seconds):
+        with self.lock:
+            stats = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def add(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def add_resort(self, resort_id, **values):
+        with self.lock:
+            resort = self.resorts.setdefault(int(resort_id), {})
+            for key, value in values.items():
+                resort[key] = resort.get(key, 0) + value
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self.start
+        self.error = error
+
+    def report(self):
+        '''
+        The run as a JSON serializable dict.
+        '''
+        with self.lock:
+            return {
+                "run": self.name,
+                "started_at": self.started_at.isoformat(),
+                "duration_seconds": round(self.duration if self.duration is not None else time.perf_counter() - self.start, 4),
+                "status": "failed" if self.error else "ok",
+                "error": self.error,
+                "stages": {
+                    stage: {"calls": calls, "seconds": round(total, 4), "max_seconds": round(longest, 4)}
+                    for stage, (calls, total, longest) in sorted(self.stages.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "resorts": {
+                    resort_id: {key: round(value, 4) for key, value in values.items()}
+                    for resort_id, values in sorted(self.resorts.items())
+                },
+            }
+
+    def prometheus(self):
+        '''
+        Stage and counter totals in the Prometheus text exposition format.
+        Per resort values are left out, one series per resort is too many.
+        '''
+        report = self.report()
+        labels = f'run="{self.name}"'
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_run_duration_seconds{{{labels}}} {report['duration_seconds']}",
+            f"# TYPE {PROMETHEUS_PREFIX}_run_success gauge",
+            f"{PROMETHEUS_PREFIX}_run_success{{{labels}}} {0 if self.error else 1}",
+            f"# TYPE {PROMETHEUS_PREFIX}_run_timestamp_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_run_timestamp_seconds{{{labels}}} {self.started_at.timestamp():.0f}",
+        ]
+
+        for metric, key, kind in (("stage_calls_total", "calls", "counter"),
+                                  ("stage_seconds_total", "seconds", "counter"),
+                                  ("stage_max_seconds", "max_seconds", "gauge")):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} {kind}")
+            for stage, stats in report["stages"].items():
+                lines.append(f'{PROMETHEUS_PREFIX}_{metric}{{{labels},stage="{stage}"}} {stats[key]}')
+
+        for counter, value in report["counters"].items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{counter}_total counter")
+            lines.append(f"{PROMETHEUS_PREFIX}_{counter}_total{{{labels}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def write_file(path, text):
+    # Written next to the target and renamed, so collectors never read a half written file
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "w") as f:
+        f.write(text)
+    os.replace(partial, path)
+
+
+@contextmanager
+def run(name, report_path=None, prometheus_path=None):
+    '''
+    Record the stages of the code inside the block into a new RunMetrics, then emit its report.
+    The paths default to the METRICS_REPORT_PATH and METRICS_PROMETHEUS_PATH environment variables.
+    '''
+    global _current
+    report_path = report_path or os.getenv("METRICS_REPORT_PATH")
+    prometheus_path = prometheus_path or os.getenv("METRICS_PROMETHEUS_PATH")
+    metrics = RunMetrics(name)
+    _current = metrics
+    error = None
+    try:
+        yield metrics
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        _current = None
+        metrics.finish(error)
+
+        report = json.dumps(metrics.report())
+        print(report)
+        if report_path:
+            write_file(report_path, report)
+        if prometheus_path:
+            write_file(prometheus_path, metrics.prometheus())
+
+
+@contextmanager
+def span(stage):
+    '''
+    Time the block as one call of `stage` in the active run. Does nothing outside a run.
+    '''
+    metrics = _current
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_span(stage, time.perf_counter() - start)
+
+
+def add_span(stage, seconds):
+    '''
+    Record a duration measured by the caller, for stages that don't fit in a with block.
+    '''
+    metrics = _current
+    if metrics is not None:
+        metrics.add_span(stage, seconds)
+
+
+def count(counter, value=1):
+    metrics = _current
+    if metrics is not None:
+        metrics.add(counter, value)
+
+
+def record_resort(resort_id, **values):
+    metrics = _current
+    if metrics is not None:
+        metrics.add_resort(resort_id, **values)
+
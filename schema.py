@@ -0,0 +1,101 @@
+import pandas as pd
+
+'''
+Canonical pandas dtypes of the database tables.
+
+pandas defaults to int64/float64 and one Python string object per row, although the
+tables only store INTEGER and REAL values and a handful of distinct descriptions,
+states and resort names. Frames are converted with apply_schema as soon as they are
+built (fetches and app queries), which roughly halves their memory:
+
+    INTEGER        -> int32 (Int16 for small codes, nullable because the API can omit them)
+    REAL           -> float32
+    repeated TEXT  -> category
+'''
+
+SCHEMAS = {
+    'resorts': {
+        'id': 'int32',
+        'resort': 'category',
+        'latitude': 'float32',
+        'longitude': 'float32',
+        'state': 'category',
+    },
+    'hourly': {
+        'id': 'int32',
+        'time': 'datetime64[ns]',
+        'precipitation': 'float32',
+        'snowfall': 'float32',
+        'snow_height': 'float32',
+        'freezinglevel_height': 'float32',
+        'rain': 'float32',
+        'showers': 'float32',
+        'weathercode': 'Int16',
+    },
+    'daily': {
+        'id': 'int32',
+        'time': 'datetime64[ns]',
+        'windspeed_10m_max': 'float32',
+        'windgusts_10m_max': 'float32',
+        'winddirection_10m_dominant': 'Int16',
+        'temperature_2m_max': 'float32',
+        'temperature_2m_min': 'float32',
+        'apparent_temperature_max': 'float32',
+        'apparent_temperature_min': 'float32',
+        'weathercode': 'Int16',
+    },
+    'historical_weather': {
+        'id': 'int32',
+        'time': 'datetime64[ns]',
+        'temperature_2m_max': 'float32',
+        'temperature_2m_min': 'float32',
+        'apparent_temperature_max': 'float32',
+        'apparent_temperature_min': 'float32',
+        'precipitation_sum': 'float32',
+        'precipitation_hours': 'float32',
+        'snowfall_sum': 'float32',
+    },
+    'weather_codes': {
+        'code': 'int16',
+        'description': 'category',
+    },
+    'forecast_summary': {
+        'id': 'int32',
+        'snowfall_24h': 'float32',
+        'snowfall_48h': 'float32',
+        'snowfall_4d': 'float32',
+        'snowfall_7d': 'float32',
+        'max_snow_height': 'float32',
+        'min_temperature': 'float32',
+        'weathercode_24h': 'Int16',
+        'updated_at': 'datetime64[ns]',
+    },
+}
+
+# Resort names appear in query results joined with resorts, e.g. the dashboard series
+SCHEMAS['history_series'] = dict(SCHEMAS['historical_weather'], resort='category')
+
+
+def apply_schema(df, table):
+    '''
+    Convert the columns of df that belong to `table` to their canonical dtypes, in place,
+    and return df. Columns the schema does not know are left alone.
+    '''
+    for column, dtype in SCHEMAS[table].items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        if dtype.startswith('datetime64'):
+            df[column] = pd.to_datetime(df[column]).astype(dtype)
+        elif dtype[0] == 'I':
+            # Nullable integers, the values may arrive as floats with NaN for missing codes
+            df[column] = pd.to_numeric(df[column]).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def frame_memory(df):
+    '''
+    Memory used by df in MiB, counting the Python strings in object columns.
+    '''
+    return df.memory_usage(deep=True).sum() / 2**20
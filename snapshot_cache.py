@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+import pyarrow as pa
+import pyarrow.ipc
+from http_cache import normalize_key
+
+'''
+Local columnar snapshots of the app's query results, stored as Arrow IPC files.
+
+Every Streamlit restart or cache expiry used to fetch the same data from Supabase
+again. Query results are now written to SNAPSHOT_DIR as uncompressed Arrow files,
+which the app memory-maps on the next start instead of querying the database.
+
+Whether a snapshot is still current is decided by the data_versions table: each
+loader (populate_forecast, populate_historical, update_resorts) bumps the version
+of the dataset it wrote with bump_version, and every snapshot records the versions
+of the datasets it was built from. One tiny query (cached for a minute) tells the
+app whether anything changed since. If data_versions does not exist yet, snapshots
+are skipped and every query goes to the database.
+
+Each query and parameter set has one file, replaced when it is stale. Snapshots of
+filters nobody asks for again stay behind, so the directory is capped at
+SNAPSHOT_MAX_MB: after every write the least recently used files (by mtime, touched
+on every hit) are deleted. A file that can't be read (truncated, corrupt) is
+treated as missing and rebuilt from the database.
+'''
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", ".snapshots")
+SNAPSHOT_MAX_BYTES = int(os.getenv("SNAPSHOT_MAX_MB", "512")) * 2**20
+
+# Seconds the data_versions row set is trusted before asking the database again
+VERSION_CHECK_SECONDS = 60
+
+
+def create_versions_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+        dataset TEXT PRIMARY KEY,
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+        );
+    """)
+
+
+def bump_version(cursor, dataset):
+    '''
+    Mark `dataset` ('resorts', 'forecast' or 'historical') as changed, so app snapshots
+    built from it are refreshed. Call it in the transaction that writes the data. Does not commit.
+    '''
+    create_versions_table(cursor)
+    cursor.execute("""
+        INSERT INTO data_versions (dataset, version, updated_at) VALUES (%s, 1, now())
+        ON CONFLICT (dataset) DO UPDATE SET version = data_versions.version + 1, updated_at = now();
+    """, (dataset,))
+
+
+def read_versions(conn):
+    '''
+    {dataset: version}, or None if the data_versions table does not exist.
+    '''
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('data_versions')")
+        if cursor.fetchone()[0] is None:
+            return None
+        cursor.execute("SELECT dataset, version FROM data_versions")
+        return dict(cursor.fetchall())
+
+
+class SnapshotCache:
+    '''
+    Arrow snapshots of dataframes in `path`, keyed by query name and parameters.
+    Safe to share between threads (Streamlit sessions).
+    '''
+
+    def __init__(self, path=SNAPSHOT_DIR, check_seconds=VERSION_CHECK_SECONDS, max_bytes=SNAPSHOT_MAX_BYTES):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.current = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        os.makedirs(path, exist_ok=True)
+
+    def versions(self, conn):
+        with self.lock:
+            if self.checked_at is None or time.monotonic() - self.checked_at > self.check_seconds:
+                self.current = read_versions(conn)
+                self.checked_at = time.monotonic()
+            return self.current
+
+    def get_or_load(self, conn, name, datasets, params, load):
+        '''
+        The snapshot of query `name` with `params` if it was built from the current versions of
+        `datasets`, memory-mapped from disk. Otherwise the result of load() (a dataframe), which
+        is then saved as the new snapshot.
+        '''
+        versions = self.versions(conn)
+        if versions is None:
+            return load()
+
+        version = ",".join(f"{dataset}={versions.get(dataset, 0)}" for dataset in datasets)
+        file = os.path.join(self.path, f"{name}-{normalize_key(name, params)[:16]}.arrow")
+
+        if os.path.exists(file):
+            try:
+                table = pa.ipc.open_file(pa.memory_map(file)).read_all()
+            except (pa.ArrowInvalid, OSError) as e:
+                print(f"Unreadable snapshot {file}, loading from the database: {e}")
+                table = None
+            if table is not None and (table.schema.metadata or {}).get(b"version", b"").decode() == version:
+                try:
+                    os.utime(file)
+                except OSError:
+                    pass
+                with self.lock:
+                    self.hits += 1
+                return table.to_pandas()
+
+        df = load()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata(dict(table.schema.metadata or {}, version=version))
+
+        # Written next to the target and renamed, so readers never map a half written file
+        partial = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(partial, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(partial, file)
+        self.prune()
+
+        with self.lock:
+            self.misses += 1
+        return df
+
+    def prune(self):
+        '''
+        Delete the least recently used snapshots until the directory holds at most max_bytes.
+        Returns the number of files deleted.
+        '''
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".arrow"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # Pruned by another process sharing the directory
+                pass
+            total -= size
+
+        with self.lock:
+            self.evicted += removed
+        return removed
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted}
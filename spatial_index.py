@@ -0,0 +1,130 @@
+import numpy as np
+
+'''
+Grid index over resort coordinates for radius, k-nearest and bounding box queries.
+
+Resorts are bucketed into cells of `cell_degrees` x `cell_degrees` and stored sorted
+by cell, with cells numbered row by row (latitude band, then longitude). The cells of
+one latitude band overlapping a query box are then a contiguous slice of the sorted
+arrays, found with two binary searches, so a query only looks at resorts in the few
+bands it touches instead of scanning every resort. Exact great-circle distances are
+computed with NumPy on those candidates only.
+
+Build it once per load of the resorts table:
+
+    index = ResortIndex(resorts_df)
+    positions, miles = index.within_radius(47.66, -117.43, 150)
+    nearby = resorts_df.iloc[positions]
+'''
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Miles per degree of latitude
+MILES_PER_DEGREE = 2 * np.pi * EARTH_RADIUS_MILES / 360
+
+
+def haversine_miles(lat, lon, lats, lons):
+    '''
+    Great-circle distance in miles from one point to arrays of points, vectorized with NumPy.
+    '''
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class ResortIndex:
+    '''
+    Spatial index over the latitude/longitude columns of a resorts dataframe.
+    Queries return positions (for resorts_df.iloc), not ids.
+    '''
+
+    def __init__(self, resorts_df, cell_degrees=1.0):
+        self.cell_degrees = cell_degrees
+        self.n_lat = int(np.ceil(180 / cell_degrees))
+        self.n_lon = int(np.ceil(360 / cell_degrees))
+        self.size = len(resorts_df)
+
+        lats = resorts_df['latitude'].to_numpy(dtype=float)
+        lons = resorts_df['longitude'].to_numpy(dtype=float)
+        keys = self._lat_band(lats) * self.n_lon + self._lon_cell(lons)
+
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.positions = order
+        self.lats = lats[order]
+        self.lons = lons[order]
+
+    def _lat_band(self, lats):
+        return np.clip(((np.asarray(lats) + 90) // self.cell_degrees).astype(np.int64), 0, self.n_lat - 1)
+
+    def _lon_cell(self, lons):
+        return np.clip(((np.asarray(lons) + 180) // self.cell_degrees).astype(np.int64), 0, self.n_lon - 1)
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        '''
+        Indexes (into the sorted arrays) of resorts in every cell touching the box.
+        min_lon > max_lon means the box crosses the antimeridian.
+        '''
+        if min_lon > max_lon:
+            return np.concatenate([self._candidates(min_lat, min_lon, max_lat, 180.0),
+                                   self._candidates(min_lat, -180.0, max_lat, max_lon)])
+
+        first_cell, last_cell = self._lon_cell(min_lon), self._lon_cell(max_lon)
+        bands = np.arange(self._lat_band(min_lat), self._lat_band(max_lat) + 1) * self.n_lon
+        starts = np.searchsorted(self.keys, bands + first_cell, side='left')
+        ends = np.searchsorted(self.keys, bands + last_cell, side='right')
+
+        slices = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        '''
+        Positions of the resorts inside the box (inclusive). min_lon > max_lon crosses the antimeridian.
+        '''
+        candidates = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        lats, lons = self.lats[candidates], self.lons[candidates]
+        inside = (lats >= min_lat) & (lats <= max_lat)
+        if min_lon <= max_lon:
+            inside &= (lons >= min_lon) & (lons <= max_lon)
+        else:
+            inside &= (lons >= min_lon) | (lons <= max_lon)
+        return self.positions[candidates[inside]]
+
+    def within_radius(self, lat, lon, miles):
+        '''
+        Positions of the resorts within `miles` (great-circle) of the point and their distances,
+        nearest first.
+        '''
+        dlat = miles / MILES_PER_DEGREE
+        min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+
+        # Near the poles (or for huge radii) every longitude can be in range
+        cos_lat = np.cos(np.radians(max(abs(min_lat), abs(max_lat))))
+        if dlat >= 90 or cos_lat * 180 <= dlat:
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            dlon = dlat / cos_lat
+            min_lon = (lon - dlon + 180) % 360 - 180
+            max_lon = (lon + dlon + 180) % 360 - 180
+
+        candidates = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        distances = haversine_miles(lat, lon, self.lats[candidates], self.lons[candidates])
+
+        keep = distances <= miles
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return self.positions[candidates[order]], distances[order]
+
+    def k_nearest(self, lat, lon, k):
+        '''
+        Positions of the k resorts nearest to the point and their distances, nearest first.
+        The search radius starts at one cell and doubles until k resorts are inside it.
+        '''
+        k = min(k, self.size)
+        miles = self.cell_degrees * MILES_PER_DEGREE
+        while True:
+            positions, distances = self.within_radius(lat, lon, miles)
+            if len(positions) >= k or miles >= np.pi * EARTH_RADIUS_MILES:
+                return positions[:k], distances[:k]
+            miles *= 2
@@ -0,0 +1,110 @@
+import openrouteservice
+import pandas as pd
+import pytest
+from drive_time_cache import DriveTimeCache, geohash
+from benchmarks.stub_ors import start_stub_server
+
+'''
+DriveTimeCache against the local ORS stub (benchmarks/stub_ors.py): searches from the same
+geohash cell share one ORS request, the hit and destination counters add up, and entries
+past the TTL are requested again and deleted.
+'''
+
+# Two origins a few hundred meters apart in Spokane, in the same precision 5 cell
+ORIGIN = (47.6588, -117.4260)
+NEARBY_ORIGIN = (47.6601, -117.4240)
+OTHER_CITY = (39.7392, -104.9903)
+
+RESORTS = pd.DataFrame({
+    "id": [1, 2, 3],
+    "latitude": [47.9219, 47.4449, 47.3911],
+    "longitude": [-117.0967, -115.6866, -116.0680],
+})
+
+
+@pytest.fixture(scope="module")
+def ors():
+    server = start_stub_server(latency=0)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def client(ors):
+    return openrouteservice.Client(base_url=f"http://127.0.0.1:{ors.server_port}")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    drive_times = DriveTimeCache(str(tmp_path / "drive_times.sqlite"))
+    yield drive_times
+    drive_times.conn.close()
+
+
+def ors_requests(ors):
+    return ors.stats["requests"]
+
+
+def test_same_cell_is_served_from_the_cache(ors, client, cache):
+    assert geohash(*ORIGIN) == geohash(*NEARBY_ORIGIN)
+
+    before = ors_requests(ors)
+    first = cache.lookup(client, *ORIGIN, RESORTS)
+    assert ors_requests(ors) == before + 1
+
+    second = cache.lookup(client, *NEARBY_ORIGIN, RESORTS)
+    assert ors_requests(ors) == before + 1
+    assert second == first
+    assert all(miles > 0 for miles in first[0])
+
+
+def test_other_cell_requests_ors(ors, client, cache):
+    cache.lookup(client, *ORIGIN, RESORTS)
+    before = ors_requests(ors)
+    cache.lookup(client, *OTHER_CITY, RESORTS)
+    assert ors_requests(ors) == before + 1
+
+
+def test_hit_rate_counts(ors, client, cache):
+    cache.lookup(client, *ORIGIN, RESORTS.iloc[:2])      # miss
+    cache.lookup(client, *NEARBY_ORIGIN, RESORTS.iloc[:2])  # hit
+    cache.lookup(client, *ORIGIN, RESORTS)               # partial hit, only resort 3 is requested
+
+    stats = cache.stats()
+    assert (stats["queries"], stats["hits"], stats["partial_hits"], stats["misses"]) == (3, 1, 1, 1)
+    assert stats["hit_rate"] == round(1 / 3, 3)
+    assert stats["api_calls"] == 2
+
+    # Resorts looked up and sent to ORS, per query
+    assert stats["recent_destinations"] == [2, 2, 3]
+    assert stats["recent_sent_to_ors"] == [2, 0, 1]
+    assert (stats["mean_destinations"], stats["mean_sent_to_ors"]) == (2.3, 1.0)
+
+
+def test_expired_entries_are_requested_again(ors, client, cache):
+    cache.lookup(client, *ORIGIN, RESORTS)
+
+    # Age every entry past the TTL
+    cache.conn.execute("UPDATE drive_times SET fetched = fetched - ?", (cache.ttl + 1,))
+    cache.conn.commit()
+
+    before = ors_requests(ors)
+    cache.lookup(client, *NEARBY_ORIGIN, RESORTS)
+    assert ors_requests(ors) == before + 1
+    assert cache.stats()["misses"] == 2
+
+    # Refreshed by that request, the next search is a hit again
+    cache.lookup(client, *ORIGIN, RESORTS)
+    assert ors_requests(ors) == before + 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_entries_are_deleted(ors, client, cache):
+    cache.lookup(client, *ORIGIN, RESORTS)
+    cache.conn.execute("UPDATE drive_times SET fetched = fetched - ?", (cache.ttl + 1,))
+    cache.conn.commit()
+
+    # Storing the entries of another cell clears the expired ones
+    cache.lookup(client, *OTHER_CITY, RESORTS)
+    cells = cache.conn.execute("SELECT DISTINCT cell FROM drive_times").fetchall()
+    assert cells == [(geohash(*OTHER_CITY),)]
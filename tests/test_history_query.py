@@ -0,0 +1,62 @@
+import contextlib
+import os
+from datetime import date, timedelta
+import psycopg2
+import pytest
+from benchmarks.bench_app_cold_start import seed
+from benchmarks.pg_fixture import postgres
+from data_access import load_history
+
+'''
+The dashboard series (data_access.load_history) for two resorts that share a name, like
+Heavenly in CA and NV: every bucket gives one series per resort, nothing is added up and the
+chart's pivot works.
+
+Needs Postgres: a throwaway schema in the database of TEST_DSN, or a temporary cluster
+(initdb on the PATH or in PG_BIN) when it is not set. Skipped when neither is available.
+'''
+
+TABLE = "historical_weather"
+END = date.today() - timedelta(days=1)
+START = END - timedelta(days=300)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    with contextlib.ExitStack() as stack:
+        try:
+            dsn = stack.enter_context(postgres(os.getenv("TEST_DSN")))
+        except (RuntimeError, psycopg2.OperationalError) as e:
+            pytest.skip(f"no Postgres to test against: {e}")
+
+        conn = psycopg2.connect(dsn)
+        # Closed before the schema is dropped, an open connection would block the DROP
+        stack.callback(conn.close)
+        seed(conn, 4, 400)
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE resorts SET resort = 'Heavenly', state = CASE WHEN id = 1 THEN 'CA' ELSE 'NV' END
+                WHERE id IN (1, 2)
+            """)
+        conn.commit()
+        yield conn
+
+
+@pytest.mark.parametrize("bucket", ["day", "month", "week", "season"])
+def test_resorts_sharing_a_name_stay_apart(conn, bucket):
+    df = load_history(conn, TABLE, "snowfall_sum", ["CA", "NV"], ["Heavenly"], START, END, bucket)
+
+    assert set(df["resort"]) == {"Heavenly (CA)", "Heavenly (NV)"}
+    assert not df.duplicated(["time", "resort"]).any()
+    pivot = df.pivot(index="time", columns="resort", values="snowfall_sum")
+    assert list(pivot.columns) == ["Heavenly (CA)", "Heavenly (NV)"]
+
+
+def test_daily_values_are_not_added_up(conn):
+    df = load_history(conn, TABLE, "snowfall_sum", ["CA", "NV"], ["Heavenly"], START, END, "day")
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT SUM(snowfall_sum) FROM {TABLE} WHERE id = 1 AND time >= %s AND time < %s",
+                       (START, END + timedelta(days=1)))
+        expected = cursor.fetchone()[0]
+    assert df[df["resort"] == "Heavenly (CA)"]["snowfall_sum"].sum() == pytest.approx(expected, rel=1e-4)
@@ -0,0 +1,51 @@
+import time
+import pytest
+import http_cache
+from http_cache import ResponseCache
+
+'''
+ResponseCache eviction: the entry count and total size kept by set() match the table, the
+least recently used entries go when a limit is reached, and expired entries are swept.
+'''
+
+
+@pytest.fixture
+def cache(tmp_path):
+    responses = ResponseCache(str(tmp_path / "responses.sqlite"), max_entries=50)
+    yield responses
+    responses.conn.close()
+
+
+def test_totals_follow_writes(cache):
+    for i in range(30):
+        cache.set("ors_matrix", {"i": i}, [i])
+    # Replacing entries changes their size, not the count
+    for i in range(10):
+        cache.set("ors_matrix", {"i": i}, [i] * 10)
+
+    assert (cache.count, cache.size) == tuple(cache._totals())
+    assert cache.count == 30
+
+
+def test_least_recently_used_are_evicted(cache):
+    for i in range(50):
+        cache.set("ors_matrix", {"i": i}, [i])
+    cache.get("ors_matrix", {"i": 0})
+    cache.set("ors_matrix", {"i": 50}, [50])
+
+    assert cache.count <= 50
+    assert (cache.count, cache.size) == tuple(cache._totals())
+    assert cache.get("ors_matrix", {"i": 0}) == [0]
+    assert cache.get("ors_matrix", {"i": 1}) is None
+
+
+def test_expired_entries_are_swept(cache, monkeypatch):
+    monkeypatch.setattr(http_cache, "SWEEP_EVERY", 5)
+    cache.ttls["openmeteo_forecast"] = -1
+    for i in range(4):
+        cache.set("openmeteo_forecast", {"i": i}, [i])
+    assert cache.count == 4
+
+    cache.set("ors_matrix", {"i": 0}, [0])
+    assert (cache.count, cache.size) == tuple(cache._totals())
+    assert cache.count == 1
@@ -0,0 +1,82 @@
+import contextlib
+import os
+from datetime import date, timedelta
+import psycopg2
+import pytest
+from benchmarks.bench_app_cold_start import seed
+from benchmarks.pg_fixture import postgres
+from historical_partitions import apply_retention, retention_cutoff
+from historical_rollups import ROLLUP_BUCKETS, create_rollup_tables, refresh_rollups, rollup_table
+
+'''
+Full refreshes of the rollups (historical_rollups.refresh_rollups without a range), as run by
+populate_weather_data when create_rollup_tables adds a column: the weeks and seasons of months
+removed by retention are kept, the rest is rebuilt from the stored days.
+
+Needs Postgres: a throwaway schema in the database of TEST_DSN, or a temporary cluster
+(initdb on the PATH or in PG_BIN) when it is not set. Skipped when neither is available.
+'''
+
+TABLE = "historical_weather"
+END = date.today() - timedelta(days=1)
+
+
+@pytest.fixture
+def conn():
+    with contextlib.ExitStack() as stack:
+        try:
+            dsn = stack.enter_context(postgres(os.getenv("TEST_DSN")))
+        except (RuntimeError, psycopg2.OperationalError) as e:
+            pytest.skip(f"no Postgres to test against: {e}")
+
+        conn = psycopg2.connect(dsn)
+        # Closed before the schema is dropped, an open connection would block the DROP
+        stack.callback(conn.close)
+        seed(conn, 3, 400)
+        yield conn
+
+
+def rollup_rows(cursor, bucket, column="snowfall_sum"):
+    cursor.execute(f"SELECT id, time, days, {column} FROM {rollup_table(TABLE, bucket)} ORDER BY 1, 2")
+    return cursor.fetchall()
+
+
+def test_full_refresh_keeps_removed_months(conn):
+    cursor = conn.cursor()
+    before = {bucket: rollup_rows(cursor, bucket) for bucket in ROLLUP_BUCKETS}
+
+    # Drop (not archive, the archive schema is shared) the months older than 3 months,
+    # then lose a column so create_rollup_tables asks for a full refresh
+    assert apply_retention(cursor, TABLE, 3, today=END, archive=False)
+    for bucket in ROLLUP_BUCKETS:
+        cursor.execute(f"ALTER TABLE {rollup_table(TABLE, bucket)} DROP COLUMN temperature_2m_max_total")
+    assert create_rollup_tables(cursor, TABLE)
+    assert refresh_rollups(cursor, TABLE) > 0
+
+    cutoff = retention_cutoff(3, END)
+    for bucket in ROLLUP_BUCKETS:
+        after = rollup_rows(cursor, bucket)
+        assert [row[:3] for row in after] == [row[:3] for row in before[bucket]]
+        assert [row[3] for row in after] == pytest.approx([row[3] for row in before[bucket]], rel=1e-4)
+        # Buckets with stored days get the new column, the removed ones can't
+        cursor.execute(f"""
+            SELECT bool_and(temperature_2m_max_total IS NOT NULL) FILTER (WHERE time >= %s::timestamp + interval '7 days'),
+                   bool_and(temperature_2m_max_total IS NULL) FILTER (WHERE time < %s::timestamp - interval '7 days')
+            FROM {rollup_table(TABLE, bucket)}
+        """, (cutoff, cutoff))
+        rebuilt, kept = cursor.fetchone()
+        assert rebuilt is not False and kept is not False
+
+
+def test_full_refresh_of_new_tables_covers_every_day(conn):
+    cursor = conn.cursor()
+    for bucket in ROLLUP_BUCKETS:
+        cursor.execute(f"DROP TABLE {rollup_table(TABLE, bucket)}")
+    assert create_rollup_tables(cursor, TABLE)
+    refresh_rollups(cursor, TABLE)
+
+    cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+    days = cursor.fetchone()[0]
+    for bucket in ROLLUP_BUCKETS:
+        cursor.execute(f"SELECT SUM(days) FROM {rollup_table(TABLE, bucket)}")
+        assert cursor.fetchone()[0] == days
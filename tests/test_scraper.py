@@ -0,0 +1,100 @@
+import csv
+import os
+import sys
+import pytest
+from benchmarks.stub_search import start_stub_server
+
+# The data cleaning scripts import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_cleaning"))
+from clean_data2_scrape import HttpFetcher, parse_resort_page, search_url  # noqa: E402
+from scrape_runner import CheckpointStore, PageCache, scrape_resorts  # noqa: E402
+
+'''
+The resort scraper (data_cleaning/clean_data2_scrape.py with scrape_runner.py) against the
+local search stub (benchmarks/stub_search.py): scraped coordinates match the fixtures, a
+resumed run only fetches the unfinished resorts, a rerun fetches nothing and the cached
+pages parse to the same results offline.
+'''
+
+RESORTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "data_cleaning", "final_resorts_us.csv")
+
+
+@pytest.fixture(scope="module")
+def known():
+    with open(RESORTS_FILE) as f:
+        return list(csv.DictReader(f))[:12]
+
+
+@pytest.fixture(scope="module")
+def resorts(known):
+    # Made up resorts the stub has no results for
+    return known + [{"Resort": f"Nowhere Ridge {i}", "State": ""} for i in range(3)]
+
+
+@pytest.fixture(scope="module")
+def search(known):
+    server = start_stub_server(known, latency=0)
+    yield server
+    server.shutdown()
+
+
+def scrape(resorts, search, cache, checkpoints, fetch=True):
+    base_url = f"http://127.0.0.1:{search.server_port}/search"
+    return scrape_resorts(
+        resorts,
+        url=lambda resort: search_url(resort["Resort"], base_url),
+        parse=lambda html, resort: parse_resort_page(html, resort["Resort"]),
+        open_fetcher=HttpFetcher if fetch else None,
+        workers=3,
+        delay=0,
+        cache=cache,
+        checkpoints=checkpoints,
+    )
+
+
+def fetched(search):
+    return search.stats["requests"]
+
+
+def check(resorts, found, known):
+    '''
+    The coordinates of every known resort match its fixture, nothing is found for the others.
+    '''
+    names = {resort["Resort"] for resort in known}
+    for resort, (lat, lng, state) in zip(resorts, found):
+        if resort["Resort"] in names:
+            assert (lat, lng) == (round(float(resort["Latitude"]), 4), round(float(resort["Longitude"]), 4)), resort["Resort"]
+        else:
+            assert (lat, lng, state) == (None, None, None), resort["Resort"]
+
+
+def test_parallel_run_matches_fixtures(resorts, known, search, tmp_path):
+    before = fetched(search)
+    found = scrape(resorts, search, PageCache(str(tmp_path / "pages")), CheckpointStore(str(tmp_path / "checkpoint.jsonl")))
+    assert fetched(search) - before == len(resorts)
+    check(resorts, found, known)
+
+
+def test_resume_rerun_and_offline(resorts, known, search, tmp_path):
+    cache = PageCache(str(tmp_path / "pages"))
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+
+    # A run that stops half way, then a new run over every resort only fetches the rest
+    half = len(resorts) // 2
+    scrape(resorts[:half], search, cache, CheckpointStore(checkpoint_path))
+    before = fetched(search)
+    found = scrape(resorts, search, cache, CheckpointStore(checkpoint_path))
+    assert fetched(search) - before == len(resorts) - half
+    check(resorts, found, known)
+
+    # Everything is in the checkpoint or the page cache
+    before = fetched(search)
+    rerun = scrape(resorts, search, cache, CheckpointStore(checkpoint_path))
+    assert fetched(search) == before
+    assert rerun == found
+
+    # The cached pages parse to the same results without a fetcher
+    offline = scrape(resorts, search, cache, None, fetch=False)
+    assert fetched(search) == before
+    assert offline == found
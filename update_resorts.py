@@ -1,32 +1,29 @@
-from utils import update_resorts, get_connection
-from dotenv import load_dotenv
-import os
-
-'''
-Run this script to update the resorts table with the latest data from the local file.
-
-'''
-
-
-load_dotenv()
-
-DB_CONFIG = {
-    "host": os.getenv("host"),
-    "user": os.getenv("user"),
-    "password": os.getenv("password"),
-    "dbname": os.getenv("dbname"),
-    "port": os.getenv("port"),
-    "gssencmode": 'disable'
-}
-
-RESORTS_TABLE = "resorts"
-
-conn = get_connection(DB_CONFIG)
-cursor = conn.cursor()
-
-update_resorts(conn, cursor, RESORTS_TABLE, "final_resorts_us.csv")
-
-cursor.close()
-conn.close()
-
+from utils import update_resorts
+from db_pool import db_config, get_pool
+import run_metrics
+from dotenv import load_dotenv
+
+'''
+Run this script to update the resorts table with the latest data from the local file.
+
+'''
+
+
+load_dotenv()
+
+DB_CONFIG = db_config()
+
+RESORTS_TABLE = "resorts"
+
+pool = get_pool(DB_CONFIG)
+with run_metrics.run("update_resorts"), pool.connection() as conn:
+    cursor = conn.cursor()
+
+    update_resorts(conn, cursor, RESORTS_TABLE, "final_resorts_us.csv")
+
+    cursor.close()
+
+print(f"Connection pool: {pool.stats()}")
+pool.close()
+
 print("Resorts updated successfully")
\ No newline at end of file
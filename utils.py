@@ -1,332 +1,658 @@
-from datetime import datetime, timedelta, timezone
-from openmeteopy import OpenMeteo
-from openmeteopy.daily import DailyHistorical
-from openmeteopy.options import HistoricalOptions, ForecastOptions
-import pandas as pd
-import openrouteservice
-import psycopg2
-from psycopg2.extras import execute_values
-
-
-def get_connection(config):
-    '''
-    Warning is thrown from pandas when using psycopg2. Is no concern with this simple application.
-    '''
-    return psycopg2.connect(**config)
-
-
-def fetch_weather_data(resort_id, lat, lon):
-    '''
-    Fetch the weather data for specific resort from the OpenMeteo API.
-    Returns a pandas dataframe with the weather data.
-    Used to populate the historical_weather table.
-    '''
-    
-    end_date = datetime.now(timezone.utc).date()
-    start_date = end_date - timedelta(days=90)
-
-    options = HistoricalOptions(latitude=lat, longitude=lon, start_date=str(start_date), end_date=str(end_date))
-    mgr = OpenMeteo(options, daily=DailyHistorical().all())
-    data = mgr.get_pandas()
-
-    if data.empty:
-        return pd.DataFrame()
-
-    data = data.reset_index() # saves the index (time) as a column
-
-    data['id'] = resort_id
-    data['time'] = pd.to_datetime(data['time']).dt.date
-    return data[[
-        'id', 'time', 'temperature_2m_max', 'temperature_2m_min',
-        'apparent_temperature_max', 'apparent_temperature_min',
-        'precipitation_sum', 'precipitation_hours', 'snowfall_sum'
-    ]]
-
-
-def populate_weather_data(conn, cursor, WEATHER_TABLE):
-    '''
-    Populate the weather table with data from the resorts table.
-    '''
-    
-    resorts = pd.read_sql("SELECT id, resort, latitude, longitude, state FROM resorts", conn)
-    
-    cursor.execute(f"""
-    CREATE TABLE IF NOT EXISTS historical_weather (
-        id INTEGER REFERENCES resorts(id),
-        time TIMESTAMP NOT NULL,
-        temperature_2m_max REAL,
-        temperature_2m_min REAL,
-        apparent_temperature_max REAL,
-        apparent_temperature_min REAL,
-        precipitation_sum REAL,
-        precipitation_hours REAL,
-        snowfall_sum REAL,
-        PRIMARY KEY (id, time)
-    );
-    """)
-    
-    conn.commit()
-
-    # Check if the resort has 90 days of data
-    for _, row in resorts.iterrows():
-        resort_id, lat, lon = row['id'], row['latitude'], row['longitude']
-        cursor.execute(f"SELECT COUNT(*) FROM {WEATHER_TABLE} WHERE id = %s AND time >= %s", (resort_id, datetime.now(timezone.utc).date() - timedelta(days=90)))
-        
-        count = cursor.fetchone()[0]
-        print(f'Count: {count}')
-
-        if count < 90:
-            df = fetch_weather_data(resort_id, lat, lon)
-            
-            for _, record in df.iterrows():
-                cursor.execute(f"""
-                    INSERT INTO {WEATHER_TABLE} (id, time, temperature_2m_max, temperature_2m_min,
-                        apparent_temperature_max, apparent_temperature_min, precipitation_sum,
-                        precipitation_hours, snowfall_sum)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    ON CONFLICT (id, time) DO NOTHING;
-                """, tuple(record))
-                
-                print(f'Executed: {record}')
-            conn.commit()
-     
-            
-def update_resorts(conn, cursor, RESORTS_TABLE, local_file):
-    '''
-    Update the resorts table with new data from the csv file.
-    If the id is already in the table, update the row with the new data.
-    If the id is not in the table, insert the row.
-    '''
-
-    # columns: id, resort, latitude, longitude, state
-    resorts = pd.read_csv(local_file)
-
-    insert_query = f"""
-        INSERT INTO {RESORTS_TABLE} (id, resort, latitude, longitude, state)
-        VALUES %s
-        ON CONFLICT (id) DO UPDATE SET
-            resort = EXCLUDED.resort,
-            latitude = EXCLUDED.latitude,
-            longitude = EXCLUDED.longitude,
-            state = EXCLUDED.state;
-    """
-
-    # Convert DataFrame to list of tuples
-    values = list(resorts.itertuples(index=False, name=None))
-
-    # Fast batch insert, via psycopg2.extras.execute_values
-    # This is faster than the regular insert query, this is also PARAMETERIZED !
-    execute_values(cursor, insert_query, values)
-
-    conn.commit()
-
-
-def get_nearby_resorts_within_driving_distance(ORS_API_KEY, resorts_df, hourly_df,user_lat, user_lon, max_miles):
-    '''
-    Get the nearby resorts within a driving distance of the user.
-    '''
-    
-    coords = [(row['longitude'], row['latitude']) for _, row in resorts_df.iterrows()]  # (lon, lat)
-    origin = (user_lon, user_lat)
-    
-    client = openrouteservice.Client(key=ORS_API_KEY)
-    response = client.distance_matrix(
-        locations=[origin] + coords,
-        profile='driving-car',
-        metrics=['distance', 'duration'],
-        units='mi',
-        sources=[0],
-        destinations=list(range(1, len(coords) + 1))
-    )
-    
-    distances = response['distances'][0]
-    durations = response['durations'][0]
-    nearby = []
-    
-    for i, (miles, seconds) in enumerate(zip(distances, durations)):
-        if miles is not None and miles <= max_miles:
-            nearby.append({
-                "id": resorts_df.iloc[i]['id'],
-                "resort": resorts_df.iloc[i]['resort'],
-                "state": resorts_df.iloc[i]['state'],
-                "distance": miles,
-                "duration_minutes": round(seconds / 60, 1)
-            })
-    
-    # Get the forecast data for nearby resorts
-    if nearby:
-        nearby_ids = tuple([r["id"] for r in nearby])
-        
-        now = datetime.now()
-        cutoff = now + timedelta(days=4)
-        
-        # Filter the DataFrame for nearby resorts and the time range
-        filtered_df = hourly_df[(hourly_df['id'].isin(nearby_ids)) & 
-                                 (hourly_df['time'] >= now) & 
-                                 (hourly_df['time'] <= cutoff)]
-        
-        # Aggregate snowfall data
-        snowfall_forecast = filtered_df.groupby('id')['snowfall'].sum().reset_index()
-        snowfall_forecast.columns = ['id', 'total_snowfall_next_4_days']
-        
-        # Add forecast to nearby resorts
-        snowfall_dict = {row['id']: row['total_snowfall_next_4_days'] for _, row in snowfall_forecast.iterrows()}
-        for resort in nearby:
-            resort["forecast_snowfall"] = snowfall_dict.get(resort["id"], 0)
-    return nearby
-
-
-# Format drive time for display in streamlit
-def format_drive_time(minutes):
-    hours = int(minutes // 60)
-    mins = int(minutes % 60)
-    return f"{hours}h {mins}m" if hours else f"{mins}m"
-
-
-def get_weather_data(resorts_df, weather_code_map, hourly_obj, daily_obj):
-    '''
-    This function is used to get the weather data for the resorts in the resorts_df dataframe.
-    It returns a list of the hourly and daily dataframes.
-    
-    Used in populate_forecast.py
-    '''
-    
-    hourly_df = pd.DataFrame()
-    daily_df = pd.DataFrame()
-    
-    for _, row in resorts_df.iterrows():
-        # lat and long for current resort
-        current_resort_id = row['id']
-        latitude = row['latitude']
-        longitude = row['longitude']
-
-        print(f'Current resort: {row["resort"]}')
-        print(f'Current resort id: {current_resort_id}')
-        print(latitude, longitude)
-        
-        # Forecast options
-        options = ForecastOptions(latitude, longitude)
-
-        # Request OpenMeteo data for the current resort
-        mgr = OpenMeteo(options, daily=daily_obj, hourly=hourly_obj)
-
-        # Get the data as 2 pandas DataFrames (first is hourly, second is daily)
-        meteo = mgr.get_pandas()  
-
-        # Append rows of hourly and daily dataframes        
-        for i, df in enumerate(meteo):
-            
-            # Save datetime and add id column to every entry
-            df = df.reset_index() # saves the index (datetime) as a column
-            df['id'] = current_resort_id 
-            df = df[['id'] + [col for col in df.columns if col != 'id']]
-            
-            # Map the weather code to the weather description
-            df["weather_description"] = df["weathercode"].map(weather_code_map)
-            
-            if i == 0:
-                hourly_df = pd.concat([hourly_df, df])
-            else:
-                daily_df = pd.concat([daily_df, df])
-                
-    return hourly_df, daily_df
-
-
-def insert_hourly_df(df, cursor, connection):
-    print("Inserting hourly data...")
-    
-    # Drop and create table if it exists
-    cursor.execute("DROP TABLE IF EXISTS hourly")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS hourly (
-        id INTEGER REFERENCES resorts(id),
-        time TIMESTAMP NOT NULL,
-        precipitation REAL,
-        snowfall REAL,
-        snow_height REAL,
-        freezinglevel_height REAL,
-        rain REAL,
-        showers REAL,
-        weathercode INTEGER,
-        weather_description TEXT,
-        PRIMARY KEY (id, time)
-        );
-    """)
-    
-    query = """
-        INSERT INTO hourly (
-            id, time, precipitation, snowfall, snow_height,
-            freezinglevel_height, rain, showers,
-            weathercode, weather_description
-        )
-        VALUES %s
-        ON CONFLICT DO NOTHING;
-    """
-    # Convert DataFrame rows to list of tuples
-    data = list(df.itertuples(index=False, name=None))
-
-    # Bulk insert using execute_values
-    execute_values(cursor, query, data)
-    connection.commit()
-
-
-def insert_daily_df(df, cursor, connection):
-    print("Inserting daily data...")
-    
-    cursor.execute("DROP TABLE IF EXISTS daily")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS daily (
-        ID INTEGER REFERENCES resorts(ID),
-        time TIMESTAMP,
-        windspeed_10m_max REAL,
-        windgusts_10m_max REAL,
-        winddirection_10m_dominant INTEGER,
-        temperature_2m_max REAL,
-        temperature_2m_min REAL,
-        apparent_temperature_max REAL,
-        apparent_temperature_min REAL,
-        weathercode INTEGER,
-        weather_description TEXT,
-        PRIMARY KEY (id, time)
-        );
-    """)
-
-    # Prepare the INSERT statement
-    query = """
-        INSERT INTO daily (
-            id, time, windspeed_10m_max, windgusts_10m_max, winddirection_10m_dominant,
-            temperature_2m_max, temperature_2m_min, apparent_temperature_max,
-            apparent_temperature_min, weathercode, weather_description
-        ) VALUES %s
-        ON CONFLICT DO NOTHING;
-    """
-
-    # Convert DataFrame rows to list of tuples
-    data = list(df.itertuples(index=False, name=None))
-
-    # Bulk insert using execute_values
-    execute_values(cursor, query, data)
-    connection.commit()
-
-
-
-    # if nearby:
-    #     nearby_ids = tuple([r["id"] for r in nearby])
-        
-    #     now = datetime.now()
-    #     cutoff = now + timedelta(days=4)
-        
-    #     query = """
-    #         SELECT h.id, SUM(h.snowfall) AS total_snowfall_next_4_days
-    #         FROM hourly h
-    #         WHERE h.id IN %s AND time >= %s AND time <= %s
-    #         GROUP BY h.id
-    #         ORDER BY total_snowfall_next_4_days DESC
-    #     """
-    #     cursor.execute(query, (nearby_ids, now.isoformat(), cutoff.isoformat()))
-    #     snowfall_forecast = cursor.fetchall()
-        
-    #     # Add forecast to nearby resorts
-    #     snowfall_dict = {resort_id: snowfall for resort_id, snowfall in snowfall_forecast}
-    #     for resort in nearby:
-    #         resort["forecast_snowfall"] = snowfall_dict.get(resort["id"], 0)
+from datetime import datetime, timedelta, timezone
+import time
+import pandas as pd
+import openrouteservice
+import psycopg2
+from db_loader import copy_df, copy_upsert, upsert_select_sql
+from historical_partitions import apply_retention, create_historical_table, ensure_partitions, migrate_to_partitions, retention_cutoff
+from historical_planner import plan_fetches, plan_summary
+from historical_rollups import create_rollup_tables, refresh_rollups
+from http_cache import get_default_cache
+from openmeteo_client import iter_forecasts, iter_historical, fetch_historical
+from run_metrics import count, span
+from schema import apply_schema
+from snapshot_cache import bump_version
+from spatial_index import ResortIndex
+
+
+def get_connection(config):
+    '''
+    Warning is thrown from pandas when using psycopg2. Is no concern with this simple application.
+    '''
+    return psycopg2.connect(**config)
+
+
+# Daily variables stored in the historical_weather table
+HISTORICAL_DAILY_PARAMS = [
+    'temperature_2m_max', 'temperature_2m_min',
+    'apparent_temperature_max', 'apparent_temperature_min',
+    'precipitation_sum', 'precipitation_hours', 'snowfall_sum'
+]
+
+
+# Days of history kept up to date by populate_weather_data
+HISTORICAL_DAYS = 90
+
+
+def historical_frame(results):
+    '''
+    Combine (resort_id, daily_df) results from openmeteo_client into one dataframe
+    with the historical_weather dtypes (see schema.py), ready for the historical_weather table.
+    '''
+    frames = [df for _, df in results if not df.empty]
+
+    if not frames:
+        return pd.DataFrame()
+
+    data = pd.concat(frames, ignore_index=True)
+    return apply_schema(data, 'historical_weather')
+
+
+def fetch_weather_data_batch(resorts_df, start_date=None, end_date=None, batch_size=50):
+    '''
+    Fetch the historical weather data for several resorts from the OpenMeteo API,
+    `batch_size` resorts per request (see openmeteo_client.py).
+    Defaults to the last 90 days.
+    Returns one pandas dataframe with the weather data for all resorts.
+    Used to populate the historical_weather table.
+    '''
+    
+    end_date = end_date or datetime.now(timezone.utc).date()
+    start_date = start_date or end_date - timedelta(days=HISTORICAL_DAYS)
+
+    return historical_frame(fetch_historical(resorts_df, HISTORICAL_DAILY_PARAMS, start_date, end_date, batch_size=batch_size))
+
+
+def fetch_weather_data(resort_id, lat, lon, start_date=None, end_date=None):
+    '''
+    Fetch the weather data for specific resort from the OpenMeteo API.
+    Defaults to the last 90 days; pass start_date to fetch only the missing days.
+    Returns a pandas dataframe with the weather data.
+    Used to populate the historical_weather table.
+    '''
+    
+    resort = pd.DataFrame({'id': [resort_id], 'latitude': [lat], 'longitude': [lon]})
+    return fetch_weather_data_batch(resort, start_date, end_date)
+
+
+def find_missing_ranges(cursor, WEATHER_TABLE, start_date, end_date):
+    '''
+    Find the exact date ranges missing from the weather table between start_date and end_date
+    for every resort, in a single query.
+    Missing days are grouped into consecutive runs (day minus its row number is constant within a run).
+    The explicit time range lets Postgres skip the partitions outside it.
+    Returns a dataframe with one row per gap: id, start_date, end_date (inclusive).
+    '''
+    
+    cursor.execute(f"""
+        WITH missing AS (
+            SELECT r.id, d::date AS day
+            FROM resorts r
+            CROSS JOIN generate_series(%s::timestamp, %s::timestamp, interval '1 day') AS d
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {WEATHER_TABLE} h WHERE h.id = r.id AND h.time = d
+                AND h.time BETWEEN %s::timestamp AND %s::timestamp
+            )
+        )
+        SELECT id, MIN(day) AS start_date, MAX(day) AS end_date
+        FROM (
+            SELECT id, day, day - (ROW_NUMBER() OVER (PARTITION BY id ORDER BY day))::int AS run
+            FROM missing
+        ) runs
+        GROUP BY id, run
+        ORDER BY id, start_date;
+    """, (start_date, end_date, start_date, end_date))
+    
+    return pd.DataFrame(cursor.fetchall(), columns=['id', 'start_date', 'end_date'])
+
+
+def find_tail_ranges(cursor, WEATHER_TABLE, start_date, end_date):
+    '''
+    Find the days after the latest stored day of every resort, up to end_date.
+    Resorts without any stored day get the whole [start_date, end_date] range.
+    Cheaper than find_missing_ranges (one index scan for MAX(time) per resort) but does not see
+    holes before the latest stored day, so it suits the daily refresh rather than repairs.
+    Returns a dataframe with one row per resort that needs data: id, start_date, end_date (inclusive).
+    '''
+    
+    cursor.execute(f"""
+        SELECT r.id, GREATEST((MAX(h.time) + interval '1 day')::date, %s::date) AS start_date, %s::date AS end_date
+        FROM resorts r
+        LEFT JOIN {WEATHER_TABLE} h ON h.id = r.id AND h.time >= %s::timestamp
+        GROUP BY r.id
+        HAVING MAX(h.time) IS NULL OR MAX(h.time)::date < %s::date
+        ORDER BY r.id;
+    """, (start_date, end_date, start_date, end_date))
+    
+    return pd.DataFrame(cursor.fetchall(), columns=['id', 'start_date', 'end_date'])
+
+
+def populate_weather_data(conn, cursor, WEATHER_TABLE, start_date=None, end_date=None, fill_gaps=True, batch_size=50, retention_months=None):
+    '''
+    Populate the weather table with data from the resorts table.
+    
+    Covers start_date to end_date, by default the last 90 days. Longer backfills (several seasons)
+    are split into yearly windows by historical_planner.py.
+    With fill_gaps=True every missing day is found (find_missing_ranges); with fill_gaps=False only
+    the days after each resort's latest stored day are fetched (find_tail_ranges), which is enough
+    for the daily refresh.
+    
+    Resorts missing the same window are fetched together, `batch_size` per request, and each batch
+    is written with one bulk COPY. Database round trips scale with the number of batches, not rows.
+    
+    The table is partitioned by month (historical_partitions.py); partitions for the fetched months
+    are created first. With retention_months, partitions older than that are archived afterwards.
+    The weekly and season rollups (historical_rollups.py) of each batch's resorts and window are
+    refreshed in the same transaction as its rows.
+    '''
+    
+    resorts = pd.read_sql("SELECT id, resort, latitude, longitude, state FROM resorts", conn)
+    
+    # Monthly partitions, see historical_partitions.py
+    if migrate_to_partitions(cursor, WEATHER_TABLE):
+        print(f'Converted {WEATHER_TABLE} to monthly partitions')
+    create_historical_table(cursor, WEATHER_TABLE)
+    
+    # Weekly and season rollups for the long range dashboard, see historical_rollups.py
+    if create_rollup_tables(cursor, WEATHER_TABLE):
+        print(f'Built {refresh_rollups(cursor, WEATHER_TABLE)} rollup rows from the stored history')
+    conn.commit()
+
+    end_date = end_date or datetime.now(timezone.utc).date()
+    start_date = start_date or end_date - timedelta(days=HISTORICAL_DAYS)
+    
+    # Months past the retention window are archived, don't fetch them again
+    retained_from = None
+    if retention_months is not None:
+        retained_from = retention_cutoff(retention_months, end_date)
+        start_date = max(start_date, retained_from)
+
+    # Missing date ranges for every resort, one query
+    with span("db.gap_search"):
+        if fill_gaps:
+            gaps = find_missing_ranges(cursor, WEATHER_TABLE, start_date, end_date)
+        else:
+            gaps = find_tail_ranges(cursor, WEATHER_TABLE, start_date, end_date)
+
+    plan = plan_fetches(gaps)
+    print(f'{gaps["id"].nunique()} resorts are missing {len(gaps)} date ranges, plan: {plan_summary(plan, batch_size)}')
+
+    coordinates = resorts.set_index('id')[['latitude', 'longitude']]
+    
+    # Rows can only be written to months that have a partition
+    if not plan.empty:
+        with span("db.partitions"):
+            created = ensure_partitions(cursor, WEATHER_TABLE, plan['start_date'].min(), plan['end_date'].max())
+            conn.commit()
+        if created:
+            print(f'Created partitions {", ".join(created)}')
+
+    written, rolled = 0, 0
+    for window in plan.itertuples(index=False):
+        group = coordinates.loc[window.ids].reset_index()
+        for batch in iter_historical(group, HISTORICAL_DAILY_PARAMS, window.start_date, window.end_date, batch_size=batch_size):
+            with span("reshape.concat"):
+                frame = historical_frame(batch)
+            count("rows_fetched", len(frame))
+            
+            # Bulk load through COPY, days already stored are skipped
+            with span("db.copy_upsert"):
+                batch_written = copy_upsert(cursor, frame, WEATHER_TABLE, ['id', 'time'], update=False)
+            
+            # The weeks and seasons of the new days are recomputed in the same transaction,
+            # so a run that fails later never leaves committed days missing from the rollups
+            if batch_written:
+                with span("db.rollups"):
+                    rolled += refresh_rollups(cursor, WEATHER_TABLE, window.start_date, window.end_date, retained_from,
+                                              ids=frame['id'].unique())
+            with span("db.commit"):
+                conn.commit()
+            written += batch_written
+    count("rows_written", written)
+    if rolled:
+        print(f'Refreshed {rolled} rollup rows')
+
+    removed = []
+    if retention_months is not None:
+        with span("db.retention"):
+            removed = apply_retention(cursor, WEATHER_TABLE, retention_months, end_date)
+        if removed:
+            print(f'Archived partitions {", ".join(removed)}')
+
+    # Tell the app its historical snapshots are stale
+    if written or removed:
+        bump_version(cursor, 'historical')
+        conn.commit()
+
+    print(f'Inserted {written} rows into {WEATHER_TABLE}')
+     
+            
+def update_resorts(conn, cursor, RESORTS_TABLE, local_file):
+    '''
+    Update the resorts table with new data from the csv file.
+    If the id is already in the table, update the row with the new data.
+    If the id is not in the table, insert the row.
+    '''
+
+    # columns: id, resort, latitude, longitude, state
+    with span("csv.read"):
+        resorts = pd.read_csv(local_file)
+    count("rows_fetched", len(resorts))
+
+    # Bulk load through COPY and a staging table, then upsert on id (see db_loader.py)
+    with span("db.copy_upsert"):
+        written = copy_upsert(cursor, resorts, RESORTS_TABLE, ['id'], columns=['id', 'resort', 'latitude', 'longitude', 'state'])
+        bump_version(cursor, 'resorts')
+        conn.commit()
+    count("rows_written", written)
+
+
+def get_nearby_resorts_within_driving_distance(ORS_API_KEY, resorts_df, summary_df, user_lat, user_lon, max_miles, cache=None, drive_times=None, client=None, index=None):
+    '''
+    Get the nearby resorts within a driving distance of the user, with their 4 day snowfall
+    forecast from summary_df (the forecast_summary table, see refresh_forecast_summary).
+    Only resorts within max_miles in a straight line are sent to ORS. Pass a spatial_index.ResortIndex
+    built from resorts_df as `index` to avoid rebuilding it on every search.
+    With a drive_time_cache.DriveTimeCache in `drive_times`, searches from the same area reuse
+    earlier drive times instead of calling ORS, and its stats() list how many resorts each search
+    looked up and sent to ORS. Otherwise distance matrix responses are read from
+    and saved to `cache` (an http_cache.ResponseCache), or to the cache configured by
+    HTTP_CACHE_PATH when cache is None.
+    '''
+    
+    # Driving distance is never shorter than the straight line, so resorts further than
+    # max_miles as the crow flies can be dropped before asking ORS for routes
+    index = index or ResortIndex(resorts_df)
+    positions, _ = index.within_radius(user_lat, user_lon, max_miles)
+    count("ors_destinations", len(positions))
+    resorts_df = resorts_df.iloc[positions].reset_index(drop=True)
+    if resorts_df.empty:
+        return []
+    
+    client = client or openrouteservice.Client(key=ORS_API_KEY)
+    
+    if drive_times is not None:
+        distances, durations = drive_times.lookup(client, user_lat, user_lon, resorts_df)
+    else:
+        coords = list(zip(resorts_df['longitude'], resorts_df['latitude']))  # (lon, lat)
+        origin = (user_lon, user_lat)
+        
+        request = dict(
+            locations=[origin] + coords,
+            profile='driving-car',
+            metrics=['distance', 'duration'],
+            units='mi',
+            sources=[0],
+            destinations=list(range(1, len(coords) + 1))
+        )
+        
+        cache = cache or get_default_cache()
+        if cache is not None:
+            response = cache.get_or_fetch("ors_matrix", request, lambda: client.distance_matrix(**request))
+        else:
+            response = client.distance_matrix(**request)
+        
+        distances = response['distances'][0]
+        durations = response['durations'][0]
+    nearby = []
+    
+    for i, (miles, seconds) in enumerate(zip(distances, durations)):
+        if miles is not None and miles <= max_miles:
+            nearby.append({
+                "id": resorts_df.iloc[i]['id'],
+                "resort": resorts_df.iloc[i]['resort'],
+                "state": resorts_df.iloc[i]['state'],
+                "distance": miles,
+                "duration_minutes": round(seconds / 60, 1)
+            })
+    
+    # Add the 4 day snowfall and next day weather code of nearby resorts from the precomputed summary
+    if nearby:
+        summary = summary_df.set_index('id')
+        for resort in nearby:
+            resort["forecast_snowfall"] = summary['snowfall_4d'].get(resort["id"], 0)
+            resort["weathercode"] = summary['weathercode_24h'].get(resort["id"])
+    return nearby
+
+
+# Format drive time for display in streamlit
+def format_drive_time(minutes):
+    hours = int(minutes // 60)
+    mins = int(minutes % 60)
+    return f"{hours}h {mins}m" if hours else f"{mins}m"
+
+
+def iter_weather_data(resorts_df, hourly_obj, daily_obj, batch_size=50, max_workers=8, requests_per_second=10):
+    '''
+    Generator version of get_weather_data.
+    Yields an (hourly_df, daily_df) pair per batch of `batch_size` resorts as soon as it is fetched,
+    so callers can write each batch to the database without holding every resort in memory.
+    '''
+    
+    batches = iter_forecasts(
+        resorts_df,
+        hourly_obj.hourly_params,
+        daily_obj.daily_params,
+        batch_size=batch_size,
+        max_workers=max_workers,
+        requests_per_second=requests_per_second
+    )
+    
+    for batch in batches:
+        if not batch:
+            continue
+        
+        with span("reshape.concat"):
+            hourly_df = apply_schema(pd.concat([hourly for _, hourly, _ in batch]), 'hourly')
+            daily_df = apply_schema(pd.concat([daily for _, _, daily in batch]), 'daily')
+        
+        yield hourly_df, daily_df
+
+
+def get_weather_data(resorts_df, hourly_obj, daily_obj, batch_size=50, max_workers=8, requests_per_second=10):
+    '''
+    This function is used to get the weather data for the resorts in the resorts_df dataframe.
+    It returns a list of the hourly and daily dataframes, with the dtypes from schema.py.
+    
+    Resorts are fetched `batch_size` coordinates per request, by `max_workers` threads,
+    limited to `requests_per_second` requests to OpenMeteo (see openmeteo_client.py).
+    
+    Used in populate_forecast.py
+    '''
+    
+    batches = list(iter_weather_data(resorts_df, hourly_obj, daily_obj, batch_size, max_workers, requests_per_second))
+    
+    # Assemble once, rather than concatenating inside the loop
+    with span("reshape.concat"):
+        hourly_df = pd.concat([hourly for hourly, _ in batches])
+        daily_df = pd.concat([daily for _, daily in batches])
+        
+        # Categories differing between batches fall back to object when concatenated
+        return apply_schema(hourly_df, 'hourly'), apply_schema(daily_df, 'daily')
+
+
+# Columns of the forecast tables, in table order
+HOURLY_COLUMNS = [
+    'id', 'time', 'precipitation', 'snowfall', 'snow_height', 'freezinglevel_height',
+    'rain', 'showers', 'weathercode'
+]
+DAILY_COLUMNS = [
+    'id', 'time', 'windspeed_10m_max', 'windgusts_10m_max', 'winddirection_10m_dominant',
+    'temperature_2m_max', 'temperature_2m_min', 'apparent_temperature_max',
+    'apparent_temperature_min', 'weathercode'
+]
+
+
+def create_hourly_table(cursor, table="hourly"):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER REFERENCES resorts(id),
+        time TIMESTAMP NOT NULL,
+        precipitation REAL,
+        snowfall REAL,
+        snow_height REAL,
+        freezinglevel_height REAL,
+        rain REAL,
+        showers REAL,
+        weathercode INTEGER,
+        PRIMARY KEY (id, time)
+        );
+    """)
+    # Tables created before the weather_codes table still carry the descriptions
+    cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS weather_description")
+
+
+def insert_hourly_rows(df, cursor, table="hourly"):
+    # Bulk load with COPY, the rows go into a fresh table so there are no conflicts to resolve
+    with span("db.copy_hourly"):
+        copy_df(cursor, df, table, HOURLY_COLUMNS)
+    count("rows_copied", len(df))
+
+
+def insert_hourly_df(df, cursor, connection, incremental=False):
+    '''
+    Replace the hourly table with df.
+    With incremental=True only changed rows are written and the table is never dropped (see merge_from_staging).
+    '''
+    print("Inserting hourly data...")
+    
+    if incremental:
+        create_hourly_table(cursor)
+        cursor.execute("DROP TABLE IF EXISTS hourly_staging")
+        create_hourly_table(cursor, "hourly_staging")
+        insert_hourly_rows(df, cursor, "hourly_staging")
+        merge_from_staging(cursor, "hourly", "hourly_staging", HOURLY_COLUMNS)
+        connection.commit()
+        return
+    
+    # Drop and create table if it exists
+    cursor.execute("DROP TABLE IF EXISTS hourly")
+    create_hourly_table(cursor)
+    insert_hourly_rows(df, cursor)
+    connection.commit()
+
+
+def create_daily_table(cursor, table="daily"):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+        ID INTEGER REFERENCES resorts(ID),
+        time TIMESTAMP,
+        windspeed_10m_max REAL,
+        windgusts_10m_max REAL,
+        winddirection_10m_dominant INTEGER,
+        temperature_2m_max REAL,
+        temperature_2m_min REAL,
+        apparent_temperature_max REAL,
+        apparent_temperature_min REAL,
+        weathercode INTEGER,
+        PRIMARY KEY (id, time)
+        );
+    """)
+    # Tables created before the weather_codes table still carry the descriptions
+    cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS weather_description")
+
+
+def insert_daily_rows(df, cursor, table="daily"):
+    # Bulk load with COPY, the rows go into a fresh table so there are no conflicts to resolve
+    with span("db.copy_daily"):
+        copy_df(cursor, df, table, DAILY_COLUMNS)
+    count("rows_copied", len(df))
+
+
+def insert_daily_df(df, cursor, connection, incremental=False):
+    '''
+    Replace the daily table with df.
+    With incremental=True only changed rows are written and the table is never dropped (see merge_from_staging).
+    '''
+    print("Inserting daily data...")
+    
+    if incremental:
+        create_daily_table(cursor)
+        cursor.execute("DROP TABLE IF EXISTS daily_staging")
+        create_daily_table(cursor, "daily_staging")
+        insert_daily_rows(df, cursor, "daily_staging")
+        merge_from_staging(cursor, "daily", "daily_staging", DAILY_COLUMNS)
+        connection.commit()
+        return
+    
+    cursor.execute("DROP TABLE IF EXISTS daily")
+    create_daily_table(cursor)
+    insert_daily_rows(df, cursor)
+    connection.commit()
+
+
+def swap_in_table(cursor, table, staging):
+    '''
+    Replace `table` with the fully loaded `staging` table.
+    The primary key index is renamed too so the staging name is free for the next run.
+    '''
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+    cursor.execute(f"ALTER INDEX {staging}_pkey RENAME TO {table}_pkey")
+
+
+def merge_from_staging(cursor, table, staging, columns):
+    '''
+    Upsert the rows of `staging` into `table` on (id, time), only touching rows whose values changed,
+    then delete rows of the resorts in `staging` that fell out of the forecast window.
+    Resorts missing from `staging` (failed fetches) keep their previous rows.
+    Does not commit, so the caller can run both tables in one transaction.
+    
+    Returns (rows upserted, rows deleted).
+    '''
+    
+    with span("db.merge"):
+        cursor.execute(upsert_select_sql(table, staging, columns, ['id', 'time']))
+        upserted = cursor.rowcount
+        
+        cursor.execute(f"""
+            DELETE FROM {table} t
+            WHERE t.id IN (SELECT DISTINCT id FROM {staging})
+            AND NOT EXISTS (SELECT 1 FROM {staging} s WHERE s.id = t.id AND s.time = t.time);
+        """)
+        deleted = cursor.rowcount
+        
+        cursor.execute(f"DROP TABLE {staging}")
+    
+    count("rows_written", upserted)
+    count("rows_deleted", deleted)
+    return upserted, deleted
+
+
+# Columns of the forecast_summary table, one row per resort
+FORECAST_SUMMARY_COLUMNS = [
+    'id', 'snowfall_24h', 'snowfall_48h', 'snowfall_4d', 'snowfall_7d',
+    'max_snow_height', 'min_temperature', 'weathercode_24h', 'updated_at'
+]
+
+
+def create_forecast_summary_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_summary (
+        id INTEGER PRIMARY KEY REFERENCES resorts(id),
+        snowfall_24h REAL,
+        snowfall_48h REAL,
+        snowfall_4d REAL,
+        snowfall_7d REAL,
+        max_snow_height REAL,
+        min_temperature REAL,
+        weathercode_24h INTEGER,
+        updated_at TIMESTAMP
+        );
+    """)
+    cursor.execute("ALTER TABLE forecast_summary ADD COLUMN IF NOT EXISTS weathercode_24h INTEGER")
+
+
+def refresh_forecast_summary(cursor, now=None):
+    '''
+    Recompute forecast_summary from the hourly and daily tables: snowfall totals over the next
+    24h/48h/4 days/7 days, the highest snow height and the lowest temperature of the next 7 days,
+    and the most severe weather code of the next 24h (WMO codes grow with severity), one row per resort.
+    The app reads this table instead of aggregating the hourly forecast itself.
+    
+    now defaults to the current UTC time (forecast times are stored in UTC).
+    Does not commit. The rows are deleted and inserted in the caller's open transaction, so readers
+    keep seeing the previous summary until the caller commits, never a half written one.
+    Returns the number of resorts summarized.
+    '''
+    
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    create_forecast_summary_table(cursor)
+    
+    cursor.execute("DELETE FROM forecast_summary")
+    cursor.execute("""
+        WITH hourly_totals AS (
+            SELECT id,
+                SUM(snowfall) FILTER (WHERE time < %(now)s + INTERVAL '24 hours') AS snowfall_24h,
+                SUM(snowfall) FILTER (WHERE time < %(now)s + INTERVAL '48 hours') AS snowfall_48h,
+                SUM(snowfall) FILTER (WHERE time <= %(now)s + INTERVAL '4 days') AS snowfall_4d,
+                SUM(snowfall) AS snowfall_7d,
+                MAX(snow_height) AS max_snow_height,
+                MAX(weathercode) FILTER (WHERE time < %(now)s + INTERVAL '24 hours') AS weathercode_24h
+            FROM hourly
+            WHERE time >= %(now)s AND time < %(now)s + INTERVAL '7 days'
+            GROUP BY id
+        ),
+        daily_minimums AS (
+            SELECT id, MIN(temperature_2m_min) AS min_temperature
+            FROM daily
+            WHERE time >= date_trunc('day', %(now)s::timestamp) AND time < %(now)s + INTERVAL '7 days'
+            GROUP BY id
+        )
+        INSERT INTO forecast_summary (id, snowfall_24h, snowfall_48h, snowfall_4d, snowfall_7d, max_snow_height, min_temperature, weathercode_24h, updated_at)
+        SELECT r.id,
+            COALESCE(h.snowfall_24h, 0), COALESCE(h.snowfall_48h, 0), COALESCE(h.snowfall_4d, 0), COALESCE(h.snowfall_7d, 0),
+            h.max_snow_height, d.min_temperature, h.weathercode_24h, %(now)s
+        FROM resorts r
+        LEFT JOIN hourly_totals h ON h.id = r.id
+        LEFT JOIN daily_minimums d ON d.id = r.id;
+    """, {"now": now})
+    
+    return cursor.rowcount
+
+
+def stream_weather_data(resorts_df, hourly_obj, daily_obj, cursor, connection, incremental=True, batch_size=50, max_workers=8, requests_per_second=10):
+    '''
+    Fetch the forecast and write it to the database batch by batch, so only a few batches
+    of resorts are ever held in memory (get_weather_data + insert_*_df hold all of them).
+    
+    Rows are loaded into hourly_staging and daily_staging first, and the app keeps reading
+    the previous forecast while the new one is being fetched. Then, in one transaction:
+        incremental=True  : changed rows are upserted into hourly/daily and rows that fell
+                            out of the forecast window are deleted (see merge_from_staging)
+        incremental=False : the staging tables replace hourly/daily (see swap_in_table)
+    
+    Afterwards forecast_summary is refreshed from the new forecast (see refresh_forecast_summary), in its
+    own transaction once the merge is committed, so the summary query doesn't hold the forecast locks.
+    
+    Returns a dict with the rows fetched, rows written, how long the final transaction
+    held the hourly and daily tables locked and the number of resorts summarized.
+    
+    Used in populate_forecast.py
+    '''
+    
+    for table, create in (("hourly_staging", create_hourly_table), ("daily_staging", create_daily_table)):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        create(cursor, table)
+    connection.commit()
+    
+    hourly_rows, daily_rows = 0, 0
+    for hourly_df, daily_df in iter_weather_data(resorts_df, hourly_obj, daily_obj, batch_size, max_workers, requests_per_second):
+        insert_hourly_rows(hourly_df, cursor, "hourly_staging")
+        insert_daily_rows(daily_df, cursor, "daily_staging")
+        with span("db.commit"):
+            connection.commit()
+        
+        hourly_rows += len(hourly_df)
+        daily_rows += len(daily_df)
+        print(f"Inserted {hourly_rows} hourly and {daily_rows} daily rows so far")
+    
+    if not hourly_rows:
+        raise RuntimeError("No forecast data was fetched, keeping the existing hourly and daily tables")
+    
+    stats = {"hourly_rows": hourly_rows, "daily_rows": daily_rows}
+    
+    # Everything from here to the commit holds locks on hourly and daily
+    start = time.perf_counter()
+    if incremental:
+        create_hourly_table(cursor)
+        create_daily_table(cursor)
+        stats["hourly_written"], stats["hourly_deleted"] = merge_from_staging(cursor, "hourly", "hourly_staging", HOURLY_COLUMNS)
+        stats["daily_written"], stats["daily_deleted"] = merge_from_staging(cursor, "daily", "daily_staging", DAILY_COLUMNS)
+    else:
+        with span("db.swap"):
+            swap_in_table(cursor, "hourly", "hourly_staging")
+            swap_in_table(cursor, "daily", "daily_staging")
+        stats["hourly_written"], stats["daily_written"] = hourly_rows, daily_rows
+        count("rows_written", hourly_rows + daily_rows)
+    with span("db.commit"):
+        connection.commit()
+    stats["lock_seconds"] = round(time.perf_counter() - start, 4)
+    
+    with span("db.summary"):
+        stats["summary_rows"] = refresh_forecast_summary(cursor)
+        bump_version(cursor, 'forecast')
+        connection.commit()
+    
+    print(f"Forecast written: {stats}")
+    return stats
@@ -0,0 +1,70 @@
+import pandas as pd
+from db_loader import copy_upsert
+
+'''
+WMO weather codes returned by OpenMeteo and their descriptions.
+
+The forecast tables only store the integer weathercode. The descriptions live once
+in the weather_codes table (kept in sync with WEATHER_CODES by populate_forecast.py)
+and are joined on when something is displayed, instead of repeating the text on
+every hourly and daily row.
+'''
+
+WEATHER_CODES = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Fog and depositing rime fog",
+    48: "Fog and depositing rime fog",
+    51: "Drizzle: Light intensity",
+    53: "Drizzle: Moderate intensity",
+    55: "Drizzle: Dense intensity",
+    56: "Freezing Drizzle: Light intensity",
+    57: "Freezing Drizzle: Dense intensity",
+    61: "Rain: Slight intensity",
+    63: "Rain: Moderate intensity",
+    65: "Rain: Heavy intensity",
+    66: "Freezing Rain: Light intensity",
+    67: "Freezing Rain: Heavy intensity",
+    71: "Snow fall: Slight intensity",
+    73: "Snow fall: Moderate intensity",
+    75: "Snow fall: Heavy intensity",
+    77: "Snow grains",
+    80: "Rain showers: Slight",
+    81: "Rain showers: Moderate",
+    82: "Rain showers: Violent",
+    85: "Snow showers: Slight",
+    86: "Snow showers: Heavy",
+    95: "Thunderstorm: Slight or moderate",
+    96: "Thunderstorm: With Slight Hail",
+    99: "Thunderstorm: With Heavy Hail"
+}
+
+
+def create_weather_codes_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS weather_codes (
+        code INTEGER PRIMARY KEY,
+        description TEXT NOT NULL
+        );
+    """)
+
+
+def update_weather_codes(cursor):
+    '''
+    Upsert WEATHER_CODES into the weather_codes table. Does not commit.
+    Returns the number of codes inserted or changed.
+    '''
+    create_weather_codes_table(cursor)
+    codes = pd.DataFrame(list(WEATHER_CODES.items()), columns=['code', 'description'])
+    return copy_upsert(cursor, codes, 'weather_codes', ['code'])
+
+
+def describe_weather(codes, weather_codes=None):
+    '''
+    Descriptions for a series of weather codes, as a categorical series.
+    weather_codes is the weather_codes table as a dataframe (code, description), WEATHER_CODES when None.
+    '''
+    mapping = WEATHER_CODES if weather_codes is None else dict(zip(weather_codes['code'], weather_codes['description']))
+    return codes.map(mapping).astype('category')